@@ -0,0 +1,613 @@
+"""
+Servicio HTTP local de anotación por lotes: cola de trabajos y pool de workers.
+
+Recibe videos (ruta local o subida del archivo), los encola y los procesa en
+un pool de procesos. Cada worker crea y calienta su backend de pose (y carga
+el clasificador exportado) una sola vez al iniciar, así los trabajos no pagan
+la carga del modelo. Por cada frame se obtienen los landmarks y, con --model,
+la actividad predicha (features incrementales de streaming_features y el
+runtime de model_export, igual que live_inference).
+
+El worker escribe el resultado frame a frame como NDJSON en RESULTS_DIR; el
+stream HTTP lee ese archivo mientras el trabajo avanza.
+
+Endpoints:
+    POST /jobs                  {"path": "Videos APO/Video 1.mp4"} (JSON) o
+                                el video como cuerpo (?filename=video.mp4)
+    GET  /jobs                  estado de todos los trabajos
+    GET  /jobs/<id>             estado y progreso de un trabajo
+    GET  /jobs/<id>/result      resultado completo (JSON) al terminar
+    GET  /jobs/<id>/stream      frames en NDJSON a medida que se procesan
+    GET  /metrics               cola, trabajos por estado y throughput
+    GET  /health
+
+Límites: SERVICE["workers"] trabajos en paralelo, como máximo
+SERVICE["max_pending"] trabajos sin terminar (luego 429), subidas de hasta
+SERVICE["max_upload_mb"] MB (413) y SERVICE["max_streams"] streams abiertos
+a la vez (503).
+
+Uso:
+    python annotation_service.py --workers 2 --model activity_classifier.npz
+    python annotation_service.py --backend synthetic              # pruebas sin MediaPipe
+    python annotation_service.py --submit "Videos APO/Video 1.mp4" --stream
+    python annotation_service.py --submit video.mp4 --upload
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+import extract_mediapipe_data
+import model_export
+import pose_backends
+import profiling
+from frame_reader import PrefetchingFrameReader
+from roi import ROI, PosePreprocessor
+from streaming_features import StreamingFeatureExtractor
+
+SERVICE = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "workers": 2,
+    "max_pending": 16,      # Trabajos en cola + en proceso antes de responder 429
+    "max_upload_mb": 512,
+    "max_streams": 8,
+    "flush_frames": 30,     # Frames que el worker acumula antes de escribir al NDJSON
+}
+UPLOAD_DIR = ".annotation_uploads"
+RESULTS_DIR = ".annotation_results"
+STREAM_POLL_S = 0.05
+METRICS_WINDOW_S = 60.0  # Ventana del throughput reciente
+
+# === WORKER (un proceso por worker) ===
+_model = None
+
+
+def _init_worker(backend_spec, model_path):
+    """Crea y calienta el backend de pose del proceso y carga el clasificador."""
+    global _model
+    extract_mediapipe_data.set_pose_backend(backend_spec)
+    extract_mediapipe_data.get_pose().warmup()
+    _model = model_export.load_compiled(model_path) if model_path else None
+
+
+def _frame_record(idx, timestamp_ms, landmarks, label, confidence):
+    return {
+        "frame": idx,
+        "timestamp_ms": round(timestamp_ms, 3),
+        "label": label,
+        "confidence": confidence,
+        "landmarks": None if landmarks is None else np.round(landmarks.astype(np.float64), 5).tolist(),
+    }
+
+
+def annotate_video(video_path, out_path, roi=None, flush_frames=SERVICE["flush_frames"]):
+    """Tarea de un worker: landmarks y etiqueta por frame de un video, escritos como NDJSON.
+
+    Crea `out_path` al empezar (el servicio lo usa para marcar el trabajo
+    como "running") y agrega una línea por frame decodificado. Devuelve el
+    resumen del trabajo: metadatos del video, conteos y tiempos por etapa.
+    """
+    started = time.time()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir el video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    summary = {
+        "fps": fps,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "total_frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+    }
+    preprocessor = PosePreprocessor(roi)
+    extractor = StreamingFeatureExtractor(_model.feature_names, fps=fps) if _model is not None else None
+    reader = PrefetchingFrameReader(cap, buffer_size=extract_mediapipe_data.PREFETCH_BUFFER)
+    frames = detected = 0
+    last_ms = 0.0
+    infer_s = classify_s = 0.0
+    label_counts = {}
+    pending = []
+    with open(out_path, "w") as f:
+        for idx, frame_rgb in reader:
+            # Marca de tiempo decodificada (CAP_PROP_POS_MSEC); idx / fps si el backend no la entrega
+            timestamp_ms = reader.timestamps_ms[idx] - reader.timestamps_ms[0]
+            if idx and timestamp_ms <= last_ms:
+                timestamp_ms = idx * 1000.0 / fps
+            last_ms = timestamp_ms
+            t0 = time.perf_counter()
+            landmarks = preprocessor.run(frame_rgb, extract_mediapipe_data.run_pose)
+            t1 = time.perf_counter()
+            infer_s += t1 - t0
+            label, confidence = None, None
+            if landmarks is None:
+                if extractor is not None:
+                    extractor.reset()  # Sin pose no hay velocidad/aceleración válida
+            else:
+                detected += 1
+                if extractor is not None:
+                    proba = _model.predict_proba(_model.frame_vector(landmarks, extractor.update(landmarks, timestamp_ms)))[0]
+                    best = int(proba.argmax())
+                    label, confidence = str(_model.classes[best]), round(float(proba[best]), 4)
+                    label_counts[label] = label_counts.get(label, 0) + 1
+                classify_s += time.perf_counter() - t1
+            pending.append(json.dumps(_frame_record(idx, timestamp_ms, landmarks, label, confidence)))
+            frames += 1
+            if len(pending) >= flush_frames:
+                f.write("\n".join(pending) + "\n")
+                f.flush()
+                pending = []
+        if pending:
+            f.write("\n".join(pending) + "\n")
+    cap.release()
+    summary.update(reader.counters())
+    summary.update({
+        "frames": frames,
+        "detected": detected,
+        "labels": label_counts,
+        "infer_s": infer_s,
+        "classify_s": classify_s,
+        "started_at": started,
+        "elapsed_s": time.time() - started,
+    })
+    return summary
+
+
+# === SERVICIO (proceso principal) ===
+class QueueFullError(RuntimeError):
+    """Se alcanzó SERVICE["max_pending"] trabajos sin terminar."""
+
+
+class Job:
+    """Trabajo de anotación: un video, su estado y la ruta del NDJSON de resultados."""
+
+    def __init__(self, job_id, video_path, result_path, uploaded=False):
+        self.id = job_id
+        self.video_path = video_path
+        self.result_path = result_path
+        self.uploaded = uploaded
+        self.status = "queued"  # queued -> running -> done | failed
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.summary = None
+        self.error = None
+        self.future = None
+        self._lines = 0
+        self._offset = 0
+        self._progress_lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def frames_written(self):
+        """Frames ya escritos por el worker (lee solo lo nuevo desde la última llamada)."""
+        if self.summary is not None:
+            return self.summary["frames"]
+        with self._progress_lock:
+            try:
+                with open(self.result_path, "rb") as f:
+                    f.seek(self._offset)
+                    chunk = f.read()
+            except FileNotFoundError:
+                return 0
+            end = chunk.rfind(b"\n") + 1
+            self._lines += chunk.count(b"\n", 0, end)
+            self._offset += end
+            return self._lines
+
+    def current_status(self):
+        """Estado del trabajo; "running" desde que el worker creó el NDJSON."""
+        status = self.status
+        if status == "queued" and os.path.exists(self.result_path):
+            return "running"
+        return status
+
+    def to_dict(self):
+        info = {
+            "id": self.id,
+            "status": self.current_status(),
+            "video": self.video_path,
+            "uploaded": self.uploaded,
+            "submitted_at": self.submitted_at,
+            "frames_done": self.frames_written(),
+        }
+        if self.summary is not None:
+            info["summary"] = self.summary
+            info["queue_wait_s"] = self.summary["started_at"] - self.submitted_at
+        if self.finished_at is not None:
+            info["latency_s"] = self.finished_at - self.submitted_at
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class AnnotationService:
+    """Cola de trabajos sobre un ProcessPoolExecutor con workers precalentados."""
+
+    def __init__(self, workers=SERVICE["workers"], backend_spec=None, model_path=None, roi=None,
+                 max_pending=SERVICE["max_pending"], results_dir=RESULTS_DIR, upload_dir=UPLOAD_DIR):
+        self.workers = workers
+        self.backend_spec = dict(backend_spec or pose_backends.DEFAULT_BACKEND)
+        self.model_path = model_path
+        self.roi = roi
+        self.max_pending = max_pending
+        self.results_dir = results_dir
+        self.upload_dir = upload_dir
+        self.jobs = {}
+        self.profiler = profiling.RunProfiler("annotation_service")
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._recent = []  # (fin, frames) de los trabajos terminados en METRICS_WINDOW_S
+
+    def start(self):
+        os.makedirs(self.results_dir, exist_ok=True)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.backend_spec, self.model_path))
+        # Arranca todos los workers ya (carga y warmup del modelo antes del primer trabajo)
+        for future in [self._executor.submit(time.sleep, 0) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.profiler.count(**{f"jobs_{k}": v for k, v in self.status_counts().items()})
+        return self.profiler.finish(verbose=False)
+
+    def pending(self):
+        return sum(not job.finished for job in self.jobs.values())
+
+    def status_counts(self):
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for job in list(self.jobs.values()):
+            counts[job.current_status()] += 1
+        return counts
+
+    def upload_path(self, filename):
+        """Ruta de destino de un video subido (nombre único, sin directorios del cliente)."""
+        name = re.sub(r"[^\w.\-]", "_", os.path.basename(filename or "")) or "video.mp4"
+        return os.path.join(self.upload_dir, f"{uuid.uuid4().hex[:8]}_{name}")
+
+    def submit(self, video_path, uploaded=False):
+        """Encola un video; QueueFullError si ya hay max_pending trabajos sin terminar."""
+        if not os.path.isfile(video_path):
+            raise FileNotFoundError(video_path)
+        with self._lock:
+            if self.pending() >= self.max_pending:
+                raise QueueFullError(f"{self.max_pending} trabajos pendientes")
+            job_id = uuid.uuid4().hex[:12]
+            job = Job(job_id, video_path, os.path.join(self.results_dir, f"{job_id}.ndjson"), uploaded)
+            self.jobs[job_id] = job
+            job.future = self._executor.submit(annotate_video, os.path.abspath(video_path),
+                                               os.path.abspath(job.result_path), self.roi)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def _finish(self, job, future):
+        try:
+            summary = future.result()
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        else:
+            job.summary = summary
+            job.status = "done"
+            with self._lock:
+                self.profiler.add("decode", frames=summary["frames_decoded"],
+                                  wall_s=summary["decode_s"] + summary["convert_s"], wait_s=summary["wait_s"])
+                self.profiler.add("pose", frames=summary["frames"], wall_s=summary["infer_s"])
+                self.profiler.add("classify", frames=summary["detected"], wall_s=summary["classify_s"])
+                self.profiler.count(videos=1, frames=summary["frames"])
+        job.finished_at = time.time()
+        with self._lock:
+            self._recent.append((job.finished_at, job.summary["frames"] if job.summary else 0))
+        if job.uploaded:
+            try:
+                os.remove(job.video_path)
+            except OSError:
+                pass
+
+    def metrics(self):
+        """Cola, trabajos por estado, latencias y frames por segundo (total y recientes)."""
+        now = time.time()
+        with self._lock:
+            self._recent = [(t, n) for t, n in self._recent if now - t <= METRICS_WINDOW_S]
+            recent_frames = sum(n for _, n in self._recent)
+        jobs = list(self.jobs.values())
+        done = [job for job in jobs if job.status == "done"]
+        frames = sum(job.summary["frames"] for job in done)
+        busy_s = sum(job.summary["elapsed_s"] for job in done)
+        latencies = [job.finished_at - job.submitted_at for job in done]
+        waits = [job.summary["started_at"] - job.submitted_at for job in done]
+        infer_s = sum(job.summary["infer_s"] for job in done)
+        uptime = now - self.started_at
+        return {
+            "uptime_s": uptime,
+            "workers": self.workers,
+            "backend": self.backend_spec.get("name"),
+            "model": self.model_path,
+            "max_pending": self.max_pending,
+            "pending": self.pending(),
+            "jobs": self.status_counts(),
+            "frames_total": frames,
+            "frames_per_s": frames / uptime if uptime > 0 else 0.0,
+            "frames_per_s_recent": recent_frames / min(uptime, METRICS_WINDOW_S) if uptime > 0 else 0.0,
+            "frames_per_worker_s": frames / busy_s if busy_s > 0 else None,
+            "pose_ms_per_frame": 1000.0 * infer_s / frames if frames else None,
+            "job_latency_s_mean": float(np.mean(latencies)) if latencies else None,
+            "job_latency_s_p95": float(np.percentile(latencies, 95)) if latencies else None,
+            "queue_wait_s_mean": float(np.mean(waits)) if waits else None,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Rutas HTTP del servicio; `self.server.service` es el AnnotationService."""
+
+    server_version = "AnnotationService/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, payload, status=HTTPStatus.OK):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json({"error": message}, status)
+
+    def _job(self, job_id):
+        job = self.server.service.jobs.get(job_id)
+        if job is None:
+            self._error(HTTPStatus.NOT_FOUND, f"Trabajo desconocido: {job_id}")
+        return job
+
+    def do_GET(self):
+        service = self.server.service
+        parts = urllib.parse.urlsplit(self.path).path.strip("/").split("/")
+        if parts == ["health"]:
+            self._send_json({"ok": True, "workers": service.workers})
+        elif parts == ["metrics"]:
+            self._send_json(service.metrics())
+        elif parts == ["jobs"]:
+            self._send_json([job.to_dict() for job in list(service.jobs.values())])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is not None:
+                self._send_json(job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] in ("result", "stream"):
+            job = self._job(parts[1])
+            if job is not None:
+                (self._result if parts[2] == "result" else self._stream)(job)
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {self.path}")
+
+    def _result(self, job):
+        info = job.to_dict()
+        if job.status == "failed":
+            self._send_json(info, HTTPStatus.INTERNAL_SERVER_ERROR)
+        elif job.status != "done":
+            self._send_json(info, HTTPStatus.ACCEPTED)  # Aún en proceso: consultar de nuevo
+        else:
+            with open(job.result_path) as f:
+                info["frames"] = [json.loads(line) for line in f]
+            self._send_json(info)
+
+    def _stream(self, job):
+        """NDJSON: una línea por frame a medida que el worker las escribe; al final, el estado."""
+        if not self.server.streams.acquire(blocking=False):
+            self._error(HTTPStatus.SERVICE_UNAVAILABLE, "Demasiados streams abiertos")
+            return
+        try:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()  # Sin Content-Length: el stream termina al cerrar la conexión
+            offset = 0
+            while True:
+                finished = job.finished  # Antes de leer: lo escrito hasta aquí queda incluido
+                if os.path.exists(job.result_path):
+                    with open(job.result_path, "rb") as f:
+                        f.seek(offset)
+                        chunk = f.read()
+                    end = chunk.rfind(b"\n") + 1
+                    if end:
+                        self.wfile.write(chunk[:end])
+                        self.wfile.flush()
+                        offset += end
+                if finished:
+                    break
+                time.sleep(STREAM_POLL_S)
+            self.wfile.write((json.dumps({"job": job.to_dict()}) + "\n").encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente cerró el stream
+        finally:
+            self.server.streams.release()
+
+    def do_POST(self):
+        service = self.server.service
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {self.path}")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        uploaded = not self.headers.get("Content-Type", "").startswith("application/json")
+        try:
+            if uploaded:
+                if length <= 0:
+                    self._error(HTTPStatus.BAD_REQUEST, "Cuerpo vacío: envía el video o {\"path\": ...} en JSON")
+                    return
+                if length > SERVICE["max_upload_mb"] * 2**20:
+                    self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                f"El video supera {SERVICE['max_upload_mb']} MB")
+                    return
+                filename = urllib.parse.parse_qs(url.query).get("filename", [""])[0]
+                video_path = service.upload_path(filename)
+                with open(video_path, "wb") as f:
+                    remaining = length
+                    while remaining:
+                        chunk = self.rfile.read(min(remaining, 2**20))
+                        if not chunk:
+                            raise ConnectionResetError("Subida incompleta")
+                        f.write(chunk)
+                        remaining -= len(chunk)
+            else:
+                video_path = json.loads(self.rfile.read(length) or b"{}").get("path")
+                if not video_path:
+                    self._error(HTTPStatus.BAD_REQUEST, "Falta \"path\"")
+                    return
+            job = service.submit(video_path, uploaded)
+        except QueueFullError as e:
+            if uploaded:
+                os.remove(video_path)
+            self._error(HTTPStatus.TOO_MANY_REQUESTS, f"Cola llena ({e}); reintenta más tarde")
+        except FileNotFoundError as e:
+            self._error(HTTPStatus.BAD_REQUEST, f"No existe el video: {e}")
+        except (ValueError, ConnectionResetError) as e:
+            self._error(HTTPStatus.BAD_REQUEST, str(e))
+        else:
+            self._send_json(job.to_dict(), HTTPStatus.ACCEPTED)
+
+
+def make_server(service, host=SERVICE["host"], port=SERVICE["port"], max_streams=SERVICE["max_streams"],
+                verbose=False):
+    """ThreadingHTTPServer del servicio (port=0 elige un puerto libre)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    server.streams = threading.BoundedSemaphore(max_streams)
+    server.verbose = verbose
+    return server
+
+
+# === CLIENTE (pruebas en localhost) ===
+def submit_job(base_url, video_path, upload=False):
+    """Envía un video (ruta o subida) y devuelve el estado del trabajo creado."""
+    if upload:
+        query = urllib.parse.urlencode({"filename": os.path.basename(video_path)})
+        with open(video_path, "rb") as f:
+            data = f.read()
+        request = urllib.request.Request(f"{base_url}/jobs?{query}", data=data,
+                                         headers={"Content-Type": "application/octet-stream"})
+    else:
+        request = urllib.request.Request(f"{base_url}/jobs", data=json.dumps({"path": video_path}).encode(),
+                                         headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def get_json(base_url, path):
+    with urllib.request.urlopen(f"{base_url}{path}") as response:
+        return json.load(response)
+
+
+def iter_stream(base_url, job_id):
+    """Frames (dicts) del stream NDJSON de un trabajo; el último elemento es {"job": estado}."""
+    with urllib.request.urlopen(f"{base_url}/jobs/{job_id}/stream") as response:
+        for line in response:
+            yield json.loads(line)
+
+
+def wait_job(base_url, job_id, poll_s=0.2):
+    """Espera a que el trabajo termine y devuelve su estado final."""
+    while True:
+        info = get_json(base_url, f"/jobs/{job_id}")
+        if info["status"] in ("done", "failed"):
+            return info
+        time.sleep(poll_s)
+
+
+def run_client(args):
+    base_url = f"http://{args.host}:{args.port}"
+    try:
+        job = submit_job(base_url, args.submit, upload=args.upload)
+    except urllib.error.HTTPError as e:
+        print(f"❌ {e.code}: {json.load(e).get('error')}")
+        return
+    print(f"📤 Trabajo {job['id']} encolado ({args.submit})")
+    if args.stream:
+        labels = {}
+        for record in iter_stream(base_url, job["id"]):
+            if "job" in record:
+                job = record["job"]
+            elif record["label"] is not None:
+                labels[record["label"]] = labels.get(record["label"], 0) + 1
+        print(f"   Etiquetas por frame: {labels or 'sin modelo'}")
+    else:
+        job = wait_job(base_url, job["id"])
+    if job["status"] == "failed":
+        print(f"❌ {job['error']}")
+        return
+    s = job["summary"]
+    print(f"✅ {s['frames']} frames ({s['detected']} con pose) en {s['elapsed_s']:.1f} s "
+          f"(espera en cola {job['queue_wait_s']:.2f} s)")
+    m = get_json(base_url, "/metrics")
+    print(f"📈 Servicio: {m['frames_total']} frames, {m['frames_per_s']:.1f} FPS, trabajos {m['jobs']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de anotación de videos (landmarks + actividad).")
+    parser.add_argument("--host", default=SERVICE["host"])
+    parser.add_argument("--port", type=int, default=SERVICE["port"])
+    parser.add_argument("--workers", type=int, default=SERVICE["workers"], help="Procesos con Pose precargado")
+    parser.add_argument("--max-pending", type=int, default=SERVICE["max_pending"],
+                        help="Trabajos sin terminar antes de rechazar con 429")
+    parser.add_argument("--max-streams", type=int, default=SERVICE["max_streams"])
+    parser.add_argument("--backend", default="mediapipe", choices=sorted(pose_backends.BACKENDS),
+                        help="Backend de pose (synthetic/null: pruebas sin costo de inferencia)")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1, 2])
+    parser.add_argument("--roi", action="store_true", help="Recorta al ROI de la persona antes de Pose")
+    parser.add_argument("--target-size", type=int, default=None, help="Lado mayor máximo de la imagen para Pose (px)")
+    parser.add_argument("--model", default=None, help="Clasificador exportado (.npz de model_export.py)")
+    parser.add_argument("--verbose", action="store_true", help="Registra cada petición HTTP")
+    parser.add_argument("--submit", metavar="VIDEO", help="Modo cliente: envía un video al servicio en marcha")
+    parser.add_argument("--upload", action="store_true", help="Con --submit: sube el archivo en vez de enviar la ruta")
+    parser.add_argument("--stream", action="store_true", help="Con --submit: lee el resultado como stream NDJSON")
+    args = parser.parse_args()
+
+    if args.submit:
+        run_client(args)
+        return
+
+    spec = {"name": args.backend}
+    if args.backend == "mediapipe":
+        spec["model_complexity"] = args.model_complexity
+    service = AnnotationService(args.workers, spec, args.model,
+                                roi={**ROI, "enabled": args.roi, "target_size": args.target_size},
+                                max_pending=args.max_pending)
+    print(f"🔥 Iniciando {args.workers} workers (backend {args.backend}"
+          f"{', modelo ' + args.model if args.model else ''})...")
+    service.start()
+    server = make_server(service, args.host, args.port, args.max_streams, args.verbose)
+    print(f"✅ Escuchando en http://{args.host}:{server.server_address[1]} (Ctrl+C para terminar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path = service.close()
+        m = service.metrics()
+        print(f"\n📈 {m['frames_total']} frames, trabajos {m['jobs']}; reporte: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Benchmarks del pipeline con datos sintéticos (sin cámara ni modelo de Pose).
+
+Genera videos sintéticos con cv2.VideoWriter, etiquetas con el formato de
+Label Studio y secuencias de 33 landmarks, y mide:
+
+- label_lookup_linear / label_lookup_index: búsqueda de etiqueta por frame
+  (escaneo lineal original vs. LabelIndex vectorizado)
+- extract_stub_pose: decodificación + backend de pose sintético
+  (pose_backends.SyntheticBackend)
+- extract_null_pose: decodificación + backend nulo (sin detecciones)
+- build_rows: unión de landmarks con etiquetas (build_video_rows)
+- features: features en lote (features.compute_features)
+- streaming_features: features frame a frame (StreamingFeatureExtractor)
+- write_parquet / read_parquet / read_parquet_projected / write_csv / read_csv
+- enrich: enrich_dataset.py completo sobre el dataset sintético
+
+Cada ejecución se guarda en benchmarks/bench_<fecha>.json; --compare
+compara dos ejecuciones (por defecto, las dos últimas).
+
+Uso:
+    python benchmark.py --videos 4 --frames 600
+    python benchmark.py --only features build_rows
+    python benchmark.py --compare
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import dataset_io
+import extract_mediapipe_data as extract
+import features
+import pose_backends
+from streaming_features import StreamingFeatureExtractor, synthetic_landmarks
+
+BENCH_DIR = "benchmarks"
+REPEAT = 3
+LABELS = ["Sitting", "Get up", "Walk forward", "Turn", "Walk back", "Sit down"]
+REGRESSION_RATIO = 1.2  # --compare marca como más lento lo que tarde 20% más
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# === DATOS SINTÉTICOS ===
+def write_synthetic_video(path, n_frames, width=640, height=480, fps=30.0):
+    """Video con un rectángulo en movimiento (como live_inference.SyntheticSource)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(n_frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        x = int((i * 5) % max(width - 100, 1))
+        cv2.rectangle(frame, (x, height // 4), (x + 100, 3 * height // 4), (200, 180, 160), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def synthetic_label_data(n_videos, n_frames, n_ranges=6, seed=0):
+    """Entradas con el formato de project-label-studio.json (rangos contiguos por video)."""
+    rng = np.random.default_rng(seed)
+    entries = []
+    for video_id in range(1, n_videos + 1):
+        cuts = np.sort(rng.choice(np.arange(2, n_frames), size=n_ranges - 1, replace=False))
+        bounds = np.concatenate([[1], cuts, [n_frames]])
+        results = [
+            {"value": {"ranges": [{"start": int(start), "end": int(end)}],
+                       "timelinelabels": [LABELS[i % len(LABELS)]]},
+             "type": "timelinelabels"}
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ]
+        entries.append({"id": video_id, "annotations": [{"result": results}],
+                        "file_upload": f"bench-Video_{video_id}.mp4"})
+    return entries
+
+
+def synthetic_raw(n_frames, seed=0, fps=30.0, width=640, height=480):
+    """Dict de landmarks crudos como el de extract_raw_landmarks, sin video."""
+    return {
+        "frames": np.arange(n_frames, dtype=np.int32),
+        "landmarks": synthetic_landmarks(n_frames, seed),
+        "attempted": np.arange(n_frames, dtype=np.int32),
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "total_frames": n_frames,
+    }
+
+
+def linear_label_for_frame(label_data, video_id, frame_idx_labelstudio):
+    """Búsqueda lineal original de extract_mediapipe_data (referencia)."""
+    for entry in label_data:
+        if entry["id"] == video_id:
+            for r in entry["annotations"][0]["result"]:
+                start = r["value"]["ranges"][0]["start"]
+                end = r["value"]["ranges"][0]["end"]
+                if start <= frame_idx_labelstudio <= end:
+                    return r["value"]["timelinelabels"][0]
+    return "Unlabeled"
+
+
+# === MEDICIÓN ===
+def timeit(fn, repeat=REPEAT, items=None, unit="frames"):
+    """Corre fn `repeat` veces; devuelve mediana, mínimo y throughput."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {
+        "median_s": median,
+        "min_s": min(times),
+        "repeat": repeat,
+        "items": items,
+        "unit": unit,
+        "items_per_s": items / median if items and median > 0 else None,
+    }
+
+
+# === BENCHMARKS ===
+def bench_labels(ctx):
+    label_data, n_frames = ctx["label_data"], ctx["frames"]
+    frames = np.arange(n_frames)
+    n = len(label_data) * n_frames
+    return {
+        "label_lookup_linear": timeit(
+            lambda: [linear_label_for_frame(label_data, e["id"], f) for e in label_data for f in frames.tolist()],
+            ctx["repeat"], n),
+        "label_lookup_index": timeit(
+            lambda: [extract.label_index.labels_for_frames(e["id"], frames) for e in label_data],
+            ctx["repeat"], n),
+    }
+
+
+def bench_extract(ctx):
+    def run():
+        for path, _ in ctx["videos"]:
+            extract.extract_raw_landmarks(path, verbose=False)
+    n = len(ctx["videos"]) * ctx["frames"]
+    results = {}
+    for name, backend in (("extract_stub_pose", pose_backends.SyntheticBackend()),
+                          ("extract_null_pose", pose_backends.NullBackend())):
+        extract.set_pose_backend(backend)
+        results[name] = timeit(run, ctx["repeat"], n)
+    extract.set_pose_backend(pose_backends.DEFAULT_BACKEND)
+    return results
+
+
+def bench_rows(ctx):
+    def run():
+        for video_id, raw in ctx["raws"].items():
+            extract.build_video_rows(raw, video_id, verbose=False)
+    return {"build_rows": timeit(run, ctx["repeat"], len(ctx["raws"]) * ctx["frames"])}
+
+
+def bench_features(ctx):
+    lm = np.concatenate([raw["landmarks"] for raw in ctx["raws"].values()])
+    video_ids = np.repeat(list(ctx["raws"]), ctx["frames"])
+    timestamps = np.tile(np.arange(ctx["frames"]) * 1000.0 / 30.0, len(ctx["raws"]))
+    fctx = features.FeatureContext(video_ids, fps=np.full(len(lm), 30.0), timestamp_ms=timestamps)
+    names = features.ENRICH_FEATURES + ["bbox", "spatial", "body_motion"]
+
+    def stream():
+        extractor = StreamingFeatureExtractor(names)
+        for i in range(len(lm)):
+            if fctx.first[i]:
+                extractor.reset()
+            extractor.update(lm[i], timestamps[i])
+    return {
+        "features": timeit(lambda: features.compute_features(lm, fctx, names), ctx["repeat"], len(lm)),
+        "streaming_features": timeit(stream, ctx["repeat"], len(lm)),
+    }
+
+
+def bench_io(ctx):
+    df, tmp = ctx["dataset"], ctx["tmp"]
+    parquet, csv = os.path.join(tmp, "io.parquet"), os.path.join(tmp, "io.csv")
+    n = len(df)
+    results = {"write_parquet": timeit(lambda: dataset_io.write_dataset(df, parquet), ctx["repeat"], n),
+               "read_parquet": timeit(lambda: dataset_io.read_dataset(parquet), ctx["repeat"], n)}
+    columns = ["video_id", "frame_opencv", "label"] + dataset_io.landmark_columns("xy")
+    results["read_parquet_projected"] = timeit(
+        lambda: dataset_io.read_dataset(parquet, columns=columns), ctx["repeat"], n)
+    results["write_csv"] = timeit(lambda: dataset_io.write_dataset(df, csv), ctx["repeat"], n)
+    results["read_csv"] = timeit(lambda: dataset_io.read_dataset(csv), ctx["repeat"], n)
+    return results
+
+
+def bench_enrich(ctx):
+    """enrich_dataset.py completo (es un script), en un subproceso sobre el dataset sintético."""
+    workdir = os.path.join(ctx["tmp"], "enrich")
+    os.makedirs(workdir, exist_ok=True)
+    dataset_io.write_dataset(ctx["dataset"], os.path.join(workdir, dataset_io.RAW_DATASET))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SCRIPT_DIR, os.environ.get("PYTHONPATH")]))}
+    script = os.path.join(SCRIPT_DIR, "enrich_dataset.py")
+    return {"enrich": timeit(
+        lambda: subprocess.run([sys.executable, script], cwd=workdir, env=env, check=True,
+                               stdout=subprocess.DEVNULL),
+        ctx["repeat"], len(ctx["dataset"]))}
+
+
+BENCHMARKS = {
+    "labels": bench_labels,
+    "extract": bench_extract,
+    "rows": bench_rows,
+    "features": bench_features,
+    "io": bench_io,
+    "enrich": bench_enrich,
+}
+
+
+def run_benchmarks(n_videos=3, n_frames=300, width=640, height=480, repeat=REPEAT, only=None, verbose=True):
+    """Genera los datos sintéticos y corre los benchmarks elegidos; devuelve el reporte."""
+    only = only or list(BENCHMARKS)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {"videos": n_videos, "frames": n_frames, "width": width, "height": height, "repeat": repeat},
+        "platform": {"python": platform.python_version(), "numpy": np.__version__,
+                     "opencv": cv2.__version__, "machine": platform.machine()},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        label_data = synthetic_label_data(n_videos, n_frames)
+        extract.set_label_data(label_data)
+        raws = {e["id"]: synthetic_raw(n_frames, seed=e["id"], width=width, height=height) for e in label_data}
+        ctx = {"tmp": tmp, "label_data": label_data, "frames": n_frames, "repeat": repeat, "raws": raws}
+        if "extract" in only:
+            ctx["videos"] = [(write_synthetic_video(os.path.join(tmp, f"Video {e['id']}.mp4"), n_frames,
+                                                    width, height), e["id"]) for e in label_data]
+        if "io" in only or "enrich" in only:
+            ctx["dataset"] = dataset_io.to_storage_dtypes(
+                pd.concat([extract.build_video_rows(raw, vid, verbose=False) for vid, raw in raws.items()],
+                          ignore_index=True))
+        for name in only:
+            if verbose:
+                print(f"⏱️  {name} ...")
+            report["results"].update(BENCHMARKS[name](ctx))
+    return report
+
+
+def save_report(report, out_dir=BENCH_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"bench_{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def print_report(report):
+    print("\n" + "=" * 70)
+    print("📊 RESULTADOS")
+    print("=" * 70)
+    for name, r in report["results"].items():
+        rate = f"{r['items_per_s']:12,.0f} {r['unit']}/s" if r["items_per_s"] else ""
+        print(f"  {name:24s} {r['median_s'] * 1000:10.2f} ms {rate}")
+
+
+def compare_reports(old, new, ratio=REGRESSION_RATIO):
+    """Imprime la razón nuevo/anterior por benchmark; devuelve los que empeoraron."""
+    if old["config"] != new["config"]:
+        print(f"⚠️  Configuraciones distintas: {old['config']} vs {new['config']}")
+    print(f"\n  {'benchmark':24s} {'anterior':>12s} {'nuevo':>12s} {'razón':>8s}")
+    slower = []
+    for name, r in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before, after = old["results"][name]["median_s"], r["median_s"]
+        change = after / before if before > 0 else float("inf")
+        mark = "❌" if change > ratio else ("✅" if change < 1 / ratio else "  ")
+        print(f"  {name:24s} {before * 1000:10.2f} ms {after * 1000:10.2f} ms {change:7.2f}x {mark}")
+        if change > ratio:
+            slower.append(name)
+    return slower
+
+
+def latest_reports(out_dir=BENCH_DIR, n=2):
+    if not os.path.isdir(out_dir):
+        return []
+    names = sorted(f for f in os.listdir(out_dir) if f.startswith("bench_") and f.endswith(".json"))
+    return [os.path.join(out_dir, name) for name in names[-n:]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline con datos sintéticos.")
+    parser.add_argument("--videos", type=int, default=3, help="Número de videos sintéticos")
+    parser.add_argument("--frames", type=int, default=300, help="Frames por video")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Repeticiones por benchmark (se usa la mediana)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Solo estos grupos de benchmarks")
+    parser.add_argument("--out-dir", default=BENCH_DIR)
+    parser.add_argument("--compare", nargs="*", metavar="JSON",
+                        help="Compara dos reportes (sin argumentos: los dos últimos) y no corre benchmarks")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        paths = args.compare or latest_reports(args.out_dir)
+        if len(paths) != 2:
+            parser.error("--compare necesita dos reportes")
+        with open(paths[0]) as f_old, open(paths[1]) as f_new:
+            slower = compare_reports(json.load(f_old), json.load(f_new))
+        sys.exit(1 if slower else 0)
+
+    report = run_benchmarks(args.videos, args.frames, args.width, args.height, args.repeat, args.only)
+    print_report(report)
+    print(f"\n💾 Resultados guardados en: {save_report(report, args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Lectura/escritura del dataset en formato columnar (Parquet).
+
+Reemplaza a los CSV de 140+ columnas:
+- Las coordenadas de landmarks y los features derivados se guardan en float32
+  (la misma precisión que entrega MediaPipe), no como texto.
+- Cada video se escribe en su propio row group, así las etapas pueden leer
+  un video a la vez.
+- La lectura admite proyección de columnas: EDA puede leer solo `speed_*`
+  sin cargar las 132 coordenadas.
+
+Los archivos .csv se siguen aceptando (por extensión) para datasets antiguos.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RAW_DATASET = "mediapipe_labels_dataset.parquet"
+ENRICHED_DATASET = "mediapipe_labels_dataset_enriched.parquet"
+
+# Columnas float que se mantienen en float64 (tiempos y fps)
+FLOAT64_COLUMNS = {"fps", "fps_eff", "timestamp_ms"}
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def landmark_columns(coords="xyzv", n_landmarks=33):
+    """Nombres de columnas de landmarks en el orden x_0, y_0, z_0, v_0, x_1, ..."""
+    return [f"{c}_{i}" for i in range(n_landmarks) for c in coords]
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def resolve_dataset_path(path):
+    """Devuelve `path` si existe; si no, el .csv equivalente si existe (dataset antiguo)."""
+    if os.path.exists(path):
+        return path
+    csv_path = os.path.splitext(path)[0] + ".csv"
+    if os.path.exists(csv_path):
+        return csv_path
+    return path
+
+
+def source_fingerprint(path):
+    """Identifica una versión del archivo (ruta, tamaño y fecha de modificación)."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def to_storage_dtypes(df):
+    """Convierte las columnas float a float32 (excepto FLOAT64_COLUMNS)."""
+    casts = {
+        c: np.float32 for c in df.columns
+        if df[c].dtype == np.float64 and c not in FLOAT64_COLUMNS
+    }
+    return df.astype(casts) if casts else df
+
+
+def _video_bounds(df):
+    """Límites [start, stop) de cada video en un DataFrame agrupado por video."""
+    if "video_id" not in df.columns or not len(df):
+        return [(0, len(df))]
+    vids = df["video_id"].to_numpy()
+    cuts = np.flatnonzero(vids[1:] != vids[:-1]) + 1
+    bounds = [0, *cuts.tolist(), len(df)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class DatasetWriter:
+    """Escritura incremental del dataset: cada write() agrega un bloque de filas.
+
+    Parquet: float32 y un row group por video de cada bloque (si un video
+    llega en varios bloques, ocupa varios row groups). El archivo se escribe
+    en un .tmp y se renombra al cerrar sin errores.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.rows = 0
+        self._writer = None
+        self._started = False
+
+    def write(self, df):
+        if not _is_parquet(self.path):
+            df.to_csv(self.tmp_path, mode="a" if self._started else "w", header=not self._started, index=False)
+            self._started = True
+            self.rows += len(df)
+            return
+        df = to_storage_dtypes(df).reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+        elif not table.schema.equals(self._writer.schema):
+            table = table.cast(self._writer.schema)
+        self._started = True
+        for start, stop in _video_bounds(df):
+            self._writer.write_table(table.slice(start, stop - start))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._started:
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_dataset(df, path):
+    """Guarda el dataset. Parquet: float32 y un row group por video."""
+    with DatasetWriter(path) as writer:
+        writer.write(df)
+
+
+def dataset_columns(path):
+    """Nombres de columnas del dataset sin leer los datos."""
+    path = resolve_dataset_path(path)
+    if _is_parquet(path):
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def select_columns(names, exact=(), prefixes=(), contains=()):
+    """Filtra `names` por nombre exacto, prefijo o subcadena (manteniendo el orden)."""
+    return [
+        c for c in names
+        if c in exact
+        or any(c.startswith(p) for p in prefixes)
+        or any(s in c for s in contains)
+    ]
+
+
+def read_dataset(path, columns=None):
+    """Lee el dataset; `columns` limita las columnas leídas (proyección)."""
+    path = resolve_dataset_path(path)
+    if _is_parquet(path):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_video_chunks(path, columns=None, row_groups=None, batch_rows=None):
+    """Itera el dataset por bloques de video (un row group de Parquet por vez).
+
+    `row_groups` elige (y ordena) los row groups a leer; con `batch_rows`
+    cada row group se entrega en bloques de a lo sumo esa cantidad de filas.
+    En CSV no hay row groups: se lee completo y se agrupa por video_id.
+    """
+    path = resolve_dataset_path(path)
+    if _is_parquet(path):
+        pf = pq.ParquetFile(path)
+        for i in (range(pf.num_row_groups) if row_groups is None else row_groups):
+            if batch_rows:
+                for batch in pf.iter_batches(batch_size=batch_rows, row_groups=[i], columns=columns):
+                    yield batch.to_pandas()
+            else:
+                yield pf.read_row_group(i, columns=columns).to_pandas()
+        return
+    df = pd.read_csv(path, usecols=columns)
+    if "video_id" not in df.columns:
+        yield df
+        return
+    for _, chunk in df.groupby("video_id", sort=False):
+        yield chunk.reset_index(drop=True)
+
+
+def video_row_groups(path):
+    """Row groups de un Parquet agrupados por video, ordenados por (video_id, frame_opencv).
+
+    Devuelve [(video_id, [row groups en orden de frame]), ...] leyendo solo
+    esas dos columnas. Falla si un row group mezcla videos o no tiene los
+    frames ordenados (el orden en que los escribe extract_mediapipe_data).
+    """
+    pf = pq.ParquetFile(resolve_dataset_path(path))
+    keys = []
+    for i in range(pf.num_row_groups):
+        t = pf.read_row_group(i, columns=["video_id", "frame_opencv"])
+        vids = t.column("video_id").to_numpy()
+        frames = t.column("frame_opencv").to_numpy()
+        if not len(vids):
+            continue
+        if (vids != vids[0]).any() or (np.diff(frames) < 0).any():
+            raise ValueError(f"Row group {i} de {path} no es un bloque ordenado de un solo video")
+        keys.append((vids[0].item(), frames[0].item(), i))
+    videos = {}
+    for video_id, _, i in sorted(keys):
+        videos.setdefault(video_id, []).append(i)
+    return list(videos.items())
+
+
+# === METADATOS (sin leer los datos) ===
+def _csv_row_count(path, block=1 << 20):
+    """Filas de un CSV contando saltos de línea en binario (sin parsear)."""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(block)
+            if not chunk:
+                break
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)  # Sin la cabecera
+
+
+def dataset_stats(path):
+    """(filas, columnas) del dataset: metadatos del Parquet o cabecera + conteo de líneas del CSV."""
+    path = resolve_dataset_path(path)
+    if _is_parquet(path):
+        meta = pq.ParquetFile(path).metadata
+        return meta.num_rows, list(meta.schema.names)
+    return _csv_row_count(path), dataset_columns(path)
+
+
+def _row_group_video(meta, i, col):
+    """video_id de un row group según sus estadísticas, o None si no se puede saber sin leerlo."""
+    stats = meta.row_group(i).column(col).statistics
+    if stats is not None and stats.has_min_max and stats.min == stats.max and not stats.null_count:
+        return str(stats.min)
+    return None
+
+
+def video_frame_counts(path):
+    """Filas por video (claves str). En Parquet sale de las estadísticas min/max de
+    video_id de cada row group; solo se lee la columna de los row groups sin
+    estadísticas o con más de un video.
+    """
+    path = resolve_dataset_path(path)
+    counts = {}
+    if not _is_parquet(path):
+        vids = pd.read_csv(path, usecols=["video_id"])["video_id"].astype(str)
+        return {str(k): int(v) for k, v in vids.value_counts(sort=False).items()}
+    pf = pq.ParquetFile(path)
+    col = pf.metadata.schema.names.index("video_id")
+    for i in range(pf.num_row_groups):
+        key = _row_group_video(pf.metadata, i, col)
+        if key is not None:
+            counts[key] = counts.get(key, 0) + pf.metadata.row_group(i).num_rows
+            continue
+        vids = pf.read_row_group(i, columns=["video_id"]).column("video_id").to_pandas().astype(str)
+        for key, n in vids.value_counts(sort=False).items():
+            counts[key] = counts.get(key, 0) + int(n)
+    return counts
+
+
+def _allocate_rows(sizes, n, rng):
+    """Reparte n filas entre bloques de `sizes` filas en proporción a su tamaño (resto mayor)."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = int(sizes.sum())
+    if n >= total:
+        return sizes.copy()
+    exact = n * sizes / total
+    quota = np.floor(exact).astype(np.int64)
+    # Resto: a los bloques con mayor parte fraccionaria (empates al azar)
+    order = np.lexsort((rng.random(len(sizes)), -(exact - quota)))
+    quota[order[:n - int(quota.sum())]] += 1
+    return quota
+
+
+def sample_by_video(path, columns=None, rows_per_video=200, max_videos=None, seed=0):
+    """Muestra estratificada por video sin cargar el dataset completo.
+
+    Parquet: por cada video (o max_videos elegidos al azar) las
+    rows_per_video filas se reparten entre todos sus row groups en proporción
+    a sus filas (ver _allocate_rows), y solo se leen los row groups que
+    reciben alguna; así un video escrito en varios bloques se muestrea
+    completo. CSV: no hay row groups; se saltean filas al azar al leer y se
+    muestrea por video.
+    """
+    path = resolve_dataset_path(path)
+    rng = np.random.default_rng(seed)
+    if not _is_parquet(path):
+        target = rows_per_video * (max_videos or 50)
+        keep = min(1.0, target / max(_csv_row_count(path), 1))
+        df = pd.read_csv(path, usecols=columns, skiprows=lambda i: i > 0 and rng.random() > keep)
+        if "video_id" not in df:
+            return df
+        shuffled = df.sample(frac=1.0, random_state=seed)
+        keep_rows = shuffled.groupby("video_id").cumcount() < rows_per_video
+        return shuffled[keep_rows].sort_index().reset_index(drop=True)
+    pf = pq.ParquetFile(path)
+    col = pf.metadata.schema.names.index("video_id")
+    strata = {}
+    for i in range(pf.num_row_groups):
+        key = _row_group_video(pf.metadata, i, col)
+        strata.setdefault(key if key is not None else f"rg{i}", []).append(i)
+    keys = list(strata)
+    if max_videos is not None and len(keys) > max_videos:
+        keys = [keys[k] for k in np.sort(rng.choice(len(keys), max_videos, replace=False))]
+    parts = []
+    for key in keys:
+        groups = strata[key]
+        quotas = _allocate_rows([pf.metadata.row_group(i).num_rows for i in groups], rows_per_video, rng)
+        for i, quota in zip(groups, quotas):
+            if not quota:
+                continue
+            df = pf.read_row_group(i, columns=columns).to_pandas()
+            if len(df) > quota:
+                df = df.iloc[np.sort(rng.choice(len(df), quota, replace=False))]
+            parts.append(df)
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+
+def manifest_path(path):
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def write_manifest(path, video_counts):
+    """Guarda junto al dataset las filas por video con que se escribió (lo valida verify_pipeline)."""
+    counts = {str(k): int(v) for k, v in video_counts.items()}
+    manifest = {
+        "dataset": os.path.basename(path),
+        "source": source_fingerprint(path),
+        "rows": sum(counts.values()),
+        "videos": counts,
+    }
+    tmp_path = manifest_path(path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(path))
+    return manifest
+
+
+def load_manifest(path):
+    """Manifiesto del dataset, o None si no existe."""
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -1,180 +1,478 @@
 """
 EDA básico para el dataset de MediaPipe + Labels
+
+Todos los agregados del EDA (conteos por etiqueta, frames por video,
+estadísticas descriptivas, histogramas, estadísticas de box plot por etiqueta
+y duración de segmentos) se calculan en una sola pasada y se guardan en un
+JSON junto al dataset (<dataset>.eda.json), con la huella del archivo. Si el
+dataset no cambió, el EDA se arma desde ese JSON sin leer el dataset.
+
+Los gráficos se dibujan desde los agregados (histogramas y box plots
+precalculados), en procesos paralelos, y solo se vuelven a dibujar si el
+PNG no existe o se dibujó con otros agregados: la huella de los agregados
+de cada figura se guarda en <out-dir>/.eda_figures.json, así varios
+datasets pueden compartir la carpeta de salida.
+
+Uso:
+    python eda_basic.py
+    python eda_basic.py --json > eda.json     # solo agregados, sin gráficos
+    python eda_basic.py --force               # recalcula y redibuja todo
 """
 
-import matplotlib.pyplot as plt
+import argparse
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-import seaborn as sns
-
-# Configuración
-sns.set_theme(style="whitegrid")
-plt.rcParams["figure.figsize"] = (14, 6)
-
-# Cargar dataset enriquecido
-print("📂 Cargando dataset enriquecido...")
-df = pd.read_csv("mediapipe_labels_dataset_enriched.csv")
-print(f"✓ {len(df)} frames, {df.shape[1]} columnas\n")
-
-# 1. DISTRIBUCIÓN DE ETIQUETAS
-print("=" * 60)
-print("1. DISTRIBUCIÓN DE ETIQUETAS")
-print("=" * 60)
-label_counts = df["label"].value_counts()
-print(label_counts)
-print(f"\nBalance (%): \n{(100 * label_counts / len(df)).round(2)}\n")
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-label_counts.plot(kind="bar", ax=axes[0], color="steelblue")
-axes[0].set_title("Conteo de frames por etiqueta")
-axes[0].set_ylabel("Frames")
-
-(100 * label_counts / len(df)).plot(kind="bar", ax=axes[1], color="coral")
-axes[1].set_title("Distribución de etiquetas (%)")
-axes[1].set_ylabel("Porcentaje (%)")
-plt.tight_layout()
-plt.savefig("eda_01_label_distribution.png", dpi=100, bbox_inches="tight")
-print("✓ Gráfico guardado: eda_01_label_distribution.png\n")
-
-# 2. FRAMES POR VIDEO
-print("=" * 60)
-print("2. FRAMES POR VIDEO")
-print("=" * 60)
-frames_per_video = df.groupby("video_id")["frame_opencv"].nunique()
-print(frames_per_video.describe())
-print(f"\nTotal videos: {len(frames_per_video)}\n")
-
-fig, ax = plt.subplots(figsize=(12, 5))
-frames_per_video.plot(kind="bar", ax=ax, color="mediumseagreen")
-ax.set_title("Frames por video")
-ax.set_ylabel("Número de frames")
-ax.set_xlabel("Video ID")
-plt.tight_layout()
-plt.savefig("eda_02_frames_per_video.png", dpi=100, bbox_inches="tight")
-print("✓ Gráfico guardado: eda_02_frames_per_video.png\n")
-
-# 3. CALIDAD DE LANDMARKS
-print("=" * 60)
-print("3. CALIDAD DE LANDMARKS")
-print("=" * 60)
-if "mean_visibility" in df:
-    print(f"Mean visibility: \n{df['mean_visibility'].describe()}\n")
-    print(f"Num visible landmarks: \n{df['num_visible_lms'].describe()}\n")
-    
-    if "low_quality" in df:
-        n_low = df["low_quality"].sum()
-        print(f"Frames de baja calidad: {n_low} ({100*n_low/len(df):.2f}%)\n")
-    
+
+import dataset_io
+import profiling
+
+EDA_VERSION = 1  # Cambiarlo invalida los agregados guardados
+HIST_BINS = {"mean_visibility": 50, "num_visible_lms": 34, "speed": 50, "angle": 50}
+FLIERS_MAX = 200  # Outliers guardados por caja (submuestreo uniforme si hay más)
+FIGURES = {
+    "label_distribution": "eda_01_label_distribution.png",
+    "frames_per_video": "eda_02_frames_per_video.png",
+    "landmark_quality": "eda_03_landmark_quality.png",
+    "velocities": "eda_04_velocities.png",
+    "angles": "eda_05_angles.png",
+    "angles_by_label": "eda_06_angles_by_label.png",
+    "segment_duration": "eda_07_segment_duration.png",
+}
+FIGURES_STAMP = ".eda_figures.json"  # Huella de los agregados de cada figura, en --out-dir
+
+
+def summary_path(dataset_path):
+    """Archivo de agregados junto al dataset."""
+    return os.path.splitext(dataset_path)[0] + ".eda.json"
+
+
+# === AGREGADOS ===
+def describe(values, columns):
+    """Equivalente a DataFrame.describe() para las columnas de `values` (n, k), en un solo cálculo."""
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # Columnas sin datos -> NaN
+        q = np.nanpercentile(values, [0, 25, 50, 75, 100], axis=0) if len(values) else \
+            np.full((5, values.shape[1]), np.nan)
+        count = (~np.isnan(values)).sum(axis=0)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+    stats = np.vstack([count, mean, std, q])
+    names = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+    return {col: {n: _json_float(v) for n, v in zip(names, stats[:, j])} for j, col in enumerate(columns)}
+
+
+def histogram(values, bins):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"counts": [], "edges": []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+
+def box_stats(values, groups, group_names):
+    """Estadísticas de box plot (formato de Axes.bxp) de cada columna por grupo.
+
+    `values` (n, k), `groups` códigos 0..len(group_names)-1 por fila.
+    Devuelve [columna][grupo] -> dict con med, q1, q3, whislo, whishi, fliers.
+    Bigotes a 1.5 * IQR, como DataFrame.boxplot.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    order = np.argsort(groups, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(groups, minlength=len(group_names)))])
+    out = [[] for _ in range(values.shape[1])]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for g, name in enumerate(group_names):
+            block = values[order[bounds[g]:bounds[g + 1]]]
+            if not len(block):
+                continue
+            q1, med, q3 = np.nanpercentile(block, [25, 50, 75], axis=0)
+            lo, hi = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            whislo = np.nanmin(np.where(block >= lo, block, np.nan), axis=0)
+            whishi = np.nanmax(np.where(block <= hi, block, np.nan), axis=0)
+            for j in range(values.shape[1]):
+                col = block[:, j]
+                fliers = np.sort(col[(col < lo[j]) | (col > hi[j])])
+                if len(fliers) > FLIERS_MAX:
+                    fliers = fliers[np.linspace(0, len(fliers) - 1, FLIERS_MAX).astype(int)]
+                if np.isnan(med[j]):
+                    continue
+                out[j].append({"label": str(name), "med": float(med[j]), "q1": float(q1[j]), "q3": float(q3[j]),
+                               "whislo": float(whislo[j]), "whishi": float(whishi[j]),
+                               "fliers": fliers.tolist()})
+    return out
+
+
+def _json_float(v):
+    return None if np.isnan(v) else float(v)
+
+
+def compute_summary(df):
+    """Todos los agregados del EDA a partir del DataFrame (una pasada por grupo de columnas)."""
+    n = len(df)
+    summary = {"n_frames": n, "n_columns": int(df.shape[1])}
+
+    # 1. Etiquetas (orden de value_counts: más frecuente primero)
+    labels = df["label"].astype(str).to_numpy()
+    names, codes, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    by_count = np.argsort(-counts, kind="stable")
+    summary["label_counts"] = {str(names[i]): int(counts[i]) for i in by_count}
+
+    # 2. Frames por video
+    fpv = df.groupby("video_id")["frame_opencv"].nunique()
+    summary["frames_per_video"] = {str(k): int(v) for k, v in fpv.items()}
+    summary["frames_per_video_describe"] = describe(fpv.to_numpy(), ["frame_opencv"])["frame_opencv"]
+
+    # 3. Calidad
+    quality_cols = [c for c in ("mean_visibility", "num_visible_lms") if c in df]
+    summary["quality"] = describe(df[quality_cols].to_numpy(dtype=np.float64), quality_cols)
+    summary["quality_hist"] = {c: histogram(df[c].to_numpy(), HIST_BINS[c]) for c in quality_cols}
+    summary["low_quality"] = int(df["low_quality"].sum()) if "low_quality" in df else None
+
+    # 4. Coordenadas
+    x_cols = [c for c in df.columns if c.startswith("x_") and not c.startswith("x_bbox")]
+    y_cols = [c for c in df.columns if c.startswith("y_") and not c.startswith("y_bbox")]
+    summary["coordinates"] = {}
+    for axis, cols in (("x", x_cols), ("y", y_cols)):
+        if cols:
+            vals = df[cols].to_numpy(dtype=np.float64)
+            summary["coordinates"][axis] = [_json_float(np.nanmin(vals)), _json_float(np.nanmax(vals))]
+
+    # 5-7. Velocidades y ángulos: describe + histogramas + box plots por etiqueta
+    speed_cols = [c for c in df.columns if c.startswith("speed_")]
+    angle_cols = [c for c in df.columns if "deg" in c]
+    speeds = df[speed_cols].to_numpy(dtype=np.float64)
+    angles = df[angle_cols].to_numpy(dtype=np.float64)
+    summary["speeds"] = describe(speeds, speed_cols)
+    summary["speeds_hist"] = {c: histogram(speeds[:, j], HIST_BINS["speed"]) for j, c in enumerate(speed_cols)}
+    summary["angles"] = describe(angles, angle_cols)
+    summary["angles_hist"] = {c: histogram(angles[:, j], HIST_BINS["angle"]) for j, c in enumerate(angle_cols)}
+    boxes = box_stats(angles, codes, names)
+    summary["angles_by_label"] = {c: boxes[j] for j, c in enumerate(angle_cols)}
+
+    # 8. Segmentos
+    if "segment_id" in df:
+        seg = df.groupby(["video_id", "segment_id", "label"]).size().reset_index(name="duration")
+        seg_names, seg_codes = np.unique(seg["label"].astype(str).to_numpy(), return_inverse=True)
+        durations = seg["duration"].to_numpy(dtype=np.float64)
+        summary["segments"] = {
+            "total": int(len(seg)),
+            "duration_by_label": {
+                str(name): describe(durations[seg_codes == g], ["duration"])["duration"]
+                for g, name in enumerate(seg_names)
+            },
+            "duration_box": box_stats(durations, seg_codes, seg_names)[0],
+        }
+    return summary
+
+
+def load_columns(dataset_path):
+    return dataset_io.select_columns(
+        dataset_io.dataset_columns(dataset_path),
+        exact=("label", "video_id", "frame_opencv", "mean_visibility", "num_visible_lms",
+               "low_quality", "segment_id"),
+        prefixes=("x_", "y_", "speed_"),
+        contains=("deg",),
+    )
+
+
+def load_or_compute_summary(dataset_path, force=False, profiler=None):
+    """Agregados del dataset: desde el JSON guardado si la huella coincide; si no, los calcula.
+
+    Devuelve (summary, desde_cache).
+    """
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    path = summary_path(dataset_path)
+    source = dataset_io.source_fingerprint(dataset_path)
+    if not force:
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached.get("version") == EDA_VERSION and cached.get("source") == source:
+                return cached["summary"], True
+        except (OSError, ValueError, KeyError):
+            pass
+    if profiler is not None:
+        profiler.checkpoint("load")
+    df = dataset_io.read_dataset(dataset_path, columns=load_columns(dataset_path))
+    if profiler is not None:
+        profiler.checkpoint("aggregates", frames=len(df))
+    summary = compute_summary(df)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": EDA_VERSION, "source": source, "summary": summary}, f)
+    os.replace(tmp_path, path)
+    return summary, False
+
+
+# === REPORTE EN TEXTO ===
+def _header(title):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def print_summary(summary):
+    n = summary["n_frames"]
+    label_counts = pd.Series(summary["label_counts"], name="count")
+    _header("1. DISTRIBUCIÓN DE ETIQUETAS")
+    print(label_counts)
+    print(f"\nBalance (%): \n{(100 * label_counts / n).round(2)}\n")
+
+    _header("2. FRAMES POR VIDEO")
+    print(pd.Series(summary["frames_per_video_describe"], name="frame_opencv"))
+    print(f"\nTotal videos: {len(summary['frames_per_video'])}\n")
+
+    _header("3. CALIDAD DE LANDMARKS")
+    if "mean_visibility" in summary["quality"]:
+        print(f"Mean visibility: \n{pd.Series(summary['quality']['mean_visibility'])}\n")
+        print(f"Num visible landmarks: \n{pd.Series(summary['quality']['num_visible_lms'])}\n")
+        if summary["low_quality"] is not None:
+            n_low = summary["low_quality"]
+            print(f"Frames de baja calidad: {n_low} ({100*n_low/n:.2f}%)\n")
+
+    _header("4. RANGO DE COORDENADAS")
+    for axis, (lo, hi) in summary["coordinates"].items():
+        print(f"{axis.upper()}: [{lo:.4f}, {hi:.4f}]")
+    print()
+
+    _header("5. VELOCIDADES POR LANDMARK")
+    for col, stats in summary["speeds"].items():
+        print(f"{col}: {stats}")
+    print()
+
+    _header("6. ÁNGULOS DE ARTICULACIONES")
+    for col, stats in summary["angles"].items():
+        print(f"{col}: {stats}")
+    print()
+
+    if "segments" in summary:
+        _header("8. ANÁLISIS DE SEGMENTACIÓN TEMPORAL")
+        print(f"Total segmentos: {summary['segments']['total']}")
+        print(f"\nDuración por etiqueta:")
+        print(pd.DataFrame(summary["segments"]["duration_by_label"]).T)
+        print()
+
+
+# === GRÁFICOS (desde los agregados) ===
+def _hist(ax, hist, color):
+    if hist["counts"]:
+        edges = np.asarray(hist["edges"])
+        ax.bar(edges[:-1], hist["counts"], width=np.diff(edges), align="edge", color=color, edgecolor="black")
+
+
+def _grid(plt, n, ncols, figsize_row):
+    n_rows = (n + ncols - 1) // ncols
+    fig, axes = plt.subplots(n_rows, ncols, figsize=(figsize_row[0], figsize_row[1] * n_rows))
+    axes = np.atleast_1d(axes).flatten()
+    for ax in axes[n:]:
+        ax.axis("off")
+    return fig, axes
+
+
+def plot_label_distribution(plt, summary):
+    counts = pd.Series(summary["label_counts"])
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    counts.plot(kind="bar", ax=axes[0], color="steelblue")
+    axes[0].set_title("Conteo de frames por etiqueta")
+    axes[0].set_ylabel("Frames")
+    (100 * counts / summary["n_frames"]).plot(kind="bar", ax=axes[1], color="coral")
+    axes[1].set_title("Distribución de etiquetas (%)")
+    axes[1].set_ylabel("Porcentaje (%)")
+    return fig
+
+
+def plot_frames_per_video(plt, summary):
+    fig, ax = plt.subplots(figsize=(12, 5))
+    pd.Series(summary["frames_per_video"]).plot(kind="bar", ax=ax, color="mediumseagreen")
+    ax.set_title("Frames por video")
+    ax.set_ylabel("Número de frames")
+    ax.set_xlabel("Video ID")
+    return fig
+
+
+def plot_landmark_quality(plt, summary):
+    hists = summary["quality_hist"]
+    if "mean_visibility" not in hists:
+        return None
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-    axes[0].hist(df["mean_visibility"], bins=50, color="skyblue", edgecolor="black")
+    _hist(axes[0], hists["mean_visibility"], "skyblue")
     axes[0].set_title("Distribución de mean_visibility")
     axes[0].set_xlabel("Mean visibility")
     axes[0].set_ylabel("Frames")
-    
-    axes[1].hist(df["num_visible_lms"], bins=34, color="lightcoral", edgecolor="black")
+    _hist(axes[1], hists["num_visible_lms"], "lightcoral")
     axes[1].set_title("Distribución de landmarks visibles")
     axes[1].set_xlabel("Número de landmarks visibles")
     axes[1].set_ylabel("Frames")
-    plt.tight_layout()
-    plt.savefig("eda_03_landmark_quality.png", dpi=100, bbox_inches="tight")
-    print("✓ Gráfico guardado: eda_03_landmark_quality.png\n")
-
-# 4. RANGO DE COORDENADAS
-print("=" * 60)
-print("4. RANGO DE COORDENADAS")
-print("=" * 60)
-x_cols = [c for c in df.columns if c.startswith("x_") and not c.startswith("x_bbox")]
-y_cols = [c for c in df.columns if c.startswith("y_") and not c.startswith("y_bbox")]
-print(f"X: [{df[x_cols].min().min():.4f}, {df[x_cols].max().max():.4f}]")
-print(f"Y: [{df[y_cols].min().min():.4f}, {df[y_cols].max().max():.4f}]")
-print()
-
-# 5. VELOCIDADES
-print("=" * 60)
-print("5. VELOCIDADES POR LANDMARK")
-print("=" * 60)
-speed_cols = [c for c in df.columns if c.startswith("speed_")]
-if speed_cols:
-    for col in speed_cols:
-        print(f"{col}: {df[col].describe().to_dict()}")
-    print()
-    
+    return fig
+
+
+def plot_velocities(plt, summary):
+    hists = list(summary["speeds_hist"].items())[:6]
+    if not hists:
+        return None
     fig, axes = plt.subplots(2, 3, figsize=(15, 8))
     axes = axes.flatten()
-    for idx, col in enumerate(speed_cols[:6]):
-        axes[idx].hist(df[col].dropna(), bins=50, color="mediumpurple", edgecolor="black")
-        axes[idx].set_title(f"Distribución de {col}")
-        axes[idx].set_xlabel("Velocidad (normalized/seg)")
-    plt.tight_layout()
-    plt.savefig("eda_04_velocities.png", dpi=100, bbox_inches="tight")
-    print("✓ Gráfico guardado: eda_04_velocities.png\n")
-
-# 6. ÁNGULOS
-print("=" * 60)
-print("6. ÁNGULOS DE ARTICULACIONES")
-print("=" * 60)
-angle_cols = [c for c in df.columns if "deg" in c]
-if angle_cols:
-    for col in angle_cols:
-        print(f"{col}: {df[col].describe().to_dict()}")
-    print()
-    
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    axes = axes.flatten()
-    for idx, col in enumerate(angle_cols):
-        axes[idx].hist(df[col].dropna(), bins=50, color="lightseagreen", edgecolor="black")
-        axes[idx].set_title(f"Distribución de {col}")
-        axes[idx].set_xlabel("Ángulo (grados)")
-    plt.tight_layout()
-    plt.savefig("eda_05_angles.png", dpi=100, bbox_inches="tight")
-    print("✓ Gráfico guardado: eda_05_angles.png\n")
-
-# 7. BOX PLOTS POR ETIQUETA
-print("=" * 60)
-print("7. ÁNGULOS POR ETIQUETA (BOX PLOT)")
-print("=" * 60)
-if angle_cols:
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    axes = axes.flatten()
-    for idx, col in enumerate(angle_cols):
-        df.boxplot(column=col, by="label", ax=axes[idx])
-        axes[idx].set_title(f"{col} por etiqueta")
-        axes[idx].set_xlabel("Etiqueta")
-        axes[idx].set_ylabel(col)
-    plt.suptitle("")
-    plt.tight_layout()
-    plt.savefig("eda_06_angles_by_label.png", dpi=100, bbox_inches="tight")
-    print("✓ Gráfico guardado: eda_06_angles_by_label.png\n")
-
-# 8. SEGMENTACIÓN TEMPORAL
-print("=" * 60)
-print("8. ANÁLISIS DE SEGMENTACIÓN TEMPORAL")
-print("=" * 60)
-if "segment_id" in df:
-    seg_info = df.groupby(["video_id", "segment_id", "label"]).size().reset_index(name="duration")
-    print(f"Total segmentos: {len(seg_info)}")
-    print(f"\nDuración por etiqueta:")
-    print(seg_info.groupby("label")["duration"].describe())
-    print()
-    
+    for ax, (col, hist) in zip(axes, hists):
+        _hist(ax, hist, "mediumpurple")
+        ax.set_title(f"Distribución de {col}")
+        ax.set_xlabel("Velocidad (normalized/seg)")
+    return fig
+
+
+def plot_angles(plt, summary):
+    hists = summary["angles_hist"]
+    if not hists:
+        return None
+    fig, axes = _grid(plt, len(hists), 2, (14, 5))
+    for ax, (col, hist) in zip(axes, hists.items()):
+        _hist(ax, hist, "lightseagreen")
+        ax.set_title(f"Distribución de {col}")
+        ax.set_xlabel("Ángulo (grados)")
+    return fig
+
+
+def plot_angles_by_label(plt, summary):
+    boxes = summary["angles_by_label"]
+    if not boxes:
+        return None
+    fig, axes = _grid(plt, len(boxes), 2, (14, 5))
+    for ax, (col, stats) in zip(axes, boxes.items()):
+        if stats:
+            ax.bxp(stats)
+        ax.set_title(f"{col} por etiqueta")
+        ax.set_xlabel("Etiqueta")
+        ax.set_ylabel(col)
+    return fig
+
+
+def plot_segment_duration(plt, summary):
+    if "segments" not in summary:
+        return None
     fig, ax = plt.subplots(figsize=(12, 6))
-    seg_info.boxplot(column="duration", by="label", ax=ax)
+    if summary["segments"]["duration_box"]:
+        ax.bxp(summary["segments"]["duration_box"])
     ax.set_title("Duración de segmentos por etiqueta")
     ax.set_xlabel("Etiqueta")
     ax.set_ylabel("Duración (frames)")
-    plt.suptitle("")
-    plt.tight_layout()
-    plt.savefig("eda_07_segment_duration.png", dpi=100, bbox_inches="tight")
-    print("✓ Gráfico guardado: eda_07_segment_duration.png\n")
-
-print("=" * 60)
-print("✅ EDA COMPLETADO")
-print("=" * 60)
-print("Archivos generados:")
-print("  - eda_01_label_distribution.png")
-print("  - eda_02_frames_per_video.png")
-print("  - eda_03_landmark_quality.png")
-print("  - eda_04_velocities.png")
-print("  - eda_05_angles.png")
-print("  - eda_06_angles_by_label.png")
-print("  - eda_07_segment_duration.png")
+    return fig
+
+
+def render_figure(name, summary, out_dir="."):
+    """Dibuja una figura (en un worker); devuelve la ruta o None si no aplica."""
+    # matplotlib/seaborn solo se importan si hay algo que dibujar
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid")
+    plt.rcParams["figure.figsize"] = (14, 6)
+    fig = globals()[f"plot_{name}"](plt, summary)
+    if fig is None:
+        return None
+    fig.tight_layout()
+    path = os.path.join(out_dir, FIGURES[name])
+    fig.savefig(path, dpi=100, bbox_inches="tight")
+    plt.close(fig)
+    return path
+
+
+def render_figures(summary, names, workers=1, out_dir="."):
+    """Dibuja las figuras `names` en paralelo (un proceso por figura)."""
+    if workers <= 1 or len(names) <= 1:
+        return [render_figure(name, summary, out_dir) for name in names]
+    with ProcessPoolExecutor(max_workers=min(workers, len(names))) as executor:
+        futures = [executor.submit(render_figure, name, summary, out_dir) for name in names]
+        return [f.result() for f in futures]
+
+
+def summary_digest(summary):
+    """Huella de los agregados (lo que determina el contenido de las figuras)."""
+    payload = json.dumps({"version": EDA_VERSION, "summary": summary}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_figure_stamps(out_dir="."):
+    try:
+        with open(os.path.join(out_dir, FIGURES_STAMP)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_figure_stamps(summary, names, out_dir="."):
+    """Registra que las figuras `names` de out_dir se dibujaron con `summary`."""
+    stamps = load_figure_stamps(out_dir)
+    digest = summary_digest(summary)
+    stamps.update({FIGURES[name]: digest for name in names})
+    path = os.path.join(out_dir, FIGURES_STAMP)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stamps, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stale_figures(summary, out_dir=".", force=False):
+    """Figuras que faltan o se dibujaron con otros agregados (otro dataset o versión)."""
+    stamps = load_figure_stamps(out_dir)
+    digest = summary_digest(summary)
+    return [name for name, fname in FIGURES.items()
+            if force or stamps.get(fname) != digest or not os.path.exists(os.path.join(out_dir, fname))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EDA básico del dataset enriquecido.")
+    parser.add_argument("--dataset", default=dataset_io.ENRICHED_DATASET)
+    parser.add_argument("--json", action="store_true", help="Solo imprime los agregados en JSON (sin gráficos)")
+    parser.add_argument("--force", action="store_true", help="Recalcula los agregados y redibuja las figuras")
+    parser.add_argument("--workers", type=int, default=min(len(FIGURES), os.cpu_count() or 1),
+                        help="Procesos para dibujar las figuras")
+    parser.add_argument("--out-dir", default=".", help="Carpeta de las figuras")
+    args = parser.parse_args()
+
+    profiler = profiling.RunProfiler("eda_basic")
+    dataset_path = dataset_io.resolve_dataset_path(args.dataset)
+    if not args.json:
+        print("📂 Cargando agregados del dataset enriquecido...")
+    summary, cached = load_or_compute_summary(dataset_path, args.force, profiler)
+
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        profiler.finish(verbose=False)
+        return
+
+    origin = f"desde {summary_path(dataset_path)}" if cached else "calculados en una pasada"
+    print(f"✓ {summary['n_frames']} frames, {summary['n_columns']} columnas (agregados {origin})\n")
+    profiler.checkpoint("report", frames=summary["n_frames"])
+    print_summary(summary)
+
+    profiler.checkpoint("figures")
+    names = stale_figures(summary, args.out_dir, args.force)
+    rendered = render_figures(summary, names, args.workers, args.out_dir)
+    save_figure_stamps(summary, [name for name, p in zip(names, rendered) if p], args.out_dir)
+    paths = [p for p in rendered if p]
+    profiler.count(figures=len(paths), cached=int(cached))
+
+    print("=" * 60)
+    print("✅ EDA COMPLETADO")
+    print("=" * 60)
+    print(f"Figuras redibujadas: {len(paths)} (las demás siguen al día)" if names != list(FIGURES)
+          else f"Figuras dibujadas: {len(paths)}")
+    print("Archivos generados:")
+    for fname in FIGURES.values():
+        print(f"  - {fname}")
+
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,242 @@
 """
 Script para enriquecer el dataset con features derivados:
-- Velocidades por landmark clave
-- Ángulos de articulaciones (rodillas, codos)
+- Velocidades y aceleraciones por landmark clave
+- Ángulos de articulaciones (rodillas, codos) e inclinación del tronco
+- Simetría corporal
 - Segmentación temporal por etiqueta
 - Marca de baja calidad
+
+Por defecto carga todo el dataset en memoria. Con --out-of-core procesa un
+video (o un bloque de --chunk-rows filas) a la vez y escribe cada bloque
+apenas está listo, así la memoria no depende del tamaño del corpus. Entre
+bloques de un mismo video solo se arrastra el estado de borde: las últimas
+HALO_ROWS filas (para las diferencias de velocidad/aceleración) y la última
+etiqueta y segment_id. Con --workers > 1 se enriquecen varios videos en
+paralelo.
+
+Con --smooth las coordenadas x, y, z se suavizan (ver smoothing.py) antes de
+calcular los features; el dataset enriquecido guarda las coordenadas
+suavizadas.
+
+Uso:
+    python enrich_dataset.py
+    python enrich_dataset.py --smooth one_euro
+    python enrich_dataset.py --out-of-core --chunk-rows 20000 --workers 4
 """
 
-import math
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
 
-SRC = "mediapipe_labels_dataset.csv"
-DST = "mediapipe_labels_dataset_enriched.csv"
+import dataset_io
+import features
+import profiling
+import smoothing
+from landmark_tensor import landmarks_from_frame
+
+SRC = dataset_io.RAW_DATASET
+DST = dataset_io.ENRICHED_DATASET
+CHUNK_ROWS = None  # None = un video completo por bloque (modo --out-of-core)
+# Filas previas que necesita un bloque para calcular sus features temporales
+# igual que con el video completo (aceleración + ventana de suavidad)
+HALO_ROWS = features.SMOOTHNESS_WINDOW + 2
 
-print(f"📂 Cargando: {SRC}")
-df = pd.read_csv(SRC).sort_values(["video_id", "frame_opencv"]).reset_index(drop=True)
 
-print(f"   ✓ {len(df)} frames cargados")
+def smooth_coordinates(df, settings, state=None):
+    """Suaviza x, y, z de cada video de `df`; devuelve (df, filtro del último video).
+
+    Con `state` (bloque que continúa un video) el filtro sigue desde el bloque
+    anterior, cuyas filas de borde ya están suavizadas.
+    """
+    if state is not None and settings["method"] == "savgol":
+        raise ValueError("El suavizado savgol es centrado: usa videos completos (sin --chunk-rows)")
+    lm = landmarks_from_frame(df)
+    ctx = features.FeatureContext(df["video_id"])
+    ts = df["timestamp_ms"].to_numpy(dtype=np.float64)
+    dt = np.diff(ts, prepend=np.nan) / 1000.0
+    dt[ctx.first] = np.nan
+    if state is not None:
+        dt[0] = (ts[0] - state["tail"]["timestamp_ms"].iloc[-1]) / 1000.0
+    smoothed, filt = smoothing.smooth_landmarks(lm, ctx.first, settings, dt=dt,
+                                                carry=state["filter"] if state else None)
+    cols = dataset_io.landmark_columns("xyz")
+    values = pd.DataFrame(smoothed[:, :, :3].reshape(len(df), -1), columns=cols, index=df.index)
+    return pd.concat([df.drop(columns=cols), values], axis=1)[df.columns], filt
 
-# Asegurar fps válido por video
-df["fps_eff"] = df.groupby("video_id")["fps"].transform(
-    lambda s: s.fillna(s.median()).replace(0, s.median()).fillna(30)
-)
 
-# Velocidades para landmarks clave
-# 15/16: muñecas, 25/26: rodillas, 27/28: tobillos
-keys = [15, 16, 25, 26, 27, 28]
-print(f"📊 Calculando velocidades para landmarks: {keys}")
-for i in keys:
-    dx = df.groupby("video_id")[f"x_{i}"].diff()
-    dy = df.groupby("video_id")[f"y_{i}"].diff()
-    df[f"speed_{i}"] = np.sqrt(dx.fillna(0)**2 + dy.fillna(0)**2) * df["fps_eff"]
+def enrich(df, state=None, smooth=None):
+    """Agrega los features derivados a filas ordenadas por video y frame.
 
-# Función para calcular ángulo (A-B-C en grados)
-def angle_deg(ax, ay, bx, by, cx, cy):
+    `state` es el estado de borde devuelto por la llamada anterior cuando
+    `df` continúa el mismo video (modo por bloques); None si `df` empieza en
+    el primer frame de cada video. `smooth` son los settings de suavizado
+    (smoothing.SMOOTHING) o None. Devuelve (df enriquecido, estado de borde).
     """
-    Calcula el ángulo en B del triángulo A-B-C.
-    Retorna ángulo en grados [0, 180].
+    df = df.reset_index(drop=True)
+    carry = state is not None and len(df) and state["video_id"] == df["video_id"].iloc[0]
+    filt = None
+    if smooth and smooth.get("method") and len(df):
+        df, filt = smooth_coordinates(df, smooth, state if carry else None)
+    halo = state["tail"] if carry else df.iloc[:0]
+    work = pd.concat([halo, df], ignore_index=True) if len(halo) else df.copy()
+
+    # Asegurar fps válido por video (en bloques, la mediana de los bloques previos si falta)
+    fallback = state["fps"] if carry else None
+    def fill_fps(s):
+        median = s.median()
+        if pd.isna(median) and fallback is not None:
+            median = fallback
+        return s.fillna(median).replace(0, median).fillna(30)
+    work["fps_eff"] = work.groupby("video_id")["fps"].transform(fill_fps)
+
+    # Features derivados vectorizados sobre el tensor de landmarks
+    # (velocidades, aceleraciones, ángulos de rodillas/codos, inclinación del tronco, simetría)
+    lm = landmarks_from_frame(work)
+    ctx = features.FeatureContext(work["video_id"], fps=work["fps_eff"], timestamp_ms=work["timestamp_ms"])
+    computed = features.compute_features(lm, ctx, features.ENRICH_FEATURES)
+    out = work.iloc[len(halo):].reset_index(drop=True)
+    out = pd.concat([out, pd.DataFrame({col: values[len(halo):] for col, values in computed.items()})], axis=1)
+
+    # Segmentos contiguos por etiqueta (para análisis temporal)
+    changed = out["label"].ne(out.groupby("video_id")["label"].shift())
+    if carry:
+        changed.iloc[0] = out["label"].iloc[0] != state["label"]
+    out["segment_id"] = changed.groupby(out["video_id"]).cumsum()
+    if carry:
+        first_video = out["video_id"] == out["video_id"].iloc[0]
+        out.loc[first_video, "segment_id"] += state["segment_id"]
+
+    # Marca de baja calidad
+    if "mean_visibility" in out and "num_visible_lms" in out:
+        out["low_quality"] = (out["mean_visibility"] < 0.5) | (out["num_visible_lms"] < 15)
+
+    new_state = None
+    if len(out):
+        last_video = out["video_id"].iloc[-1]
+        raw_tail = work.loc[work["video_id"] == last_video, df.columns].iloc[-HALO_ROWS:]
+        new_state = {
+            "video_id": last_video,
+            "tail": raw_tail.reset_index(drop=True),
+            "fps": float(out["fps_eff"].iloc[-1]),
+            "label": out["label"].iloc[-1],
+            "segment_id": int(out["segment_id"].iloc[-1]),
+            "filter": filt,
+        }
+    return out, new_state
+
+
+def iter_enriched_video(src, row_groups, chunk_rows=None, smooth=None):
+    """Enriquece un video (sus row groups en orden) bloque a bloque, arrastrando el estado de borde."""
+    state = None
+    for chunk in dataset_io.iter_video_chunks(src, row_groups=row_groups, batch_rows=chunk_rows):
+        out, state = enrich(chunk, state, smooth)
+        yield out
+
+
+def enrich_video(src, row_groups, chunk_rows=None, smooth=None):
+    """Tarea de un worker: todos los bloques enriquecidos de un video."""
+    return list(iter_enriched_video(src, row_groups, chunk_rows, smooth))
+
+
+def enrich_out_of_core(src, dst, chunk_rows=CHUNK_ROWS, workers=1, profiler=None, smooth=None):
+    """Enriquece `src` (Parquet) un video/bloque a la vez y lo escribe en `dst` a medida que avanza.
+
+    Los videos se escriben ordenados por video_id, como en el modo en memoria.
+    Con workers > 1 cada worker enriquece un video completo; solo hay
+    2 * workers videos en vuelo para acotar la memoria.
     """
-    BAx, BAy = ax - bx, ay - by
-    BCx, BCy = cx - bx, cy - by
-    num = BAx * BCx + BAy * BCy
-    den = np.sqrt(BAx**2 + BAy**2) * np.sqrt(BCx**2 + BCy**2)
-    # Evitar división por cero y asegurar cosang en [-1, 1]
-    cosang = np.clip(num / np.where(den == 0, np.nan, den), -1.0, 1.0)
-    return np.degrees(np.arccos(cosang))
-
-# Ángulos de articulaciones clave
-print("📐 Calculando ángulos de articulaciones...")
-
-# Rodillas: cadera(23/24) - rodilla(25/26) - tobillo(27/28)
-df["knee_left_deg"] = angle_deg(
-    df["x_23"], df["y_23"],  # cadera izq
-    df["x_25"], df["y_25"],  # rodilla izq
-    df["x_27"], df["y_27"]   # tobillo izq
-)
-df["knee_right_deg"] = angle_deg(
-    df["x_24"], df["y_24"],  # cadera der
-    df["x_26"], df["y_26"],  # rodilla der
-    df["x_28"], df["y_28"]   # tobillo der
-)
-
-# Codos: hombro(11/12) - codo(13/14) - muñeca(15/16)
-df["elbow_left_deg"] = angle_deg(
-    df["x_11"], df["y_11"],  # hombro izq
-    df["x_13"], df["y_13"],  # codo izq
-    df["x_15"], df["y_15"]   # muñeca izq
-)
-df["elbow_right_deg"] = angle_deg(
-    df["x_12"], df["y_12"],  # hombro der
-    df["x_14"], df["y_14"],  # codo der
-    df["x_16"], df["y_16"]   # muñeca der
-)
-
-# Segmentos contiguos por etiqueta (para análisis temporal)
-print("📍 Creando segmentos por etiqueta...")
-df["segment_id"] = (
-    df["label"].ne(df.groupby("video_id")["label"].shift())
-    .groupby(df["video_id"]).cumsum()
-)
-
-# Marca de baja calidad
-if "mean_visibility" in df and "num_visible_lms" in df:
-    df["low_quality"] = (df["mean_visibility"] < 0.5) | (df["num_visible_lms"] < 15)
-    n_low = df["low_quality"].sum()
-    print(f"⚠️  Frames de baja calidad: {n_low} ({100*n_low/len(df):.1f}%)")
-
-print(f"💾 Guardando: {DST}")
-df.to_csv(DST, index=False)
-
-print(f"✅ Enriquecimiento completado")
-print(f"   Nuevas columnas:")
-print(f"   - Metadatos: fps, timestamp_ms, width, height")
-print(f"   - Calidad: mean_visibility, num_visible_lms, low_quality")
-print(f"   - Posición/escala: hip_center_x, hip_center_y, torso_scale")
-print(f"   - Bounding box: bbox_xmin, bbox_ymin, bbox_xmax, bbox_ymax, bbox_area, bbox_aspect")
-print(f"   - Velocidades: speed_15, speed_16, speed_25, speed_26, speed_27, speed_28")
-print(f"   - Ángulos: knee_left_deg, knee_right_deg, elbow_left_deg, elbow_right_deg")
-print(f"   - Segmentación: segment_id")
-print(f"   Shape final: {df.shape}")
+    videos = dataset_io.video_row_groups(src)
+    stats = {"rows": 0, "low_quality": 0}
+
+    def write(writer, out):
+        writer.write(out)
+        stats["rows"] += len(out)
+        if "low_quality" in out:
+            stats["low_quality"] += int(out["low_quality"].sum())
+        if profiler is not None:
+            profiler.add("enrich", frames=len(out))
+
+    with dataset_io.DatasetWriter(dst) as writer:
+        if workers <= 1:
+            for _, row_groups in videos:
+                for out in iter_enriched_video(src, row_groups, chunk_rows, smooth):
+                    write(writer, out)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for _, row_groups in videos:
+                    pending.append(executor.submit(enrich_video, src, row_groups, chunk_rows, smooth))
+                    if len(pending) >= 2 * workers:
+                        for out in pending.popleft().result():
+                            write(writer, out)
+                while pending:
+                    for out in pending.popleft().result():
+                        write(writer, out)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega features derivados al dataset de landmarks.")
+    parser.add_argument("--src", default=SRC)
+    parser.add_argument("--dst", default=DST)
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Procesa y escribe un video/bloque a la vez (memoria acotada; requiere Parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="Filas máximas por bloque en --out-of-core (por defecto, un video completo)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Videos enriquecidos en paralelo en --out-of-core")
+    parser.add_argument("--smooth", choices=smoothing.METHODS, default=smoothing.SMOOTHING["method"],
+                        help="Suaviza las coordenadas antes de los features (savgol requiere videos completos)")
+    args = parser.parse_args()
+    smooth = {**smoothing.SMOOTHING, "method": args.smooth}
+
+    profiler = profiling.RunProfiler("enrich_dataset")
+
+    if args.out_of_core:
+        print(f"📂 Enriqueciendo por bloques: {args.src} -> {args.dst}")
+        print(f"📊 Features: {features.ENRICH_FEATURES}")
+        with profiler.stage("enrich"):
+            stats = enrich_out_of_core(args.src, args.dst, args.chunk_rows, args.workers, profiler, smooth)
+        n_rows, n_low = stats["rows"], stats["low_quality"]
+        print(f"   ✓ {n_rows} frames procesados")
+    else:
+        print(f"📂 Cargando: {args.src}")
+        profiler.checkpoint("load")
+        df = dataset_io.read_dataset(args.src).sort_values(["video_id", "frame_opencv"]).reset_index(drop=True)
+        print(f"   ✓ {len(df)} frames cargados")
+
+        print(f"📊 Calculando features: {features.ENRICH_FEATURES}")
+        print("📍 Creando segmentos por etiqueta...")
+        profiler.checkpoint("features", frames=len(df))
+        df, _ = enrich(df, smooth=smooth)
+
+        print(f"💾 Guardando: {args.dst}")
+        profiler.checkpoint("write", frames=len(df))
+        dataset_io.write_dataset(df, args.dst)
+        n_rows = len(df)
+        n_low = int(df["low_quality"].sum()) if "low_quality" in df else 0
+        profiler.count(videos=int(df["video_id"].nunique()))
+    profiler.count(rows=n_rows)
+
+    if n_rows:
+        print(f"⚠️  Frames de baja calidad: {n_low} ({100*n_low/n_rows:.1f}%)")
+    print(f"✅ Enriquecimiento completado")
+    print(f"   Nuevas columnas:")
+    print(f"   - Metadatos: fps, timestamp_ms, width, height")
+    print(f"   - Calidad: mean_visibility, num_visible_lms, low_quality")
+    print(f"   - Posición/escala: hip_center_x, hip_center_y, torso_scale")
+    print(f"   - Bounding box: bbox_xmin, bbox_ymin, bbox_xmax, bbox_ymax, bbox_area, bbox_aspect")
+    print(f"   - Velocidades: speed_15, speed_16, speed_25, speed_26, speed_27, speed_28")
+    print(f"   - Aceleraciones: accel_15, accel_16, accel_25, accel_26, accel_27, accel_28")
+    print(f"   - Ángulos: knee_left_deg, knee_right_deg, elbow_left_deg, elbow_right_deg, trunk_tilt_deg")
+    print(f"   - Simetría: simetria_hombros, simetria_caderas, simetria_rodillas, simetria_promedio")
+    print(f"   - Segmentación: segment_id")
+    print(f"   Filas: {n_rows}")
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
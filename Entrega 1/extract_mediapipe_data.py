@@ -1,202 +1,629 @@
+import argparse
 import json
-import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import cv2
-import mediapipe as mp
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+import dataset_io
+import frame_alignment
+import landmark_cache
+import pose_backends
+import profiling
+from label_index import LabelIndex
+from frame_reader import PrefetchingFrameReader
+from roi import ROI, PosePreprocessor
+
 # === CONFIG ===
 VIDEOS_DIR = "Videos APO"
 LABEL_FILE = "project-label-studio.json"
-OUTPUT_CSV = "mediapipe_labels_dataset.csv"
+OUTPUT_DATASET = dataset_io.RAW_DATASET
+NUM_WORKERS = 1  # 1 = modo serial; >1 = un proceso (con su propio Pose) por worker
+CACHE_DIR = landmark_cache.CACHE_DIR  # None desactiva la caché de landmarks
+# Muestreo de frames para Pose (ver FrameSampler); por defecto, todos los frames
+SAMPLING = {"stride": 1, "adaptive": False, "max_stride": 8, "motion_threshold": 0.004, "boundary_margin": 10}
+PREFETCH_BUFFER = 8  # Frames decodificados por adelantado (0 = sin límite)
+BUFFER_CHUNK = 1024  # Frames que crece el buffer de landmarks cuando se llena
+# Frame OpenCV -> Label Studio: "timestamps" (CAP_PROP_POS_MSEC, ver frame_alignment) o "ratio" (lineal)
+ALIGNMENT = {"method": "timestamps", "labelstudio_fps": frame_alignment.ALIGNMENT["labelstudio_fps"]}
+
+# === BACKEND DE POSE ===
+POSE_BACKEND = dict(pose_backends.DEFAULT_BACKEND)  # Ver pose_backends (mediapipe, synthetic, null, replay)
+pose = None  # Se crea perezosamente: un backend por proceso
+
+def set_pose_backend(spec):
+    """Cambia el backend de pose del proceso (dict de configuración o instancia de PoseBackend)."""
+    global pose, POSE_BACKEND
+    if pose is not None:
+        pose.close()
+    pose = None
+    if isinstance(spec, pose_backends.PoseBackend):
+        pose = spec
+    else:
+        POSE_BACKEND = dict(spec)
+
+def get_pose():
+    """Devuelve el backend de pose del proceso actual (lo crea si no existe)."""
+    global pose
+    if pose is None:
+        pose = pose_backends.create_backend(POSE_BACKEND)
+    return pose
 
-# === MEDIAPIPE ===
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+def run_pose(image_rgb):
+    """Corre Pose sobre una imagen RGB; devuelve landmarks (33, 4) float32 o None."""
+    return get_pose()(image_rgb)
+
+def pose_cache_settings(sampling=None, video_id=None, roi=None, alignment=None):
+    """Configuración del modelo (muestreo, ROI y alineación incluidos) que forma parte de la clave de la caché."""
+    settings = get_pose().settings()
+    roi = {**ROI, **(roi or {})}
+    if roi["enabled"] or roi["target_size"]:
+        settings["roi"] = roi
+    sampling = sampling or SAMPLING
+    if sampling.get("stride", 1) != 1 or sampling.get("adaptive"):
+        settings["sampling"] = dict(sampling)
+        if sampling.get("adaptive"):
+            # El muestreo adaptativo depende de las fronteras de etiqueta del video
+            settings["boundaries"] = label_index.intervals(video_id)
+            # ...y de cómo esas fronteras se pasan a frames OpenCV
+            alignment = alignment or ALIGNMENT
+            settings["alignment"] = {"method": alignment["method"],
+                                     "labelstudio_fps": float(alignment["labelstudio_fps"])}
+    return settings
 
 # === CARGAR ETIQUETAS ===
-with open(LABEL_FILE, 'r') as f:
-    label_data = json.load(f)
+label_data = []
+label_index = LabelIndex([])  # Índice de intervalos, reconstruido al cargar etiquetas
+
+def set_label_data(labels):
+    """Fija las etiquetas globales y reconstruye el índice de intervalos."""
+    global label_data, label_index
+    label_data = labels
+    label_index = LabelIndex(labels)
+    return label_data
+
+def load_label_data(path=LABEL_FILE):
+    """Carga el JSON exportado de Label Studio en la variable global label_data."""
+    with open(path, 'r') as f:
+        return set_label_data(json.load(f))
 
 def get_max_label_frame(video_id):
     """Obtiene el frame máximo etiquetado en Label Studio para un video."""
-    for entry in label_data:
-        if entry["id"] == video_id:
-            results = entry["annotations"][0]["result"]
-            max_frame = 0
-            for r in results:
-                end = r["value"]["ranges"][0]["end"]
-                if end > max_frame:
-                    max_frame = end
-            return max_frame
-    return None
+    return label_index.max_frame(video_id)
 
 def extract_label_for_frame(video_id, frame_idx_labelstudio):
     """Devuelve la etiqueta (actividad) correspondiente a un frame según el JSON."""
-    for entry in label_data:
-        if entry["id"] == video_id:
-            results = entry["annotations"][0]["result"]
-            for r in results:
-                start = r["value"]["ranges"][0]["start"]
-                end = r["value"]["ranges"][0]["end"]
-                label = r["value"]["timelinelabels"][0]
-                if start <= frame_idx_labelstudio <= end:
-                    return label
-    return "Unlabeled"
-
-def process_video(video_path, video_id):
-    """Extrae landmarks de cada frame y los une con etiquetas temporales."""
+    return label_index.label_for_frame(video_id, frame_idx_labelstudio)
+
+def compute_frame_ratio(video_id, total_frames_opencv):
+    """Factor de conversión frame OpenCV -> frame Label Studio."""
+    max_frame_labelstudio = get_max_label_frame(video_id)
+    # OpenCV cuenta todos los frames, Label Studio puede usar un índice diferente
+    return (max_frame_labelstudio / total_frames_opencv) if (max_frame_labelstudio and total_frames_opencv) else 1.0
+
+def label_boundaries_opencv(video_id, total_frames_opencv, alignment=None):
+    """Frames OpenCV donde empieza o termina un rango etiquetado (con la tabla de `alignment` si se pasa)."""
+    bounds = [b for start, end, _ in label_index.intervals(video_id) for b in (start, end)]
+    if alignment is not None and len(alignment):
+        return np.unique(alignment.opencv_frames(bounds))
+    ratio = compute_frame_ratio(video_id, total_frames_opencv)
+    return np.unique((np.asarray(bounds, dtype=np.float64) / ratio).astype(np.int64))
+
+class FrameSampler:
+    """Decide en qué frames correr Pose.
+
+    - stride=N: solo cada N-ésimo frame.
+    - adaptive: paso que se duplica (hasta max_stride) mientras el movimiento
+      entre inferencias es bajo, vuelve a 1 cuando el movimiento supera
+      motion_threshold y es siempre 1 a menos de boundary_margin frames de
+      una frontera de etiqueta.
+    """
+
+    def __init__(self, sampling, boundaries=()):
+        self.stride = max(int(sampling.get("stride", 1)), 1)
+        self.adaptive = bool(sampling.get("adaptive", False))
+        self.max_stride = max(int(sampling.get("max_stride", 8)), 1)
+        self.motion_threshold = sampling.get("motion_threshold", 0.004)
+        self.margin = sampling.get("boundary_margin", 10)
+        self.boundaries = np.asarray(boundaries, dtype=np.int64)
+        self.step = 1
+        self.next_frame = 0
+        self._last = None  # (frame, landmarks) de la última pose detectada
+
+    def _near_boundary(self, idx):
+        if not len(self.boundaries):
+            return False
+        i = np.searchsorted(self.boundaries, idx)
+        near = [abs(self.boundaries[j] - idx) for j in (i - 1, i) if 0 <= j < len(self.boundaries)]
+        return min(near) <= self.margin
+
+    def should_infer(self, idx):
+        if not self.adaptive:
+            return idx % self.stride == 0
+        return idx >= self.next_frame or self._near_boundary(idx)
+
+    def observe(self, idx, landmarks):
+        """Actualiza el paso con el resultado de Pose en el frame idx (None = sin pose)."""
+        if not self.adaptive:
+            return
+        if landmarks is None:
+            self.step = 1
+        else:
+            if self._last is not None:
+                last_idx, last_lm = self._last
+                motion = np.abs(landmarks[:, :2] - last_lm[:, :2]).mean() / max(idx - last_idx, 1)
+                self.step = 1 if motion > self.motion_threshold else min(self.step * 2, self.max_stride)
+            self._last = (idx, landmarks)
+        self.next_frame = idx + self.step
+
+class LandmarkBuffer:
+    """Resultados de Pose de un video en arrays preasignados que crecen por bloques.
+
+    Evita una lista de arrays por frame: cada resultado se copia directo a su
+    fila del buffer (n, 33, 4) float32.
+    """
+
+    def __init__(self, capacity=BUFFER_CHUNK):
+        capacity = max(int(capacity), 1)
+        self.frames = np.empty(capacity, dtype=np.int32)
+        self.landmarks = np.empty((capacity, 33, 4), dtype=np.float32)
+        self.attempted = np.empty(capacity, dtype=np.int32)
+        self.n = 0
+        self.n_attempted = 0
+
+    @staticmethod
+    def _grow(array, size):
+        grown = np.empty((size + BUFFER_CHUNK,) + array.shape[1:], dtype=array.dtype)
+        grown[:size] = array[:size]
+        return grown
+
+    def add(self, frame_idx, landmarks):
+        """Registra el resultado de Pose del frame (landmarks None = sin detección)."""
+        if self.n_attempted == len(self.attempted):
+            self.attempted = self._grow(self.attempted, self.n_attempted)
+        self.attempted[self.n_attempted] = frame_idx
+        self.n_attempted += 1
+        if landmarks is None:
+            return
+        if self.n == len(self.frames):
+            self.frames = self._grow(self.frames, self.n)
+            self.landmarks = self._grow(self.landmarks, self.n)
+        self.frames[self.n] = frame_idx
+        self.landmarks[self.n] = landmarks
+        self.n += 1
+
+    def arrays(self):
+        """(frames, landmarks, attempted) con solo las filas usadas."""
+        return self.frames[:self.n], self.landmarks[:self.n], self.attempted[:self.n_attempted]
+
+def extract_raw_landmarks(video_path, verbose=True, sampling=None, video_id=None, roi=None,
+                          prefetch=True, timings=None, alignment=None):
+    """Decodifica un video y corre Pose en los frames elegidos por el muestreo.
+
+    Devuelve los landmarks crudos (sin etiquetas) como dict de arrays:
+    frames (índices OpenCV con pose detectada), landmarks (n, 33, 4) con
+    [x, y, z, visibility], attempted (frames donde se corrió Pose),
+    timestamps_ms (CAP_PROP_POS_MSEC de cada frame leído) y metadatos del
+    video. `alignment` (FrameAlignment) ubica las fronteras de etiqueta del
+    muestreo adaptativo. Los frames saltados solo se avanzan con grab(),
+    sin decodificar ni convertir la imagen. `roi` activa el recorte por ROI
+    y/o la reducción de resolución antes de Pose (ver roi.PosePreprocessor).
+
+    Con prefetch=True un hilo de fondo decodifica y convierte los frames
+    siguientes mientras corre Pose (ver frame_reader). Con muestreo
+    adaptativo el prefetch se desactiva: qué frame sigue depende del
+    movimiento medido por Pose en el anterior, así que un lector adelantado
+    tendría que decodificar y convertir todos los frames (o decidir con un
+    estado del muestreo desactualizado, distinto en cada ejecución). Si se pasa un dict en
+    `timings`, se llena con los tiempos de decodificación, conversión, espera
+    e inferencia y los conteos de frames.
+    """
+    sampling = sampling or SAMPLING
+    preprocessor = PosePreprocessor(roi)
     cap = cv2.VideoCapture(video_path)
-    data = []
 
     # Obtener información del video
     total_frames_opencv = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    
-    # Obtener el frame máximo de Label Studio
-    max_frame_labelstudio = get_max_label_frame(video_id)
-    
-    # Calcular factor de conversión
-    # OpenCV cuenta todos los frames, Label Studio puede usar un índice diferente
-    frame_ratio = (max_frame_labelstudio / total_frames_opencv) if (max_frame_labelstudio and total_frames_opencv) else 1.0
-    
-    print(f"  📊 Frames OpenCV: {total_frames_opencv}, Label Studio máx: {max_frame_labelstudio}, FPS: {fps:.2f}")
-    print(f"  🔄 Ratio de conversión: {frame_ratio:.4f}")
-    
-    frame_idx_opencv = 0
-    pbar = tqdm(total=total_frames_opencv, desc=os.path.basename(video_path))
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(frame_rgb)
-
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Convertir el frame de OpenCV al índice de Label Studio
-            frame_idx_labelstudio = int(frame_idx_opencv * frame_ratio)
-            
-            row = {
-                'video_id': video_id, 
-                'frame_opencv': frame_idx_opencv,
-                'frame_labelstudio': frame_idx_labelstudio,
-                'fps': fps,
-                'timestamp_ms': (frame_idx_opencv / fps * 1000.0) if fps > 0 else None,
-                'width': width,
-                'height': height
-            }
-            
-            xs, ys, vis_vals = [], [], []
-            for i, lm in enumerate(landmarks):
-                row[f'x_{i}'] = lm.x
-                row[f'y_{i}'] = lm.y
-                row[f'z_{i}'] = lm.z
-                row[f'v_{i}'] = lm.visibility
-                xs.append(lm.x)
-                ys.append(lm.y)
-                vis_vals.append(lm.visibility)
-
-            # Calidad: media de visibility y número de landmarks visibles
-            row['mean_visibility'] = float(sum(vis_vals) / len(vis_vals)) if vis_vals else 0.0
-            row['num_visible_lms'] = int(sum(1 for v in vis_vals if v >= 0.5))
-
-            # Centro de caderas y escala de torso (normalización espacial)
-            try:
-                lh, rh = landmarks[23], landmarks[24]   # left/right hip
-                ls, rs = landmarks[11], landmarks[12]   # left/right shoulder
-                hip_cx = (lh.x + rh.x) / 2.0
-                hip_cy = (lh.y + rh.y) / 2.0
-                # Distancias de torso en coordenadas normalizadas
-                d_l = math.hypot(ls.x - lh.x, ls.y - lh.y)
-                d_r = math.hypot(rs.x - rh.x, rs.y - rh.y)
-                torso_scale = max((d_l + d_r) / 2.0, 1e-6)
-                row['hip_center_x'] = hip_cx
-                row['hip_center_y'] = hip_cy
-                row['torso_scale'] = torso_scale
-            except Exception:
-                row['hip_center_x'] = None
-                row['hip_center_y'] = None
-                row['torso_scale'] = None
-
-            # Bounding box del esqueleto
-            if xs and ys:
-                xmin, xmax = float(min(xs)), float(max(xs))
-                ymin, ymax = float(min(ys)), float(max(ys))
-                row['bbox_xmin'] = xmin
-                row['bbox_ymin'] = ymin
-                row['bbox_xmax'] = xmax
-                row['bbox_ymax'] = ymax
-                row['bbox_area'] = max((xmax - xmin), 0.0) * max((ymax - ymin), 0.0)
-                row['bbox_aspect'] = (xmax - xmin) / (ymax - ymin) if (ymax - ymin) not in (0, None) else None
-            else:
-                row['bbox_xmin'] = row['bbox_ymin'] = row['bbox_xmax'] = row['bbox_ymax'] = None
-                row['bbox_area'] = row['bbox_aspect'] = None
-
-            row['label'] = extract_label_for_frame(video_id, frame_idx_labelstudio)
-            data.append(row)
-
-        frame_idx_opencv += 1
+
+    boundaries = ()
+    if sampling.get("adaptive") and video_id is not None:
+        boundaries = label_boundaries_opencv(video_id, total_frames_opencv, alignment)
+    sampler = FrameSampler(sampling, boundaries)
+
+    # Frames que se saltan: con prefetch solo el stride fijo se conoce de antemano;
+    # el adaptativo decide frame a frame en el mismo hilo que Pose (sin prefetch)
+    prefetch = prefetch and not sampler.adaptive
+    if prefetch:
+        skip = lambda idx: idx % sampler.stride != 0
+    else:
+        skip = lambda idx: not sampler.should_infer(idx)
+    reader = PrefetchingFrameReader(cap, buffer_size=PREFETCH_BUFFER, skip=skip, threaded=prefetch)
+
+    # Capacidad inicial: los frames que se espera pasar por Pose
+    buffer = LandmarkBuffer(total_frames_opencv // sampler.stride + 1 if total_frames_opencv > 0 else BUFFER_CHUNK)
+    infer_s = 0.0
+    pbar = tqdm(total=total_frames_opencv, desc=os.path.basename(video_path), disable=not verbose)
+
+    for frame_idx_opencv, frame_rgb in reader:
         pbar.update(1)
+        if frame_rgb is None:
+            continue
+
+        t0 = time.perf_counter()
+        landmarks = preprocessor.run(frame_rgb, run_pose)
+        infer_s += time.perf_counter() - t0
+        buffer.add(frame_idx_opencv, landmarks)
+        sampler.observe(frame_idx_opencv, landmarks)
 
     cap.release()
     pbar.close()
-    return pd.DataFrame(data)
+    frames, landmarks, attempted = buffer.arrays()
+    if timings is not None:
+        timings.update(reader.counters())
+        timings["infer_s"] = infer_s
+        timings["frames_inferred"] = len(attempted)
+    return {
+        "frames": frames,
+        "landmarks": landmarks,
+        "attempted": attempted,
+        "timestamps_ms": np.asarray(reader.timestamps_ms, dtype=np.float64),
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "total_frames": total_frames_opencv,
+    }
 
-# === PROCESAR TODOS LOS VIDEOS ===
-all_data = []
+def interpolate_skipped(raw):
+    """Rellena por interpolación lineal los frames saltados entre dos poses detectadas.
 
-# Crear un mapeo directo entre el nombre del video en el JSON y el archivo real
-video_mapping = {}
-for entry in label_data:
-    json_video_name = entry["file_upload"].split("/")[-1]
-    base_name = json_video_name.split("-")[-1]  # ej: Video_1.mp4, Video_12.mp4
-    
-    # Normalizar el nombre (remover guión bajo y agregar espacio)
-    # Video_1.mp4 -> Video 1.mp4
-    video_num = base_name.replace("Video_", "").replace(".mp4", "")
-    real_video_name = f"Video {video_num}.mp4"
+    Solo se rellenan frames donde no se corrió Pose (los intentos sin
+    detección quedan vacíos). Devuelve (frames, landmarks, interpolated_mask)
+    ordenados por frame.
+    """
+    frames, lm = raw["frames"].astype(np.int64), raw["landmarks"]
+    # Entradas de caché sin "attempted" son de extracciones sin saltos
+    if len(frames) < 2 or "attempted" not in raw:
+        return frames, lm, np.zeros(len(frames), dtype=bool)
+    candidates = np.arange(frames[0] + 1, frames[-1])
+    skipped = candidates[~np.isin(candidates, raw["attempted"])]
+    if not len(skipped):
+        return frames, lm, np.zeros(len(frames), dtype=bool)
+
+    hi = np.searchsorted(frames, skipped)
+    lo = hi - 1
+    w = ((skipped - frames[lo]) / (frames[hi] - frames[lo])).astype(np.float32)[:, None, None]
+    filled = lm[lo] * (1.0 - w) + lm[hi] * w
+
+    all_frames = np.concatenate([frames, skipped])
+    order = np.argsort(all_frames, kind="stable")
+    interpolated = np.concatenate([np.zeros(len(frames), bool), np.ones(len(skipped), bool)])
+    return all_frames[order], np.concatenate([lm, filled])[order], interpolated[order]
+
+def build_video_rows(raw, video_id, verbose=True, interpolate=False, alignment=None):
+    """Une los landmarks crudos de un video con las etiquetas temporales.
+
+    Todas las columnas se calculan vectorizadas sobre el array (n, 33, 4) del
+    video y el DataFrame se arma una sola vez. La columna frame_source indica
+    si la pose del frame se infirió con Pose ("inferred") o se interpoló entre
+    dos frames inferidos ("interpolated").
+
+    Con `alignment` (frame_alignment.FrameAlignment) el frame de Label Studio,
+    la etiqueta y timestamp_ms salen de la tabla por marcas de tiempo del
+    video; sin ella, del ratio lineal (compute_frame_ratio) y de frame / fps.
+    """
+    total_frames_opencv = raw["total_frames"]
+    fps = raw["fps"]
+    width = raw["width"]
+    height = raw["height"]
     
-    video_mapping[entry["id"]] = real_video_name
-
-# Verificar qué videos existen en el directorio
-available_videos = os.listdir(VIDEOS_DIR)
-print("Videos disponibles en el directorio:")
-for video in sorted(available_videos):
-    print(f"  - {video}")
-
-print("\n" + "="*60)
-print("MAPEO DE VIDEOS:")
-print("="*60)
-for json_id, expected_name in sorted(video_mapping.items()):
-    status = "✅" if expected_name in available_videos else "❌"
-    print(f"{status} ID {json_id:2d} -> {expected_name}")
-print("="*60 + "\n")
-
-# Procesar cada video según el mapeo
-for entry in label_data:
-    video_id = entry["id"]
-    expected_video_name = video_mapping[video_id]
+    # Obtener el frame máximo de Label Studio y el factor de conversión
+    max_frame_labelstudio = get_max_label_frame(video_id)
+    frame_ratio = compute_frame_ratio(video_id, total_frames_opencv)
     
-    if expected_video_name in available_videos:
-        video_path = os.path.join(VIDEOS_DIR, expected_video_name)
-        print(f"\n✅ Procesando {expected_video_name} (ID {video_id}) ...")
-        df = process_video(video_path, video_id)
-        all_data.append(df)
+    if verbose:
+        print(f"  📊 Frames OpenCV: {total_frames_opencv}, Label Studio máx: {max_frame_labelstudio}, FPS: {fps:.2f}")
+        if alignment is None:
+            print(f"  🔄 Ratio de conversión: {frame_ratio:.4f}")
+        else:
+            report = frame_alignment.validate_alignment(alignment, label_index, video_id)
+            drift = report.get("max_ratio_drift_frames")
+            print(f"  🔄 Alineación por {alignment.source} ({alignment.labelstudio_fps:g} fps en Label Studio)"
+                  + (f"; el ratio lineal se desfasaba hasta {drift} frames" if drift else ""))
+            for issue in report["issues"]:
+                print(f"  ⚠️  {issue}")
+
+    # Convertir los frames de OpenCV al índice de Label Studio y etiquetar
+    # todo el video de una vez con el índice de intervalos
+    if interpolate:
+        frames, all_landmarks, interpolated = interpolate_skipped(raw)
+    else:
+        frames, all_landmarks = raw["frames"], raw["landmarks"]
+        interpolated = np.zeros(len(frames), dtype=bool)
+    frames = frames.astype(np.int64)
+    if alignment is None:
+        frames_labelstudio = (frames.astype(np.float64) * frame_ratio).astype(np.int64)
+        labels = label_index.labels_for_frames(video_id, frames_labelstudio)
+        timestamps = frames / fps * 1000.0 if fps > 0 else np.full(len(frames), np.nan)
+    else:
+        frames_labelstudio = alignment.labelstudio_frames(frames)
+        labels = alignment.labels_for_frames(label_index, video_id, frames)
+        timestamps = alignment.timestamps_for_frames(frames)
+
+    n = len(frames)
+    lm = np.asarray(all_landmarks, dtype=np.float64).reshape(n, 33, 4)
+    xs, ys, vis = lm[:, :, 0], lm[:, :, 1], lm[:, :, 3]
+    columns = {
+        'video_id': np.full(n, video_id),
+        'frame_opencv': frames,
+        'frame_labelstudio': frames_labelstudio,
+        'fps': np.full(n, fps, dtype=np.float64),
+        'timestamp_ms': timestamps,
+        'width': np.full(n, width),
+        'height': np.full(n, height),
+    }
+    columns.update(zip(dataset_io.landmark_columns(), lm.reshape(n, 33 * 4).T))
+
+    # Calidad: media de visibility y número de landmarks visibles
+    columns['mean_visibility'] = vis.mean(axis=1)
+    columns['num_visible_lms'] = (vis >= 0.5).sum(axis=1)
+
+    # Centro de caderas y escala de torso (normalización espacial)
+    lh, rh = lm[:, 23], lm[:, 24]   # left/right hip
+    ls, rs = lm[:, 11], lm[:, 12]   # left/right shoulder
+    columns['hip_center_x'] = (lh[:, 0] + rh[:, 0]) / 2.0
+    columns['hip_center_y'] = (lh[:, 1] + rh[:, 1]) / 2.0
+    # Distancias de torso en coordenadas normalizadas
+    d_l = np.hypot(ls[:, 0] - lh[:, 0], ls[:, 1] - lh[:, 1])
+    d_r = np.hypot(rs[:, 0] - rh[:, 0], rs[:, 1] - rh[:, 1])
+    columns['torso_scale'] = np.maximum((d_l + d_r) / 2.0, 1e-6)
+
+    # Bounding box del esqueleto
+    xmin, xmax = xs.min(axis=1, initial=np.inf), xs.max(axis=1, initial=-np.inf)
+    ymin, ymax = ys.min(axis=1, initial=np.inf), ys.max(axis=1, initial=-np.inf)
+    columns['bbox_xmin'] = xmin
+    columns['bbox_ymin'] = ymin
+    columns['bbox_xmax'] = xmax
+    columns['bbox_ymax'] = ymax
+    columns['bbox_area'] = np.maximum(xmax - xmin, 0.0) * np.maximum(ymax - ymin, 0.0)
+    h = ymax - ymin
+    columns['bbox_aspect'] = np.divide(xmax - xmin, h, out=np.full(n, np.nan), where=h != 0)
+
+    columns['frame_source'] = np.where(interpolated, 'interpolated', 'inferred').astype(object)
+    columns['label'] = labels
+    return pd.DataFrame(columns)
+
+def process_video(video_path, video_id, verbose=True, cache_dir=CACHE_DIR, sampling=None, interpolate=False,
+                  roi=None, prefetch=True, timings=None, alignment=None):
+    """Extrae landmarks de cada frame y los une con etiquetas temporales.
+
+    Si `cache_dir` no es None, los landmarks crudos se leen de / guardan en la
+    caché por contenido: un video ya procesado con la misma configuración de
+    Pose no se vuelve a decodificar, solo se rehace la unión con etiquetas.
+    `sampling` controla qué frames pasan por Pose (ver FrameSampler) e
+    `interpolate` rellena los frames saltados y `roi` configura el recorte /
+    reducción de resolución previo a Pose. `prefetch` solapa decodificación
+    e inferencia con un hilo lector. `alignment` configura el mapeo de frames
+    a Label Studio (ver ALIGNMENT); la tabla por marcas de tiempo se guarda
+    en `cache_dir`/alignment y se arma con los tiempos de la decodificación.
+    Solo hace falta una pasada previa de grab() cuando el muestreo adaptativo
+    tiene que extraer (sus fronteras se ubican con la tabla antes de
+    decodificar) y la tabla no está en caché, o con entradas de caché
+    antiguas sin marcas de tiempo.
+    Con verbose=False no se imprime nada ni se muestra barra de tqdm
+    (modo usado por los workers del procesamiento paralelo). Si se pasa un
+    dict en `timings`, se llena con los tiempos de extracción (ver
+    extract_raw_landmarks), el de armado de filas (rows_s) y cache_hit.
+    """
+    sampling = sampling or SAMPLING
+    alignment = alignment or ALIGNMENT
+    timings = {} if timings is None else timings
+    align_dir = os.path.join(cache_dir, "alignment") if cache_dir is not None else None
+    use_timestamps = alignment["method"] == "timestamps"
+    table = None
+    raw = None
+    if cache_dir is not None:
+        key = landmark_cache.cache_key(video_path, pose_cache_settings(sampling, video_id, roi, alignment))
+        raw = landmark_cache.load_landmarks(key, cache_dir)
+        if raw is not None and verbose:
+            print("  💾 Landmarks leídos de la caché")
+    timings["cache_hit"] = raw is not None
+    if raw is None:
+        if use_timestamps and sampling.get("adaptive"):
+            # Las fronteras del muestreo adaptativo se ubican con la tabla antes de decodificar
+            table = frame_alignment.get_alignment(video_path, alignment["labelstudio_fps"], align_dir)
+        raw = extract_raw_landmarks(video_path, verbose=verbose, sampling=sampling, video_id=video_id, roi=roi,
+                                    prefetch=prefetch, timings=timings, alignment=table)
+        if verbose:
+            print(f"  ⏱️  Decodificación {timings['decode_s']:.2f} s | conversión {timings['convert_s']:.2f} s | "
+                  f"Pose {timings['infer_s']:.2f} s | espera del lector {timings['wait_s']:.2f} s")
+        if cache_dir is not None:
+            landmark_cache.save_landmarks(key, raw, cache_dir)
+    if use_timestamps and table is None:
+        table = frame_alignment.get_alignment(video_path, alignment["labelstudio_fps"], align_dir,
+                                              raw.get("timestamps_ms"), raw["fps"], raw["total_frames"])
+    t0 = time.perf_counter()
+    df = build_video_rows(raw, video_id, verbose=verbose, interpolate=interpolate, alignment=table)
+    timings["rows_s"] = time.perf_counter() - t0
+    return df
+
+def build_video_mapping(label_data):
+    """Crea un mapeo directo entre el id del video en el JSON y el archivo real."""
+    video_mapping = {}
+    for entry in label_data:
+        json_video_name = entry["file_upload"].split("/")[-1]
+        base_name = json_video_name.split("-")[-1]  # ej: Video_1.mp4, Video_12.mp4
+        
+        # Normalizar el nombre (remover guión bajo y agregar espacio)
+        # Video_1.mp4 -> Video 1.mp4
+        video_num = base_name.replace("Video_", "").replace(".mp4", "")
+        real_video_name = f"Video {video_num}.mp4"
+        
+        video_mapping[entry["id"]] = real_video_name
+    return video_mapping
+
+# === PROCESAMIENTO PARALELO ===
+def _init_worker(labels, backend_spec):
+    """Inicializa un worker: copia las etiquetas y crea su propio backend de pose."""
+    set_label_data(labels)
+    set_pose_backend(backend_spec)
+    get_pose().warmup()
+
+def _process_video_task(video_path, video_id, options):
+    """Tarea de un worker: procesa un video completo sin salida por consola."""
+    t0 = time.perf_counter()
+    timings = {}
+    df = process_video(video_path, video_id, verbose=False, timings=timings, **options)
+    return df, time.perf_counter() - t0, timings
+
+def record_timings(profiler, timings, n_rows):
+    """Suma los tiempos de un video (ver process_video) a las etapas del perfil."""
+    if timings.get("cache_hit"):
+        profiler.count(cache_hits=1)
+    else:
+        profiler.add("decode", frames=timings["frames_decoded"] + timings["frames_skipped"],
+                     wall_s=timings["decode_s"] + timings["convert_s"], wait_s=timings["wait_s"])
+        profiler.add("pose", frames=timings["frames_inferred"], wall_s=timings["infer_s"])
+    profiler.add("rows", frames=n_rows, wall_s=timings["rows_s"])
+    profiler.count(videos=1, rows=n_rows)
+
+def process_videos_parallel(tasks, num_workers, profiler=None, **options):
+    """Procesa la lista de (video_path, video_id) en un pool de procesos.
+
+    Cada worker tiene su propia instancia de Pose. El progreso se reporta
+    por video a medida que terminan, y los DataFrames se devuelven en el
+    mismo orden de `tasks`, de modo que el resultado coincide con el modo serial.
+    `options` se pasa tal cual a process_video (cache_dir, sampling, ...).
+    Si se pasa un RunProfiler, se le suman los tiempos de cada video.
+    """
+    results = [None] * len(tasks)
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                             initargs=(label_data, POSE_BACKEND)) as executor:
+        futures = {
+            executor.submit(_process_video_task, video_path, video_id, options): idx
+            for idx, (video_path, video_id) in enumerate(tasks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            idx = futures[future]
+            video_path, video_id = tasks[idx]
+            df, elapsed, timings = future.result()
+            results[idx] = df
+            if profiler is not None:
+                record_timings(profiler, timings, len(df))
+            print(f"  [{done}/{len(tasks)}] ✅ {os.path.basename(video_path)} (ID {video_id}): "
+                  f"{len(df)} frames en {elapsed:.1f} s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrae landmarks de MediaPipe y los une con las etiquetas de Label Studio.")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help="Número de procesos en paralelo (1 = serial)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="Carpeta de la caché de landmarks crudos")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignora la caché y vuelve a correr Pose en todos los videos")
+    parser.add_argument("--stride", type=int, default=SAMPLING["stride"],
+                        help="Corre Pose solo cada N frames")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Muestreo adaptativo: denso cerca de fronteras de etiqueta y con movimiento alto")
+    parser.add_argument("--max-stride", type=int, default=SAMPLING["max_stride"],
+                        help="Paso máximo del muestreo adaptativo")
+    parser.add_argument("--interpolate", action="store_true",
+                        help="Rellena los frames saltados interpolando landmarks")
+    parser.add_argument("--roi", action="store_true",
+                        help="Recorta cada frame al ROI de la persona (bbox del frame anterior + margen)")
+    parser.add_argument("--roi-margin", type=float, default=ROI["margin"],
+                        help="Margen del ROI, como fracción del tamaño del bbox")
+    parser.add_argument("--target-size", type=int, default=ROI["target_size"],
+                        help="Reduce la imagen para que su lado mayor no supere este tamaño (px)")
+    parser.add_argument("--no-prefetch", action="store_true",
+                        help="Decodifica en el mismo hilo que Pose (sin lector en segundo plano; "
+                             "con --adaptive siempre es así)")
+    parser.add_argument("--backend", default=POSE_BACKEND["name"], choices=["mediapipe", "synthetic", "null"],
+                        help="Backend de pose (synthetic/null: pruebas de carga sin inferencia)")
+    parser.add_argument("--model-complexity", type=int, default=POSE_BACKEND["model_complexity"],
+                        choices=[0, 1, 2], help="Complejidad del modelo de MediaPipe (0 = más rápido)")
+    parser.add_argument("--alignment", choices=["timestamps", "ratio"], default=ALIGNMENT["method"],
+                        help="Mapeo frame OpenCV -> Label Studio: marcas de tiempo del video o ratio lineal")
+    parser.add_argument("--labelstudio-fps", type=float, default=ALIGNMENT["labelstudio_fps"],
+                        help="frameRate de la línea de tiempo de Label Studio")
+    args = parser.parse_args()
+    if args.backend == "mediapipe":
+        set_pose_backend({"name": "mediapipe", "model_complexity": args.model_complexity})
     else:
-        print(f"\n❌ [ERROR] No se encontró el archivo: {expected_video_name} (ID {video_id})")
-
-# === GUARDAR DATASET ===
-if all_data:
-    final_df = pd.concat(all_data, ignore_index=True)
-    final_df.to_csv(OUTPUT_CSV, index=False)
-    print(f"\n✅ Dataset guardado en: {OUTPUT_CSV}")
-else:
-    print("⚠️ No se generó ningún dataset.")
+        set_pose_backend({"name": args.backend})
+    options = {
+        "cache_dir": None if args.no_cache else args.cache_dir,
+        "sampling": {**SAMPLING, "stride": args.stride, "adaptive": args.adaptive,
+                     "max_stride": args.max_stride},
+        "interpolate": args.interpolate,
+        "roi": {**ROI, "enabled": args.roi, "margin": args.roi_margin, "target_size": args.target_size},
+        "prefetch": not args.no_prefetch,
+        "alignment": {"method": args.alignment, "labelstudio_fps": args.labelstudio_fps},
+    }
+
+    profiler = profiling.RunProfiler("extract_mediapipe_data")
+    with profiler.stage("labels"):
+        load_label_data(LABEL_FILE)
+    video_mapping = build_video_mapping(label_data)
+
+    # Verificar qué videos existen en el directorio
+    available_videos = os.listdir(VIDEOS_DIR)
+    print("Videos disponibles en el directorio:")
+    for video in sorted(available_videos):
+        print(f"  - {video}")
+
+    print("\n" + "="*60)
+    print("MAPEO DE VIDEOS:")
+    print("="*60)
+    for json_id, expected_name in sorted(video_mapping.items()):
+        status = "✅" if expected_name in available_videos else "❌"
+        print(f"{status} ID {json_id:2d} -> {expected_name}")
+    print("="*60 + "\n")
+
+    # Lista de videos a procesar, en el orden del JSON
+    tasks = []
+    for entry in label_data:
+        video_id = entry["id"]
+        expected_video_name = video_mapping[video_id]
+        
+        if expected_video_name in available_videos:
+            tasks.append((os.path.join(VIDEOS_DIR, expected_video_name), video_id))
+        else:
+            print(f"\n❌ [ERROR] No se encontró el archivo: {expected_video_name} (ID {video_id})")
+
+    # === PROCESAR TODOS LOS VIDEOS ===
+    # "extract" es el tiempo de pared total; decode / pose / rows suman lo medido en cada video
+    with profiler.stage("extract"):
+        if args.workers > 1 and len(tasks) > 1:
+            print(f"\n⚙️  Procesando {len(tasks)} videos con {args.workers} workers ...")
+            all_data = process_videos_parallel(tasks, args.workers, profiler=profiler, **options)
+        else:
+            all_data = []
+            for video_path, video_id in tasks:
+                print(f"\n✅ Procesando {os.path.basename(video_path)} (ID {video_id}) ...")
+                timings = {}
+                all_data.append(process_video(video_path, video_id, timings=timings, **options))
+                record_timings(profiler, timings, len(all_data[-1]))
+    profiler.add("extract", frames=sum(len(df) for df in all_data))
+
+    # === GUARDAR DATASET ===
+    if all_data:
+        with profiler.stage("write"):
+            final_df = pd.concat(all_data, ignore_index=True)
+            dataset_io.write_dataset(final_df, OUTPUT_DATASET)
+            dataset_io.write_manifest(OUTPUT_DATASET, final_df["video_id"].value_counts(sort=False))
+        print(f"\n✅ Dataset guardado en: {OUTPUT_DATASET}")
+        print(f"   Manifiesto (filas por video): {dataset_io.manifest_path(OUTPUT_DATASET)}")
+    else:
+        print("⚠️ No se generó ningún dataset.")
+    profiler.finish()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Motor de features vectorizado sobre el tensor de landmarks (frames, 33, 4).
+
+Reúne en un solo módulo los features que antes estaban repartidos entre
+enrich_dataset.py (velocidades, ángulos) y las funciones por fila del notebook
+(calculate_spatial_features / calculate_temporal_features). Todo se calcula en
+lote con NumPy para el corpus completo, respetando los límites de cada video.
+
+Para agregar un feature nuevo basta con registrarlo en un solo lugar:
+
+    @register_feature("mi_feature", ["col_a", "col_b"])
+    def _mi_feature(lm, ctx):
+        return np.stack([...], axis=1)   # (frames, 2)
+"""
+
+import numpy as np
+
+# Índices de landmarks de MediaPipe Pose usados por los features
+NOSE = 0
+SHOULDER_L, SHOULDER_R = 11, 12
+ELBOW_L, ELBOW_R = 13, 14
+WRIST_L, WRIST_R = 15, 16
+HIP_L, HIP_R = 23, 24
+KNEE_L, KNEE_R = 25, 26
+ANKLE_L, ANKLE_R = 27, 28
+FOOT_L, FOOT_R = 31, 32
+
+# 15/16: muñecas, 25/26: rodillas, 27/28: tobillos
+SPEED_LANDMARKS = [15, 16, 25, 26, 27, 28]
+
+# Ángulo en B del triángulo A-B-C
+JOINT_ANGLES = {
+    "knee_left_deg": (HIP_L, KNEE_L, ANKLE_L),
+    "knee_right_deg": (HIP_R, KNEE_R, ANKLE_R),
+    "elbow_left_deg": (SHOULDER_L, ELBOW_L, WRIST_L),
+    "elbow_right_deg": (SHOULDER_R, ELBOW_R, WRIST_R),
+}
+
+# Articulaciones promediadas en velocidad_promedio_articulaciones (notebook EDA)
+MOTION_JOINTS = [SHOULDER_L, SHOULDER_R, ELBOW_L, ELBOW_R, HIP_L, HIP_R, KNEE_L, KNEE_R]
+
+SMOOTHNESS_WINDOW = 5
+EPS = 1e-6
+
+# Features que escribe enrich_dataset.py
+ENRICH_FEATURES = ["speed", "acceleration", "joint_angles", "trunk_tilt", "symmetry"]
+
+# name -> (columnas, función)
+FEATURES = {}
+
+
+def register_feature(name, columns):
+    """Registra una función (lm, ctx) -> array (frames, len(columns))."""
+    def decorator(fn):
+        FEATURES[name] = (list(columns), fn)
+        return fn
+    return decorator
+
+
+class FeatureContext:
+    """Información por frame que necesitan los features temporales.
+
+    first: True en el primer frame de cada video (corta las diferencias).
+    fps: fps efectivo por frame. timestamp_ms: marca de tiempo por frame.
+    """
+
+    def __init__(self, video_ids, fps=None, timestamp_ms=None):
+        video_ids = np.asarray(video_ids)
+        n = len(video_ids)
+        self.first = np.ones(n, dtype=bool)
+        self.first[1:] = video_ids[1:] != video_ids[:-1]
+        # Posición del frame dentro de su video (0, 1, 2, ...)
+        starts = np.flatnonzero(self.first)
+        self.position = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n)))
+        self.fps = np.full(n, 30.0) if fps is None else np.asarray(fps, dtype=np.float64)
+        self.timestamp_ms = (
+            np.full(n, np.nan) if timestamp_ms is None else np.asarray(timestamp_ms, dtype=np.float64)
+        )
+
+
+def angle_deg(ax, ay, bx, by, cx, cy):
+    """
+    Calcula el ángulo en B del triángulo A-B-C.
+    Retorna ángulo en grados [0, 180].
+    """
+    BAx, BAy = ax - bx, ay - by
+    BCx, BCy = cx - bx, cy - by
+    num = BAx * BCx + BAy * BCy
+    den = np.sqrt(BAx**2 + BAy**2) * np.sqrt(BCx**2 + BCy**2)
+    # Evitar división por cero y asegurar cosang en [-1, 1]
+    cosang = np.clip(num / np.where(den == 0, np.nan, den), -1.0, 1.0)
+    return np.degrees(np.arccos(cosang))
+
+
+def _xy(lm, i):
+    """Coordenadas (frames, 2) del landmark i en float64."""
+    return lm[:, i, :2].astype(np.float64)
+
+
+def _center(lm, *idx):
+    return np.mean([_xy(lm, i) for i in idx], axis=0)
+
+
+def _dist(p, q):
+    return np.sqrt(((p - q) ** 2).sum(axis=1))
+
+
+def _prev(arr, ctx):
+    """Valor del frame anterior dentro del mismo video (el primero se repite a sí mismo)."""
+    prev = np.roll(arr, 1, axis=0)
+    prev[ctx.first] = arr[ctx.first]
+    return prev
+
+
+def _delta_seconds(ctx):
+    """Delta de tiempo con el frame anterior, en segundos (NaN en el primer frame)."""
+    dt = (ctx.timestamp_ms - _prev(ctx.timestamp_ms, ctx)) / 1000.0
+    dt[ctx.first] = np.nan
+    return dt
+
+
+def _window_var(values, ctx, window):
+    """Varianza de las últimas `window` muestras (0 en las primeras `window` posiciones del video)."""
+    out = np.zeros(len(values))
+    if len(values) >= window:
+        views = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1:] = views.var(axis=1)
+    out[ctx.position < window] = 0.0
+    return out
+
+
+@register_feature("speed", [f"speed_{i}" for i in SPEED_LANDMARKS])
+def _speed(lm, ctx):
+    cols = []
+    for i in SPEED_LANDMARKS:
+        p = _xy(lm, i)
+        cols.append(_dist(p, _prev(p, ctx)) * ctx.fps)
+    return np.stack(cols, axis=1)
+
+
+@register_feature("acceleration", [f"accel_{i}" for i in SPEED_LANDMARKS])
+def _acceleration(lm, ctx):
+    speed = _speed(lm, ctx)
+    acc = (speed - _prev(speed, ctx)) * ctx.fps[:, None]
+    acc[ctx.position < 2] = 0.0  # La velocidad del primer frame no es real
+    return acc
+
+
+@register_feature("joint_angles", list(JOINT_ANGLES))
+def _joint_angles(lm, ctx):
+    cols = []
+    for a, b, c in JOINT_ANGLES.values():
+        pa, pb, pc = _xy(lm, a), _xy(lm, b), _xy(lm, c)
+        cols.append(angle_deg(pa[:, 0], pa[:, 1], pb[:, 0], pb[:, 1], pc[:, 0], pc[:, 1]))
+    return np.stack(cols, axis=1)
+
+
+@register_feature("trunk_tilt", ["trunk_tilt_deg"])
+def _trunk_tilt(lm, ctx):
+    # Ángulo del vector caderas -> hombros respecto a la vertical (y crece hacia abajo)
+    hips = _center(lm, HIP_L, HIP_R)
+    shoulders = _center(lm, SHOULDER_L, SHOULDER_R)
+    v = shoulders - hips
+    return np.degrees(np.arctan2(v[:, 0], -v[:, 1]))[:, None]
+
+
+@register_feature("symmetry", ["simetria_hombros", "simetria_caderas", "simetria_rodillas", "simetria_promedio"])
+def _symmetry(lm, ctx):
+    sims = [np.abs(lm[:, l, 1] - lm[:, r, 1]).astype(np.float64)
+            for l, r in ((SHOULDER_L, SHOULDER_R), (HIP_L, HIP_R), (KNEE_L, KNEE_R))]
+    return np.stack([*sims, np.mean(sims, axis=0)], axis=1)
+
+
+@register_feature("bbox", ["bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax", "bbox_area", "bbox_aspect"])
+def _bbox(lm, ctx):
+    xs, ys = lm[:, :, 0].astype(np.float64), lm[:, :, 1].astype(np.float64)
+    xmin, xmax = xs.min(axis=1), xs.max(axis=1)
+    ymin, ymax = ys.min(axis=1), ys.max(axis=1)
+    w, h = xmax - xmin, ymax - ymin
+    area = np.maximum(w, 0.0) * np.maximum(h, 0.0)
+    aspect = w / np.where(h == 0, np.nan, h)
+    return np.stack([xmin, ymin, xmax, ymax, area, aspect], axis=1)
+
+
+@register_feature("spatial", [
+    "altura_normalizada", "relacion_torso_piernas", "dist_vertical_cabeza_cadera",
+    "apertura_piernas_norm", "apertura_brazos_norm",
+    "ancho_hombros", "ancho_caderas", "relacion_hombros_caderas",
+])
+def _spatial(lm, ctx):
+    nose = _xy(lm, NOSE)
+    shoulders = _center(lm, SHOULDER_L, SHOULDER_R)
+    hips = _center(lm, HIP_L, HIP_R)
+    knees = _center(lm, KNEE_L, KNEE_R)
+    feet = _center(lm, FOOT_L, FOOT_R)
+    torso = _dist(shoulders, hips)
+    shoulder_w = _dist(_xy(lm, SHOULDER_L), _xy(lm, SHOULDER_R))
+    hip_w = _dist(_xy(lm, HIP_L), _xy(lm, HIP_R))
+    return np.stack([
+        _dist(nose, feet) / (torso + EPS),
+        torso / (_dist(hips, knees) + EPS),
+        np.abs(nose[:, 1] - hips[:, 1]),
+        _dist(_xy(lm, FOOT_L), _xy(lm, FOOT_R)) / (shoulder_w + EPS),
+        _dist(_xy(lm, WRIST_L), _xy(lm, WRIST_R)) / (shoulder_w + EPS),
+        shoulder_w,
+        hip_w,
+        shoulder_w / (hip_w + EPS),
+    ], axis=1)
+
+
+@register_feature("body_motion", [
+    "velocidad_centro_cuerpo", "direccion_movimiento_x", "direccion_movimiento_y",
+    "velocidad_promedio_articulaciones", "rotacion_torso", "rotacion_cabeza",
+    "aceleracion_centro_cuerpo", "suavidad_movimiento",
+])
+def _body_motion(lm, ctx):
+    # Mismas definiciones que calculate_temporal_features del notebook EDA
+    dt = _delta_seconds(ctx)
+    valid = dt > 0
+
+    center = _center(lm, SHOULDER_L, SHOULDER_R, HIP_L, HIP_R)
+    step = center - _prev(center, ctx)
+    step_norm = np.sqrt((step ** 2).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        speed = np.where(valid, step_norm / dt, 0.0)
+    direction = np.where(valid[:, None], step / (step_norm[:, None] + EPS), 0.0)
+
+    dt_eps = np.nan_to_num(dt) + EPS
+    joints = np.mean(
+        [_dist(_xy(lm, i), _prev(_xy(lm, i), ctx)) for i in MOTION_JOINTS], axis=0
+    ) / dt_eps
+
+    shoulder_vec = _xy(lm, SHOULDER_R) - _xy(lm, SHOULDER_L)
+    torso_angle = np.arctan2(shoulder_vec[:, 1], shoulder_vec[:, 0])
+    head_vec = _xy(lm, NOSE) - _center(lm, SHOULDER_L, SHOULDER_R)
+    head_angle = np.arctan2(head_vec[:, 1], head_vec[:, 0])
+
+    accel = (speed - _prev(speed, ctx)) / dt_eps
+    accel[ctx.position < 2] = 0.0
+
+    out = np.stack([
+        speed, direction[:, 0], direction[:, 1], joints,
+        torso_angle - _prev(torso_angle, ctx),
+        head_angle - _prev(head_angle, ctx),
+        accel,
+        np.zeros(len(speed)),
+    ], axis=1)
+    out[ctx.first, :6] = 0.0
+    # Suavidad: varianza de la aceleración en la ventana
+    out[:, 7] = _window_var(accel, ctx, SMOOTHNESS_WINDOW)
+    return out
+
+
+def feature_columns(names=None):
+    """Columnas producidas por los features `names` (todos si es None)."""
+    names = list(FEATURES) if names is None else names
+    return [c for n in names for c in FEATURES[n][0]]
+
+
+def compute_features(lm, ctx, names=None):
+    """Calcula los features registrados sobre un tensor (frames, 33, 4).
+
+    Devuelve un dict columna -> array (frames,), en el orden de registro.
+    """
+    names = list(FEATURES) if names is None else names
+    out = {}
+    for name in names:
+        columns, fn = FEATURES[name]
+        values = fn(lm, ctx)
+        for j, col in enumerate(columns):
+            out[col] = values[:, j]
+    return out
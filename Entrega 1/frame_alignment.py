@@ -0,0 +1,304 @@
+"""
+Alineación de frames OpenCV <-> Label Studio por marcas de tiempo.
+
+El mapeo lineal `frame_ratio = max_label_frame / CAP_PROP_FRAME_COUNT` falla
+cuando el último rango etiquetado termina antes que el video (el ratio queda
+chico) y se desfasa en videos de celular con frame rate variable. Aquí cada
+frame decodificado se ubica por su marca de tiempo real (CAP_PROP_POS_MSEC)
+y se convierte al índice de Label Studio con el frame rate de su línea de
+tiempo (atributo frameRate del tag <Video>, 24 por defecto):
+
+    frame_labelstudio = floor(t_s * labelstudio_fps) + LABELSTUDIO_BASE
+
+La tabla (un entero por frame OpenCV) se construye una vez por video y se
+guarda en ALIGNMENT_CACHE_DIR, direccionada por el hash del archivo y la
+configuración; unir etiquetas es entonces un acceso a array por frame
+(`FrameAlignment.labels`).
+
+Si el backend de OpenCV no entrega marcas de tiempo válidas (todas 0 o no
+crecientes), se usa idx / fps (frame rate constante) y se avisa en `source`.
+
+`validate_alignment` contrasta la tabla con las fronteras de los rangos
+anotados: rangos que terminan después del video (frame rate de Label Studio
+incorrecto), fronteras lejos de cualquier frame decodificado (frames
+perdidos), frame rate variable y la diferencia con el mapeo lineal antiguo.
+
+Uso:
+    python frame_alignment.py                                # todos los videos del JSON
+    python frame_alignment.py --video "Videos APO/Video 1.mp4" --video-id 39
+    python frame_alignment.py --labelstudio-fps 30
+"""
+
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+import landmark_cache
+from label_index import UNLABELED, LabelIndex
+
+ALIGNMENT = {
+    "labelstudio_fps": 24.0,  # frameRate de la línea de tiempo de Label Studio
+    "tolerance_frames": 2,    # Frames de Label Studio que se toleran al validar
+    "vfr_threshold": 0.05,    # Desvío relativo de los intervalos que indica frame rate variable
+}
+LABELSTUDIO_BASE = 1  # Label Studio numera los frames desde 1
+ALIGNMENT_VERSION = 1
+ALIGNMENT_CACHE_DIR = os.path.join(landmark_cache.CACHE_DIR, "alignment")
+
+_loaded = {}  # (ruta, tamaño, mtime, settings) -> FrameAlignment ya leída en este proceso
+
+
+def read_timestamps(video_path):
+    """Marca de tiempo (ms) de cada frame, avanzando con grab() sin convertir imágenes."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    reported = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    timestamps = []
+    while cap.grab():
+        timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+    cap.release()
+    return np.asarray(timestamps, dtype=np.float64), fps, reported
+
+
+def clean_timestamps(timestamps_ms, fps):
+    """Marcas de tiempo desde 0; (ts, "timestamps") o (idx / fps, "constant_fps") si no sirven."""
+    ts = np.asarray(timestamps_ms, dtype=np.float64)
+    if len(ts) > 1 and np.isfinite(ts).all() and (np.diff(ts) > 0).all():
+        return ts - ts[0], "timestamps"
+    return np.arange(len(ts)) * 1000.0 / (fps if fps > 0 else 30.0), "constant_fps"
+
+
+class FrameAlignment:
+    """Tabla frame OpenCV -> frame de Label Studio de un video."""
+
+    def __init__(self, timestamps_ms, labelstudio_fps, fps, reported_frames=0, source="timestamps"):
+        self.timestamps_ms = np.asarray(timestamps_ms, dtype=np.float64)
+        self.labelstudio_fps = float(labelstudio_fps)
+        self.fps = float(fps)
+        self.reported_frames = int(reported_frames)
+        self.source = source
+        self.to_labelstudio = (np.floor(self.timestamps_ms / 1000.0 * self.labelstudio_fps + 1e-6)
+                               .astype(np.int64) + LABELSTUDIO_BASE)
+        self._labels = {}
+
+    @classmethod
+    def from_timestamps(cls, timestamps_ms, fps, labelstudio_fps=ALIGNMENT["labelstudio_fps"], reported_frames=0):
+        ts, source = clean_timestamps(timestamps_ms, fps)
+        return cls(ts, labelstudio_fps, fps, reported_frames, source)
+
+    @classmethod
+    def from_video(cls, video_path, labelstudio_fps=ALIGNMENT["labelstudio_fps"]):
+        timestamps, fps, reported = read_timestamps(video_path)
+        return cls.from_timestamps(timestamps, fps, labelstudio_fps, reported)
+
+    def __len__(self):
+        return len(self.timestamps_ms)
+
+    @property
+    def duration_s(self):
+        """Duración hasta el final del último frame."""
+        if not len(self):
+            return 0.0
+        step = np.median(np.diff(self.timestamps_ms)) if len(self) > 1 else 1000.0 / (self.fps or 30.0)
+        return (self.timestamps_ms[-1] + step) / 1000.0
+
+    def labelstudio_frames(self, frames_opencv):
+        """Frames de Label Studio de un array de frames OpenCV (acceso directo a la tabla).
+
+        Frames posteriores al último decodificado se extrapolan con el fps
+        nominal (p. ej. landmarks de otro decodificador).
+        """
+        frames = np.asarray(frames_opencv, dtype=np.int64)
+        last = len(self) - 1
+        out = self.to_labelstudio[np.clip(frames, 0, last)]
+        beyond = frames > last
+        if beyond.any():
+            step = self.labelstudio_fps / (self.fps or 30.0)
+            out[beyond] += np.floor((frames[beyond] - last) * step).astype(np.int64)
+        return out
+
+    def timestamps_for_frames(self, frames_opencv):
+        """Marca de tiempo (ms, desde el primer frame) de un array de frames OpenCV."""
+        frames = np.asarray(frames_opencv, dtype=np.int64)
+        last = len(self) - 1
+        out = self.timestamps_ms[np.clip(frames, 0, last)]
+        beyond = frames > last
+        if beyond.any():
+            out = out.copy()
+            out[beyond] += (frames[beyond] - last) * 1000.0 / (self.fps or 30.0)
+        return out
+
+    def opencv_frames(self, frames_labelstudio):
+        """Primer frame OpenCV que cae en (o después de) cada frame de Label Studio."""
+        idx = np.searchsorted(self.to_labelstudio, np.asarray(frames_labelstudio), side="left")
+        return np.minimum(idx, len(self) - 1)
+
+    def labels(self, label_index, video_id):
+        """Etiqueta de cada frame OpenCV (array denso, se calcula una vez por índice y video)."""
+        key = (label_index, video_id)
+        if key not in self._labels:
+            self._labels[key] = label_index.labels_for_frames(video_id, self.to_labelstudio)
+        return self._labels[key]
+
+    def labels_for_frames(self, label_index, video_id, frames_opencv):
+        """Etiquetas de un array de frames OpenCV: O(1) por frame."""
+        table = self.labels(label_index, video_id)
+        frames = np.asarray(frames_opencv, dtype=np.int64)
+        out = np.full(frames.shape, UNLABELED, dtype=object)
+        inside = (frames >= 0) & (frames < len(table))
+        out[inside] = table[frames[inside]]
+        return out
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, timestamps_ms=self.timestamps_ms, labelstudio_fps=self.labelstudio_fps, fps=self.fps,
+                 reported_frames=self.reported_frames, source=np.asarray(self.source),
+                 version=ALIGNMENT_VERSION)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            if npz["version"].item() != ALIGNMENT_VERSION:
+                raise KeyError("version")
+            return cls(npz["timestamps_ms"], npz["labelstudio_fps"].item(), npz["fps"].item(),
+                       npz["reported_frames"].item(), npz["source"].item())
+
+
+def alignment_settings(labelstudio_fps=ALIGNMENT["labelstudio_fps"]):
+    return {"alignment": ALIGNMENT_VERSION, "labelstudio_fps": float(labelstudio_fps)}
+
+
+def get_alignment(video_path, labelstudio_fps=ALIGNMENT["labelstudio_fps"], cache_dir=ALIGNMENT_CACHE_DIR,
+                  timestamps_ms=None, fps=None, reported_frames=0):
+    """Alineación del video: memoria del proceso, luego caché en disco, luego se construye.
+
+    Si se pasan las marcas de tiempo de una decodificación ya hecha
+    (`timestamps_ms`, `fps`), se construye con ellas sin volver a leer el
+    video; si no, se lee con grab() una sola vez.
+    """
+    st = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), st.st_size, st.st_mtime_ns, float(labelstudio_fps))
+    if memo_key in _loaded:
+        return _loaded[memo_key]
+    path = None
+    alignment = None
+    if cache_dir is not None:
+        key = landmark_cache.cache_key(video_path, alignment_settings(labelstudio_fps))
+        path = os.path.join(cache_dir, f"{key}.npz")
+        try:
+            alignment = FrameAlignment.load(path)
+        except (OSError, KeyError):
+            alignment = None
+    if alignment is None:
+        if timestamps_ms is not None and len(timestamps_ms):
+            alignment = FrameAlignment.from_timestamps(timestamps_ms, fps or 0.0, labelstudio_fps, reported_frames)
+        else:
+            alignment = FrameAlignment.from_video(video_path, labelstudio_fps)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            alignment.save(path)
+    _loaded[memo_key] = alignment
+    return alignment
+
+
+def validate_alignment(alignment, label_index, video_id, tolerance_frames=ALIGNMENT["tolerance_frames"],
+                       vfr_threshold=ALIGNMENT["vfr_threshold"]):
+    """Contrasta la tabla con las fronteras anotadas del video; devuelve un reporte con `issues`."""
+    report = {"video_id": video_id, "source": alignment.source, "frames": len(alignment),
+              "reported_frames": alignment.reported_frames, "issues": []}
+    issues = report["issues"]
+    if not len(alignment):
+        issues.append("el video no tiene frames decodificables")
+        return report
+    if alignment.source != "timestamps":
+        issues.append("OpenCV no entregó marcas de tiempo válidas: se asumió frame rate constante")
+    if alignment.reported_frames and abs(alignment.reported_frames - len(alignment)) > 1:
+        issues.append(f"CAP_PROP_FRAME_COUNT = {alignment.reported_frames} pero se decodificaron "
+                      f"{len(alignment)} frames")
+
+    intervals = np.diff(alignment.timestamps_ms)
+    if len(intervals):
+        median = np.median(intervals)
+        report["vfr"] = float(intervals.std() / median) if median > 0 else 0.0
+        if report["vfr"] > vfr_threshold:
+            issues.append(f"frame rate variable (desvío relativo {report['vfr']:.2f}): "
+                          "el mapeo lineal por ratio se desfasa en este video")
+
+    ranges = label_index.intervals(video_id)
+    if not ranges:
+        return report
+    bounds = np.unique([b for start, end, _ in ranges for b in (start, end)])
+    ls_last = int(alignment.to_labelstudio[-1])
+    max_end = int(bounds[-1])
+    report["labelstudio_last_frame"] = ls_last
+    report["annotated_last_frame"] = max_end
+    report["implied_labelstudio_fps"] = float((max_end - LABELSTUDIO_BASE + 1) / alignment.duration_s)
+    if max_end > ls_last + tolerance_frames:
+        issues.append(f"las anotaciones llegan al frame {max_end} pero el video termina en el {ls_last}: "
+                      f"¿labelstudio_fps = {alignment.labelstudio_fps:g} es correcto? "
+                      f"(las anotaciones implican al menos {report['implied_labelstudio_fps']:.1f})")
+
+    # Cada frontera debe caer cerca de un frame decodificado
+    t_bounds = (bounds - LABELSTUDIO_BASE) * 1000.0 / alignment.labelstudio_fps
+    inside = t_bounds <= alignment.timestamps_ms[-1]
+    if inside.any():
+        ts = alignment.timestamps_ms
+        right = np.clip(np.searchsorted(ts, t_bounds[inside]), 0, len(ts) - 1)
+        left = np.clip(right - 1, 0, len(ts) - 1)
+        residual = np.minimum(np.abs(ts[right] - t_bounds[inside]), np.abs(ts[left] - t_bounds[inside]))
+        report["max_boundary_residual_ms"] = float(residual.max())
+        step_ms = max(np.median(intervals) if len(intervals) else 0.0, 1000.0 / alignment.labelstudio_fps)
+        if report["max_boundary_residual_ms"] > step_ms * tolerance_frames:
+            issues.append(f"hay fronteras a {report['max_boundary_residual_ms']:.0f} ms del frame decodificado "
+                          "más cercano (¿frames perdidos?)")
+
+        # Diferencia con el mapeo lineal max_label_frame / CAP_PROP_FRAME_COUNT
+        total = alignment.reported_frames or len(alignment)
+        ratio = label_index.max_frame(video_id) / total if total else 1.0
+        frames_cv = alignment.opencv_frames(bounds[inside])
+        legacy = (frames_cv.astype(np.float64) * ratio).astype(np.int64)
+        report["max_ratio_drift_frames"] = int(np.abs(legacy - alignment.to_labelstudio[frames_cv]).max())
+    return report
+
+
+def main():
+    import extract_mediapipe_data  # Solo para el CLI: rutas de videos y etiquetas del proyecto
+
+    parser = argparse.ArgumentParser(description="Construye y valida la alineación OpenCV <-> Label Studio.")
+    parser.add_argument("--video", help="Un video (por defecto, todos los del JSON de Label Studio)")
+    parser.add_argument("--video-id", type=int, help="Id de la tarea de Label Studio de --video")
+    parser.add_argument("--labels", default=extract_mediapipe_data.LABEL_FILE)
+    parser.add_argument("--labelstudio-fps", type=float, default=ALIGNMENT["labelstudio_fps"])
+    parser.add_argument("--cache-dir", default=ALIGNMENT_CACHE_DIR)
+    args = parser.parse_args()
+
+    label_data = extract_mediapipe_data.load_label_data(args.labels)
+    index = LabelIndex(label_data)
+    if args.video:
+        tasks = [(args.video, args.video_id)]
+    else:
+        mapping = extract_mediapipe_data.build_video_mapping(label_data)
+        tasks = [(os.path.join(extract_mediapipe_data.VIDEOS_DIR, name), video_id)
+                 for video_id, name in mapping.items()
+                 if os.path.exists(os.path.join(extract_mediapipe_data.VIDEOS_DIR, name))]
+
+    n_issues = 0
+    for video_path, video_id in tasks:
+        alignment = get_alignment(video_path, args.labelstudio_fps, args.cache_dir)
+        report = validate_alignment(alignment, index, video_id)
+        drift = report.get("max_ratio_drift_frames")
+        status = "⚠️ " if report["issues"] else "✅"
+        print(f"{status} {os.path.basename(video_path)} (ID {video_id}): {len(alignment)} frames, "
+              f"{alignment.duration_s:.2f} s, Label Studio 1-{report.get('labelstudio_last_frame', '?')}"
+              + (f", desfase del ratio lineal hasta {drift} frames" if drift is not None else ""))
+        for issue in report["issues"]:
+            print(f"     - {issue}")
+        n_issues += bool(report["issues"])
+    print(f"\n{'✅' if not n_issues else '⚠️ '} {len(tasks) - n_issues}/{len(tasks)} videos alineados sin avisos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Lector de frames con prefetch en un hilo de fondo.
+
+Mientras el hilo principal corre Pose sobre el frame i, un hilo de fondo ya
+decodifica (cap.read) y convierte a RGB los frames siguientes en un buffer
+acotado. OpenCV y MediaPipe liberan el GIL, así que decodificación e
+inferencia se solapan. El orden de los frames no cambia.
+
+Con backpressure=True el buffer tiene tamaño fijo y el decodificador espera
+si se llena (memoria acotada); con False el decodificador nunca espera.
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+
+_END = object()
+
+
+class PrefetchingFrameReader:
+    """Itera (idx, frame_rgb) de un cv2.VideoCapture; frame_rgb es None en frames saltados.
+
+    `skip(idx)` (opcional) indica frames que solo se avanzan con grab(), sin
+    decodificar ni convertir. Contadores: decode_s, convert_s (hilo lector) y
+    wait_s (tiempo que el consumidor esperó un frame).
+    """
+
+    def __init__(self, cap, buffer_size=8, skip=None, backpressure=True, threaded=True):
+        self.cap = cap
+        self.skip = skip
+        self.threaded = threaded
+        self.decode_s = 0.0
+        self.convert_s = 0.0
+        self.wait_s = 0.0
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.timestamps_ms = []  # CAP_PROP_POS_MSEC de cada frame leído (índice = frame OpenCV)
+        self._queue = queue.Queue(maxsize=buffer_size if backpressure else 0)
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def _frames(self):
+        idx = 0
+        while self.cap.isOpened() and not self._stop.is_set():
+            t0 = time.perf_counter()
+            if self.skip is not None and self.skip(idx):
+                ok = self.cap.grab()
+                self.decode_s += time.perf_counter() - t0
+                if not ok:
+                    return
+                self.timestamps_ms.append(self.cap.get(cv2.CAP_PROP_POS_MSEC))
+                self.frames_skipped += 1
+                yield idx, None
+            else:
+                ok, frame = self.cap.read()
+                t1 = time.perf_counter()
+                self.decode_s += t1 - t0
+                if not ok:
+                    return
+                self.timestamps_ms.append(self.cap.get(cv2.CAP_PROP_POS_MSEC))
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.convert_s += time.perf_counter() - t1
+                self.frames_decoded += 1
+                yield idx, frame_rgb
+            idx += 1
+
+    def _worker(self):
+        try:
+            for item in self._frames():
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:  # Se relanza en el hilo consumidor
+            self._error = e
+        finally:
+            self._queue.put(_END)
+
+    def __iter__(self):
+        if not self.threaded:
+            yield from self._frames()
+            return
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._queue.get()
+                self.wait_s += time.perf_counter() - t0
+                if item is _END:
+                    break
+                yield item
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self):
+        """Detiene el hilo lector (si quedó a medias) y vacía el buffer."""
+        self._stop.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+            self._thread = None
+
+    def counters(self):
+        return {
+            "decode_s": self.decode_s,
+            "convert_s": self.convert_s,
+            "wait_s": self.wait_s,
+            "frames_decoded": self.frames_decoded,
+            "frames_skipped": self.frames_skipped,
+        }
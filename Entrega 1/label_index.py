@@ -0,0 +1,109 @@
+"""
+Índice de intervalos para buscar la etiqueta de un frame de Label Studio.
+
+Se construye una sola vez a partir de project-label-studio.json:
+video_id -> arrays ordenados (starts, ends, labels). Cada consulta es una
+búsqueda binaria (bisect), y `labels_for_frames` resuelve todos los frames de
+un video a la vez con np.searchsorted.
+
+Rangos solapados
+----------------
+Las anotaciones comparten a menudo el frame de frontera, p. ej. "Get up"
+17-35 y "Walk forward" 35-108. El escaneo lineal original devolvía el primer
+rango que contenía el frame; como los resultados vienen ordenados por inicio,
+eso equivale a la regla que se aplica aquí:
+
+    gana el rango que empieza antes (a igual inicio, el que aparece antes en
+    el JSON).
+
+Para lograrlo, al construir el índice cada rango se recorta para que empiece
+después del mayor `end` de los rangos anteriores; los rangos que quedan vacíos
+se descartan. Así los intervalos del índice no se solapan y el frame 35 del
+ejemplo queda como "Get up".
+"""
+
+import bisect
+import json
+
+import numpy as np
+
+UNLABELED = "Unlabeled"
+
+
+class LabelIndex:
+    """Índice video_id -> intervalos de etiquetas sin solapamiento."""
+
+    def __init__(self, label_data):
+        self._videos = {}
+        for entry in label_data:
+            # Igual que el escaneo lineal: si un id se repite, vale la primera entrada
+            if entry["id"] in self._videos:
+                continue
+            results = entry["annotations"][0]["result"]
+            ranges = []
+            for order, r in enumerate(results):
+                rng = r["value"]["ranges"][0]
+                ranges.append((rng["start"], order, rng["end"], r["value"]["timelinelabels"][0]))
+            ranges.sort()
+
+            starts, ends, labels = [], [], []
+            max_end = None
+            for start, _, end, label in ranges:
+                if max_end is not None:
+                    start = max(start, max_end + 1)
+                if start <= end:
+                    starts.append(start)
+                    ends.append(end)
+                    labels.append(label)
+                max_end = end if max_end is None else max(max_end, end)
+
+            self._videos[entry["id"]] = (
+                starts,
+                ends,
+                labels,
+                max((r[2] for r in ranges), default=0),
+            )
+
+    @classmethod
+    def from_file(cls, path):
+        """Construye el índice directamente desde el JSON exportado de Label Studio."""
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def __contains__(self, video_id):
+        return video_id in self._videos
+
+    def max_frame(self, video_id):
+        """Frame máximo etiquetado del video (None si el video no está en el JSON)."""
+        entry = self._videos.get(video_id)
+        return entry[3] if entry is not None else None
+
+    def intervals(self, video_id):
+        """Lista de (start, end, label) ya recortados, en orden."""
+        starts, ends, labels, _ = self._videos.get(video_id, ([], [], [], 0))
+        return list(zip(starts, ends, labels))
+
+    def label_for_frame(self, video_id, frame_idx_labelstudio):
+        """Etiqueta de un frame de Label Studio (búsqueda binaria)."""
+        entry = self._videos.get(video_id)
+        if entry is None:
+            return UNLABELED
+        starts, ends, labels, _ = entry
+        i = bisect.bisect_right(starts, frame_idx_labelstudio) - 1
+        if i >= 0 and frame_idx_labelstudio <= ends[i]:
+            return labels[i]
+        return UNLABELED
+
+    def labels_for_frames(self, video_id, frames_labelstudio):
+        """Etiquetas de un array de frames de Label Studio (vectorizado)."""
+        frames = np.asarray(frames_labelstudio)
+        out = np.full(frames.shape, UNLABELED, dtype=object)
+        entry = self._videos.get(video_id)
+        if entry is None or not entry[0]:
+            return out
+        starts, ends, labels, _ = entry
+        idx = np.searchsorted(np.asarray(starts), frames, side="right") - 1
+        safe = np.clip(idx, 0, None)
+        hit = (idx >= 0) & (frames <= np.asarray(ends)[safe])
+        out[hit] = np.asarray(labels, dtype=object)[safe[hit]]
+        return out
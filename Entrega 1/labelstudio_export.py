@@ -0,0 +1,324 @@
+"""
+Pre-anotaciones para Label Studio a partir de las predicciones por frame.
+
+Convierte la etiqueta predicha de cada frame en rangos `timelinelabels`
+como los del etiquetado manual de project-label-studio.json, listos para
+importar como predicciones: los anotadores corrigen rangos en vez de
+segmentar cada video desde cero.
+
+Todo se calcula vectorizado sobre las filas de todos los videos a la vez:
+
+1. Tramos (run-length encoding): np.diff marca dónde cambia la etiqueta,
+   el video o hay un salto de más de max_gap frames sin pose.
+2. Suavizado con histéresis: cambiar de actividad exige que el tramo nuevo
+   dure al menos min_frames frames y que su confianza media llegue a
+   switch_confidence; los tramos que no cumplen se absorben en la actividad
+   vigente (la anterior o, al inicio de un tramo de pose, la siguiente).
+   Mantener la actividad actual no exige nada.
+3. Los tramos contiguos con la misma etiqueta se fusionan y cada uno se
+   convierte a frames de Label Studio con el mismo mapeo de
+   extract_mediapipe_data (la columna frame_labelstudio del dataset, o
+   frame_alignment con las marcas de tiempo de un resultado NDJSON). Un
+   rango termina justo antes del inicio del siguiente, como en el etiquetado
+   manual.
+
+Fuentes de predicciones:
+- El dataset enriquecido + el clasificador exportado (model_export.py).
+- Resultados NDJSON de annotation_service.py (--ndjson), con --video-id.
+
+Uso:
+    python labelstudio_export.py --model activity_classifier.npz
+    python labelstudio_export.py --model activity_classifier.npz --min-frames 15 --switch-confidence 0.6
+    python labelstudio_export.py --ndjson .annotation_results/<id>.ndjson --video-id 39
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import dataset_io
+import extract_mediapipe_data
+import frame_alignment
+import model_export
+from label_index import UNLABELED
+
+EXPORT = {
+    "min_frames": 8,            # Frames OpenCV mínimos para aceptar un cambio de actividad
+    "switch_confidence": 0.5,   # Confianza media mínima del tramo nuevo para cambiar
+    "max_gap": 5,               # Salto de frames (sin pose) que corta los rangos
+}
+FROM_NAME = "videoLabels"
+TO_NAME = "video"
+PREDICTIONS_OUT = "label-studio-predictions.json"
+
+
+def segment_breaks(video_ids, frames, max_gap=EXPORT["max_gap"]):
+    """True en las filas que empiezan un bloque continuo (nuevo video o salto de frames)."""
+    video_ids = np.asarray(video_ids)
+    breaks = np.ones(len(video_ids), dtype=bool)
+    breaks[1:] = (video_ids[1:] != video_ids[:-1]) | (np.diff(np.asarray(frames)) > max_gap)
+    return breaks
+
+
+def run_starts(codes, breaks):
+    """Filas donde empieza cada tramo de etiqueta constante dentro de un bloque."""
+    changed = breaks.copy()
+    changed[1:] |= np.diff(codes) != 0
+    return np.flatnonzero(changed)
+
+
+def smooth_codes(codes, confidence, frames, breaks, min_frames=EXPORT["min_frames"],
+                 switch_confidence=EXPORT["switch_confidence"]):
+    """Etiqueta (código) por fila tras la histéresis; ver el docstring del módulo.
+
+    Los tramos débiles (cortos o con poca confianza) toman la etiqueta del
+    tramo fuerte anterior de su bloque, o del siguiente si están al inicio.
+    Un bloque sin tramos fuertes conserva su tramo más largo.
+    """
+    codes = np.asarray(codes)
+    starts = run_starts(codes, breaks)
+    if not len(starts):
+        return codes.copy()
+    ends = np.append(starts[1:], len(codes))
+    frames = np.asarray(frames)
+    length = frames[ends - 1] - frames[starts] + 1
+    mean_conf = np.add.reduceat(np.asarray(confidence, dtype=np.float64), starts) / (ends - starts)
+    block = np.cumsum(breaks)[starts]
+    strong = (length >= min_frames) & (mean_conf >= switch_confidence)
+
+    # Bloques sin tramo fuerte: se queda el más largo
+    block_first = np.flatnonzero(np.diff(block, prepend=-1) != 0)
+    no_strong = ~np.logical_or.reduceat(strong, block_first)
+    if no_strong.any():
+        order = np.lexsort((-length, block))
+        longest = order[np.flatnonzero(np.diff(block[order], prepend=-1) != 0)]
+        strong[longest[no_strong]] = True
+
+    n_runs = len(starts)
+    ids = np.arange(n_runs)
+    prev = np.maximum.accumulate(np.where(strong, ids, -1))
+    nxt = np.minimum.accumulate(np.where(strong, ids, n_runs)[::-1])[::-1]
+    use_prev = (prev >= 0) & (block[np.maximum(prev, 0)] == block)
+    source = np.where(use_prev, prev, nxt)
+    return np.repeat(codes[starts][source], ends - starts)
+
+
+def build_ranges(video_ids, frames, frames_labelstudio, codes, scores, breaks):
+    """Rangos finales (arrays): video, inicio y fin en frames de Label Studio, código y score medio."""
+    starts = run_starts(codes, breaks)
+    ls = np.asarray(frames_labelstudio, dtype=np.int64)
+    if not len(starts):
+        return {
+            "video_id": np.asarray(video_ids)[:0],
+            "start": ls[:0],
+            "end": ls[:0],
+            "code": np.asarray(codes)[:0],
+            "score": np.zeros(0),
+            "frames": np.zeros(0, dtype=np.int64),
+        }
+    ends = np.append(starts[1:], len(codes))
+    # Un rango termina antes del siguiente si son contiguos; si no, en su último frame
+    contiguous = np.append(~breaks[starts[1:]], False)
+    next_start = np.append(ls[starts[1:]], 0)
+    range_end = np.where(contiguous, np.maximum(next_start - 1, ls[starts]), ls[ends - 1])
+    score = np.add.reduceat(np.asarray(scores, dtype=np.float64), starts) / (ends - starts)
+    return {
+        "video_id": np.asarray(video_ids)[starts],
+        "start": ls[starts],
+        "end": range_end,
+        "code": np.asarray(codes)[starts],
+        "score": score,
+        "frames": np.asarray(frames)[ends - 1] - np.asarray(frames)[starts] + 1,
+    }
+
+
+def predictions_to_ranges(video_ids, frames, frames_labelstudio, codes, confidence, proba=None,
+                          settings=None):
+    """Predicción por fila -> rangos suavizados (filas agrupadas por video y ordenadas por frame).
+
+    `confidence` es la confianza de la etiqueta predicha de cada fila. Con
+    `proba` (n, n_clases) el score de un rango es la probabilidad media de su
+    etiqueta final; sin ella, la confianza de las filas que ya tenían esa
+    etiqueta (0 en las absorbidas).
+    """
+    settings = {**EXPORT, **(settings or {})}
+    codes = np.asarray(codes, dtype=np.int64)
+    breaks = segment_breaks(video_ids, frames, settings["max_gap"])
+    smoothed = smooth_codes(codes, confidence, frames, breaks, settings["min_frames"],
+                            settings["switch_confidence"])
+    if proba is not None:
+        scores = proba[np.arange(len(smoothed)), smoothed]
+    else:
+        scores = np.where(smoothed == codes, confidence, 0.0)
+    return build_ranges(video_ids, frames, frames_labelstudio, smoothed, scores, breaks), smoothed
+
+
+def predict_dataset(model, dataset_path=dataset_io.ENRICHED_DATASET):
+    """Predice todas las filas del dataset un video a la vez.
+
+    Devuelve un dict de arrays: video_id, frame_opencv, frame_labelstudio,
+    proba (n, n_clases) y, si existe, la etiqueta manual (label).
+    """
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    meta_cols = ["video_id", "frame_opencv", "frame_labelstudio"]
+    has_label = "label" in dataset_io.dataset_columns(dataset_path)
+    read_cols = list(dict.fromkeys(meta_cols + (["label"] if has_label else []) + model.columns
+                                   + ["hip_center_x", "hip_center_y", "torso_scale"]))
+    parts = {c: [] for c in meta_cols + ["proba"] + (["label"] if has_label else [])}
+    for chunk in dataset_io.iter_video_chunks(dataset_path, columns=read_cols):
+        chunk = chunk.sort_values(["video_id", "frame_opencv"], kind="stable")
+        for c in meta_cols:
+            parts[c].append(chunk[c].to_numpy())
+        if has_label:
+            parts["label"].append(chunk["label"].to_numpy(dtype=str))
+        parts["proba"].append(model.predict_proba(model.dataset_matrix(chunk)))
+    if not parts["proba"]:
+        return None
+    return {c: np.concatenate(v) for c, v in parts.items()}
+
+
+def read_ndjson_predictions(path, video_id, labelstudio_fps=frame_alignment.ALIGNMENT["labelstudio_fps"]):
+    """Predicciones de un resultado de annotation_service.py (frames con etiqueta).
+
+    Los frames OpenCV se pasan a Label Studio con una FrameAlignment armada
+    con las marcas de tiempo de todos los frames del resultado.
+    """
+    frames, labels, confidence, timestamps = [], [], [], []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if "job" in record:
+                continue  # Línea final del stream
+            timestamps.append(record["timestamp_ms"])
+            if record["label"] is not None:
+                frames.append(record["frame"])
+                labels.append(record["label"])
+                confidence.append(record["confidence"] if record["confidence"] is not None else 1.0)
+    frames = np.asarray(frames, dtype=np.int64)
+    alignment = frame_alignment.FrameAlignment.from_timestamps(timestamps, 0.0, labelstudio_fps)
+    return {
+        "video_id": np.full(len(frames), video_id),
+        "frame_opencv": frames,
+        "frame_labelstudio": alignment.labelstudio_frames(frames),
+        "labels": np.asarray(labels, dtype=str),
+        "confidence": np.asarray(confidence, dtype=np.float64),
+    }
+
+
+def to_labelstudio(ranges, classes, label_data=None, model_version="activity_classifier"):
+    """Tareas de Label Studio con una predicción `timelinelabels` por video.
+
+    Los videos que ya están en el proyecto conservan su id y `data`; los
+    demás se exportan como tareas nuevas con el video_id en `data`.
+    """
+    tasks_by_id = {entry["id"]: entry for entry in (label_data or [])}
+    video_ids = ranges["video_id"]
+    if not len(video_ids):
+        return []
+    bounds = np.flatnonzero(np.append(True, video_ids[1:] != video_ids[:-1]))
+    bounds = np.append(bounds, len(video_ids))
+    starts, ends = ranges["start"].tolist(), ranges["end"].tolist()
+    labels = np.asarray(classes)[ranges["code"]].tolist()
+    scores, frames = ranges["score"].tolist(), ranges["frames"].tolist()
+    tasks = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        video_id = video_ids[a].item()
+        result = [{
+            "value": {"ranges": [{"start": starts[i], "end": ends[i]}], "timelinelabels": [labels[i]]},
+            "id": f"pred{video_id}_{i - a}",
+            "from_name": FROM_NAME,
+            "to_name": TO_NAME,
+            "type": "timelinelabels",
+            "origin": "prediction",
+            "score": round(scores[i], 4),
+        } for i in range(a, b)]
+        task = tasks_by_id.get(video_id)
+        tasks.append({
+            "id": video_id,
+            "data": task["data"] if task is not None else {"video_id": video_id},
+            "predictions": [{
+                "model_version": model_version,
+                "score": round(float(np.average(scores[a:b], weights=frames[a:b])), 4),
+                "result": result,
+            }],
+        })
+    return tasks
+
+
+def write_predictions(tasks, path=PREDICTIONS_OUT):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(tasks, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta predicciones por frame como pre-anotaciones de Label Studio.")
+    parser.add_argument("--model", default=model_export.COMPILED_MODEL, help="Clasificador exportado (.npz)")
+    parser.add_argument("--dataset", default=dataset_io.ENRICHED_DATASET)
+    parser.add_argument("--ndjson", help="Resultado de annotation_service.py en vez del dataset")
+    parser.add_argument("--video-id", type=int, help="Id de la tarea de Label Studio (con --ndjson)")
+    parser.add_argument("--labels", default=extract_mediapipe_data.LABEL_FILE,
+                        help="JSON de Label Studio (ids y datos de las tareas)")
+    parser.add_argument("--labelstudio-fps", type=float, default=frame_alignment.ALIGNMENT["labelstudio_fps"],
+                        help="frameRate de Label Studio (con --ndjson)")
+    parser.add_argument("--min-frames", type=int, default=EXPORT["min_frames"])
+    parser.add_argument("--switch-confidence", type=float, default=EXPORT["switch_confidence"])
+    parser.add_argument("--max-gap", type=int, default=EXPORT["max_gap"])
+    parser.add_argument("--out", default=PREDICTIONS_OUT)
+    args = parser.parse_args()
+    settings = {"min_frames": args.min_frames, "switch_confidence": args.switch_confidence,
+                "max_gap": args.max_gap}
+
+    label_data = []
+    if os.path.exists(args.labels):
+        with open(args.labels) as f:
+            label_data = json.load(f)
+    t0 = time.perf_counter()
+    if args.ndjson:
+        if args.video_id is None:
+            parser.error("--ndjson necesita --video-id")
+        print(f"📂 Predicciones: {args.ndjson}")
+        pred = read_ndjson_predictions(args.ndjson, args.video_id, args.labelstudio_fps)
+        classes, codes = np.unique(pred["labels"], return_inverse=True)
+        confidence, proba, truth = pred["confidence"], None, None
+        model_version = os.path.basename(args.ndjson)
+        if not len(codes):
+            print("❌ No hay frames etiquetados (¿servicio sin --model o video sin detecciones?)")
+            return
+    else:
+        model = model_export.load_compiled(args.model)
+        print(f"📂 Prediciendo {args.dataset} con {args.model} ({model.kind}, {len(model.classes)} clases)")
+        pred = predict_dataset(model, args.dataset)
+        if pred is None:
+            print("❌ El dataset no tiene filas")
+            return
+        classes, proba, truth = model.classes, pred["proba"], pred.get("label")
+        codes = proba.argmax(axis=1)
+        confidence = proba[np.arange(len(codes)), codes]
+        model_version = os.path.basename(args.model)
+    t1 = time.perf_counter()
+
+    ranges, smoothed = predictions_to_ranges(pred["video_id"], pred["frame_opencv"], pred["frame_labelstudio"],
+                                             codes, confidence, proba, settings)
+    tasks = to_labelstudio(ranges, classes, label_data, model_version)
+    write_predictions(tasks, args.out)
+    t2 = time.perf_counter()
+
+    n_raw = len(run_starts(codes, segment_breaks(pred["video_id"], pred["frame_opencv"], args.max_gap)))
+    print(f"   ✓ {len(codes)} frames de {len(tasks)} videos en {t1 - t0:.2f} s")
+    print(f"🧹 Histéresis (min {args.min_frames} frames, confianza {args.switch_confidence}): "
+          f"{n_raw} tramos crudos -> {len(ranges['start'])} rangos ({t2 - t1:.3f} s)")
+    if truth is not None:
+        labeled = truth != UNLABELED
+        if labeled.any():
+            agree = (np.asarray(classes)[smoothed][labeled] == truth[labeled]).mean()
+            print(f"🎯 Coincidencia con el etiquetado manual: {100 * agree:.1f}% de los frames etiquetados")
+    print(f"💾 Predicciones de Label Studio: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
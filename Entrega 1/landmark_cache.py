@@ -0,0 +1,75 @@
+"""
+Caché de landmarks crudos por video, direccionada por contenido.
+
+La clave de cada entrada combina el hash SHA-256 del archivo de video con
+la configuración del modelo de pose. Así:
+- Un video sin cambios (aunque se renombre o mueva) no se vuelve a procesar.
+- Cambiar la configuración de Pose invalida automáticamente la caché.
+- Cambiar solo las etiquetas de Label Studio no toca la caché: únicamente
+  se vuelve a hacer la unión frame -> etiqueta.
+
+Cada entrada es un .npz escrito de forma atómica al terminar un video, por lo
+que una ejecución interrumpida se reanuda desde el último video terminado.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_DIR = ".landmark_cache"
+
+
+_hashes = {}  # (ruta, tamaño, mtime) -> hash ya calculado en este proceso
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Hash SHA-256 del contenido de un archivo (leído por bloques; se recuerda mientras no cambie)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _hashes:
+        return _hashes[memo_key]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    _hashes[memo_key] = h.hexdigest()
+    return _hashes[memo_key]
+
+
+def cache_key(video_path, settings):
+    """Clave de caché: hash del video + configuración del modelo de pose."""
+    payload = json.dumps({"video": file_hash(video_path), "settings": settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.npz")
+
+
+def load_landmarks(key, cache_dir=CACHE_DIR):
+    """Devuelve el dict de landmarks crudos guardado para `key`, o None si no existe."""
+    path = _entry_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    return read_entry(path)
+
+
+def read_entry(path):
+    """Lee un .npz de la caché como dict de landmarks crudos."""
+    with np.load(path) as npz:
+        raw = {name: npz[name] for name in npz.files}
+    # Escalares guardados como arrays 0-d
+    for name in ("fps", "width", "height", "total_frames"):
+        raw[name] = raw[name].item()
+    return raw
+
+
+def save_landmarks(key, raw, cache_dir=CACHE_DIR):
+    """Guarda los landmarks crudos de un video (escritura atómica)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **raw)
+    os.replace(tmp_path, path)
@@ -0,0 +1,139 @@
+"""
+Tensor de landmarks (frames, 33, 4) en float32 mapeado en memoria.
+
+En lugar de reconstruir los landmarks fila por fila (extract_landmarks_from_row
+sobre df.iloc), el dataset se guarda una vez como un .npy contiguo con
+[x, y, z, visibility] por landmark, más una tabla de offsets por video:
+
+    store/
+      landmarks.npy   (frames, 33, 4) float32
+      index.npz       video_ids, starts, stops, frame_opencv, timestamp_ms, source
+
+Al abrirlo con np.load(mmap_mode="r"), `video(id)` y los slices de landmarks
+son vistas sin copia, y el código vectorizado puede recorrer todo el corpus
+sin el costo por fila de pandas.
+"""
+
+import os
+
+import numpy as np
+
+import dataset_io
+
+TENSOR_DIR = "mediapipe_landmarks"
+N_LANDMARKS = 33
+
+
+def landmarks_from_frame(df):
+    """Convierte las columnas x_i, y_i, z_i, v_i de un DataFrame a (n, 33, 4) float32."""
+    cols = dataset_io.landmark_columns()
+    return df[cols].to_numpy(dtype=np.float32).reshape(-1, N_LANDMARKS, 4)
+
+
+def build_tensor_store(dataset_path, store_dir=TENSOR_DIR):
+    """Construye el tensor de landmarks a partir del dataset (un video a la vez).
+
+    El dataset debe venir agrupado por video y ordenado por frame, como lo
+    escriben extract_mediapipe_data.py y enrich_dataset.py.
+    """
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    columns = ["video_id", "frame_opencv", "timestamp_ms"] + dataset_io.landmark_columns()
+
+    # Primera pasada: solo video_id para dimensionar el tensor
+    video_col = dataset_io.read_dataset(dataset_path, columns=["video_id"])["video_id"].to_numpy()
+    n_frames = len(video_col)
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = os.path.join(store_dir, "landmarks.tmp.npy")
+    landmarks = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(n_frames, N_LANDMARKS, 4)
+    )
+    frame_opencv = np.empty(n_frames, dtype=np.int64)
+    timestamp_ms = np.empty(n_frames, dtype=np.float64)
+    video_ids, starts, stops = [], [], []
+
+    pos = 0
+    for chunk in dataset_io.iter_video_chunks(dataset_path, columns=columns):
+        chunk = chunk.sort_values(["video_id", "frame_opencv"], kind="stable")
+        vids = chunk["video_id"].to_numpy()
+        n = len(chunk)
+        landmarks[pos:pos + n] = landmarks_from_frame(chunk)
+        frame_opencv[pos:pos + n] = chunk["frame_opencv"].to_numpy()
+        timestamp_ms[pos:pos + n] = chunk["timestamp_ms"].to_numpy(dtype=np.float64, na_value=np.nan)
+        # Un chunk puede contener más de un video (p. ej. CSV sin row groups)
+        cuts = [0, *(np.flatnonzero(vids[1:] != vids[:-1]) + 1).tolist(), n]
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            if video_ids and video_ids[-1] == vids[a] and stops[-1] == pos + a:
+                stops[-1] = pos + b  # Video repartido en varios row groups
+                continue
+            video_ids.append(vids[a])
+            starts.append(pos + a)
+            stops.append(pos + b)
+        pos += n
+
+    landmarks.flush()
+    del landmarks
+    os.replace(tmp_path, os.path.join(store_dir, "landmarks.npy"))
+    np.savez(
+        os.path.join(store_dir, "index.npz"),
+        video_ids=np.asarray(video_ids, dtype=np.int64),
+        starts=np.asarray(starts, dtype=np.int64),
+        stops=np.asarray(stops, dtype=np.int64),
+        frame_opencv=frame_opencv,
+        timestamp_ms=timestamp_ms,
+        source=np.asarray(dataset_io.source_fingerprint(dataset_path)),
+    )
+    return LandmarkTensor(store_dir)
+
+
+class LandmarkTensor:
+    """Vista mapeada en memoria del tensor (frames, 33, 4) con offsets por video."""
+
+    def __init__(self, store_dir=TENSOR_DIR):
+        self.store_dir = store_dir
+        self.landmarks = np.load(os.path.join(store_dir, "landmarks.npy"), mmap_mode="r")
+        with np.load(os.path.join(store_dir, "index.npz")) as index:
+            self.video_ids = index["video_ids"]
+            self.starts = index["starts"]
+            self.stops = index["stops"]
+            self.frame_opencv = index["frame_opencv"]
+            self.timestamp_ms = index["timestamp_ms"]
+            self.source = index["source"].item()
+        self._rows = {vid: i for i, vid in enumerate(self.video_ids.tolist())}
+
+    def __len__(self):
+        return self.landmarks.shape[0]
+
+    def video_slice(self, video_id):
+        """slice de filas del video dentro del tensor."""
+        i = self._rows[video_id]
+        return slice(int(self.starts[i]), int(self.stops[i]))
+
+    def video(self, video_id):
+        """Landmarks (frames, 33, 4) de un video, sin copia."""
+        return self.landmarks[self.video_slice(video_id)]
+
+    def landmark_subset(self, landmarks, coords=slice(None)):
+        """Subconjunto de landmarks para todo el corpus.
+
+        Con un slice (p. ej. slice(11, 17)) el resultado es una vista sin copia;
+        con una lista de índices NumPy necesariamente crea una copia.
+        """
+        return self.landmarks[:, landmarks, coords]
+
+    def iter_videos(self):
+        """Itera (video_id, landmarks del video) en el orden del tensor."""
+        for vid, a, b in zip(self.video_ids.tolist(), self.starts.tolist(), self.stops.tolist()):
+            yield vid, self.landmarks[a:b]
+
+
+def open_landmark_tensor(dataset_path=dataset_io.ENRICHED_DATASET, store_dir=TENSOR_DIR):
+    """Abre el tensor de landmarks, reconstruyéndolo si el dataset cambió."""
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    try:
+        tensor = LandmarkTensor(store_dir)
+        if tensor.source == dataset_io.source_fingerprint(dataset_path):
+            return tensor
+    except (OSError, KeyError):
+        pass
+    return build_tensor_store(dataset_path, store_dir)
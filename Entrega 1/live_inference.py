@@ -0,0 +1,341 @@
+"""
+Inferencia en tiempo real (cámara web, video o fuente sintética).
+
+El pipeline se divide en etapas que corren en hilos separados y se comunican
+por colas acotadas:
+
+    captura -> pose -> features -> clasificación -> salida
+
+La etapa de features puede suavizar antes los landmarks con un filtro
+streaming de smoothing.py (--smooth). Con --model, la clasificación usa el
+clasificador exportado por model_export.py (runtime solo NumPy).
+
+Si una etapa se atrasa, la cola de entrada descarta el frame más viejo en vez
+de acumular latencia (siempre se procesa el frame más reciente). Al final se
+reporta la latencia por etapa, la latencia extremo a extremo y los FPS.
+
+Uso:
+    python live_inference.py                      # cámara 0
+    python live_inference.py --source "Videos APO/Video 1.mp4"
+    python live_inference.py --source synthetic --max-frames 300 --no-display
+    python live_inference.py --source synthetic --backend synthetic --no-display
+    python live_inference.py --backend replay --replay .landmark_cache/<clave>.npz --no-display
+    python live_inference.py --model activity_classifier.npz
+"""
+
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import model_export
+import pose_backends
+import smoothing
+from roi import ROI, PosePreprocessor
+from streaming_features import StreamingFeatureExtractor
+
+QUEUE_SIZE = 2
+STATS_WINDOW = 1000  # Latencias recientes que se guardan por etapa
+_STOP = object()     # Marca de fin de stream (nunca se descarta)
+
+
+# === FUENTES DE FRAMES ===
+class CaptureSource:
+    """Cámara (índice entero) o archivo de video vía cv2.VideoCapture."""
+
+    def __init__(self, spec, realtime=None):
+        self.cap = cv2.VideoCapture(spec)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # Un archivo se reproduce a su fps para simular una cámara
+        self.realtime = (not isinstance(spec, int)) if realtime is None else realtime
+
+    def read(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def close(self):
+        self.cap.release()
+
+
+class SyntheticSource:
+    """Frames generados (un rectángulo que se mueve), para pruebas sin cámara."""
+
+    def __init__(self, n_frames=300, width=640, height=480, fps=30.0, realtime=True):
+        self.n_frames = n_frames
+        self.width, self.height = width, height
+        self.fps = fps
+        self.realtime = realtime
+        self._i = 0
+
+    def read(self):
+        if self._i >= self.n_frames:
+            return None
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        x = int((self._i * 5) % max(self.width - 100, 1))
+        cv2.rectangle(frame, (x, self.height // 4), (x + 100, 3 * self.height // 4), (200, 180, 160), -1)
+        self._i += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+def open_source(spec, n_frames=300):
+    """'synthetic', un índice de cámara ('0') o una ruta de video."""
+    if spec == "synthetic":
+        return SyntheticSource(n_frames=n_frames)
+    if str(spec).isdigit():
+        return CaptureSource(int(spec))
+    return CaptureSource(spec)
+
+
+# === ETAPAS ===
+class StageStats:
+    """Latencias recientes de una etapa y contadores de frames procesados/descartados."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.processed = 0
+        self.dropped = 0
+
+    def summary(self):
+        lat = np.array(self.latencies) * 1000.0 if self.latencies else np.zeros(1)
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "mean_ms": float(lat.mean()),
+            "p95_ms": float(np.percentile(lat, 95)),
+        }
+
+
+def _put_latest(q, item, stats):
+    """Encola descartando el elemento más viejo si la cola está llena."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+                stats.dropped += 1
+            except queue.Empty:
+                pass
+
+
+class LivePipeline:
+    """Pipeline por etapas con colas acotadas y descarte de frames atrasados."""
+
+    def __init__(self, source, pose_fn=None, feature_fn=None, classifier=None,
+                 on_result=None, queue_size=QUEUE_SIZE, roi=None, smooth=None):
+        self.source = source
+        self.pose_fn = pose_fn
+        self.preprocessor = PosePreprocessor(roi)
+        # Por defecto: features incrementales O(1) por frame (mismo vector que el lote)
+        self.feature_fn = feature_fn or StreamingFeatureExtractor(fps=getattr(source, "fps", 30.0)).update_dict
+        self.smoother = smoothing.make_filter(smooth)  # None = sin suavizado
+        self._smooth_ts = None
+        self.classifier = classifier
+        self.on_result = on_result
+        self.queue_size = queue_size
+        self.stage_names = ["capture", "pose", "features", "classify"]
+        self.stats = {name: StageStats() for name in self.stage_names}
+        self.end_to_end = StageStats()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _capture(self, out_q):
+        stats = self.stats["capture"]
+        # Fuentes grabadas/sintéticas se entregan al ritmo de su fps, como una cámara
+        period = 1.0 / self.source.fps if getattr(self.source, "realtime", False) else 0.0
+        next_t = time.perf_counter()
+        idx = 0
+        while not self._stop.is_set():
+            if period:
+                next_t += period
+                delay = next_t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            t0 = time.perf_counter()
+            frame = self.source.read()
+            if frame is None:
+                break
+            t1 = time.perf_counter()
+            stats.latencies.append(t1 - t0)
+            stats.processed += 1
+            packet = {"idx": idx, "t_capture": t1, "frame": frame,
+                      "timestamp_ms": (t1 - self._t_start) * 1000.0}
+            _put_latest(out_q, packet, self.stats["pose"])
+            idx += 1
+        out_q.put(_STOP)
+
+    def _stage(self, name, fn, in_q, out_q, next_name):
+        stats = self.stats[name]
+        while True:
+            packet = in_q.get()
+            if packet is _STOP:
+                if out_q is not None:
+                    out_q.put(_STOP)
+                return
+            t0 = time.perf_counter()
+            packet = fn(packet)
+            stats.latencies.append(time.perf_counter() - t0)
+            stats.processed += 1
+            if packet is None:
+                continue
+            if out_q is None:
+                self.end_to_end.latencies.append(time.perf_counter() - packet["t_capture"])
+                self.end_to_end.processed += 1
+                if self.on_result is not None and self.on_result(packet) is False:
+                    self.stop()
+            else:
+                _put_latest(out_q, packet, self.stats[next_name])
+
+    def _run_pose(self, packet):
+        frame_rgb = cv2.cvtColor(packet["frame"], cv2.COLOR_BGR2RGB)
+        packet["landmarks"] = self.preprocessor.run(frame_rgb, self.pose_fn)
+        return packet
+
+    def _smooth(self, packet):
+        """Suaviza x, y, z con el filtro streaming; se reinicia al perder la pose."""
+        lm = packet["landmarks"]
+        if lm is None:
+            self.smoother.reset()
+            self._smooth_ts = None
+            return
+        ts = packet["timestamp_ms"]
+        dt = (ts - self._smooth_ts) / 1000.0 if self._smooth_ts is not None else None
+        self._smooth_ts = ts
+        xyz = self.smoother.update(lm[:, :3], lm[:, 3], dt)
+        packet["landmarks"] = np.column_stack([xyz, lm[:, 3]]).astype(np.float32)
+
+    def _run_features(self, packet):
+        if self.smoother is not None:
+            self._smooth(packet)
+        if packet["landmarks"] is None:
+            packet["features"] = None
+        else:
+            packet["features"] = self.feature_fn(packet["landmarks"], packet["timestamp_ms"])
+        return packet
+
+    def _run_classify(self, packet):
+        label = None
+        if packet["features"] is not None and self.classifier is not None:
+            label = self.classifier(packet["features"])
+        packet["label"] = label
+        return packet
+
+    def run(self):
+        """Corre el pipeline hasta agotar la fuente (o stop()) y devuelve el reporte."""
+        if self.pose_fn is None:
+            self.pose_fn = pose_backends.MediaPipeBackend()
+        if isinstance(self.pose_fn, pose_backends.PoseBackend):
+            self.pose_fn.warmup()  # El modelo se carga antes de medir latencias
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(3)]
+        self._t_start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._capture, args=(queues[0],), daemon=True),
+            threading.Thread(target=self._stage, args=("pose", self._run_pose, queues[0], queues[1], "features"), daemon=True),
+            threading.Thread(target=self._stage, args=("features", self._run_features, queues[1], queues[2], "classify"), daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        # La última etapa corre en el hilo principal (cv2.imshow lo requiere)
+        self._stage("classify", self._run_classify, queues[2], None, None)
+        self._stop.set()
+        for t in threads:
+            t.join()
+        self.source.close()
+        return self.report(time.perf_counter() - self._t_start)
+
+    def report(self, elapsed):
+        return {
+            "elapsed_s": elapsed,
+            "fps": self.end_to_end.processed / elapsed if elapsed > 0 else 0.0,
+            "stages": {name: s.summary() for name, s in self.stats.items()},
+            "end_to_end": self.end_to_end.summary(),
+        }
+
+
+def compiled_classifier_fns(model_path, fps=30.0):
+    """(feature_fn, classifier) de LivePipeline para un modelo exportado con model_export.py."""
+    model = model_export.load_compiled(model_path)
+    extractor = StreamingFeatureExtractor(model.feature_names, fps=fps)
+
+    def feature_fn(landmarks, timestamp_ms):
+        return model.frame_vector(landmarks, extractor.update(landmarks, timestamp_ms))
+    return feature_fn, model.predict_label
+
+
+def _display(packet):
+    """Muestra el frame con la etiqueta predicha; 'q' termina."""
+    frame = packet["frame"]
+    text = packet["label"] or ("Sin pose" if packet["landmarks"] is None else "-")
+    cv2.putText(frame, str(text), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+    cv2.imshow("AI_DetectionOfMovements", frame)
+    return (cv2.waitKey(1) & 0xFF) != ord("q")
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print("⏱️  LATENCIA POR ETAPA")
+    print("=" * 60)
+    for name, s in report["stages"].items():
+        print(f"  {name:10s} media {s['mean_ms']:7.2f} ms | p95 {s['p95_ms']:7.2f} ms | "
+              f"procesados {s['processed']:5d} | descartados {s['dropped']:4d}")
+    e2e = report["end_to_end"]
+    print(f"  {'extremo':10s} media {e2e['mean_ms']:7.2f} ms | p95 {e2e['p95_ms']:7.2f} ms")
+    print(f"\n✅ {report['fps']:.1f} FPS en {report['elapsed_s']:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificación de actividad en tiempo real.")
+    parser.add_argument("--source", default="0", help="Índice de cámara, ruta de video o 'synthetic'")
+    parser.add_argument("--max-frames", type=int, default=300, help="Frames de la fuente sintética")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--no-display", action="store_true", help="No abre ventana (modo benchmark)")
+    parser.add_argument("--roi", action="store_true", help="Recorta al ROI de la persona antes de Pose")
+    parser.add_argument("--target-size", type=int, default=None, help="Lado mayor máximo de la imagen para Pose (px)")
+    parser.add_argument("--backend", default="mediapipe", choices=sorted(pose_backends.BACKENDS),
+                        help="Backend de pose (replay/synthetic/null: pruebas sin costo de inferencia)")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1, 2],
+                        help="Complejidad del modelo de MediaPipe (0 = más rápido)")
+    parser.add_argument("--replay", help="Entrada .npz de la caché de landmarks para --backend replay")
+    parser.add_argument("--smooth", choices=smoothing.METHODS, default=None,
+                        help="Filtro temporal de landmarks antes de los features")
+    parser.add_argument("--model", default=None, help="Clasificador exportado (.npz de model_export.py)")
+    args = parser.parse_args()
+
+    if args.backend == "mediapipe":
+        spec = {"name": "mediapipe", "model_complexity": args.model_complexity}
+    elif args.backend == "replay":
+        if not args.replay:
+            parser.error("--backend replay necesita --replay")
+        spec = {"name": "replay", "path": args.replay, "loop": True}
+    else:
+        spec = {"name": args.backend}
+
+    source = open_source(args.source, n_frames=args.max_frames)
+    feature_fn, classifier = None, None
+    if args.model:
+        feature_fn, classifier = compiled_classifier_fns(args.model, getattr(source, "fps", 30.0))
+    pipeline = LivePipeline(source, pose_fn=pose_backends.create_backend(spec),
+                            feature_fn=feature_fn, classifier=classifier,
+                            on_result=None if args.no_display else _display,
+                            queue_size=args.queue_size,
+                            roi={**ROI, "enabled": args.roi, "target_size": args.target_size},
+                            smooth={**smoothing.SMOOTHING, "method": args.smooth})
+    report = pipeline.run()
+    pipeline.pose_fn.close()
+    if not args.no_display:
+        cv2.destroyAllWindows()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Exporta el clasificador entrenado a un artefacto compacto para el loop en vivo.
+
+Llamar a scikit-learn frame a frame cuesta milisegundos: validaciones de
+entrada, conversión a DataFrame/array 2D y despacho por estimador. Este
+módulo congela el modelo de train_classifier.py (más su lista de features)
+en un .npz con arreglos planos, y un runtime que solo usa NumPy:
+
+- Bosques / árboles (RandomForest, ExtraTrees, DecisionTree): los nodos de
+  todos los árboles en arreglos planos (feature, threshold, left, right,
+  value). Se recorren todos los árboles a la vez, vectorizado, durante
+  max_depth pasos.
+- XGBoost (XGBClassifier, gbtree): los árboles del modelo JSON del booster
+  en los mismos arreglos planos (con la regla x < umbral y la rama por
+  defecto para NaN); los valores de hoja se suman por clase al margen base
+  y se aplica softmax (sigmoide con 2 clases).
+- SVM (SVC con kernel rbf o lineal): vectores soporte, coeficientes duales
+  e interceptos. Las probabilidades son la fracción de votos uno-contra-uno
+  (el modelo se entrena sin probability=True).
+- Lineales (LogisticRegression, LinearSVC, ...): matriz de pesos + softmax.
+- Un StandardScaler al inicio del pipeline se guarda como media y escala.
+
+El runtime (CompiledClassifier) recibe un vector de features o un lote y
+devuelve probabilidades por clase; importar este módulo no importa pandas
+ni sklearn (el export sí los usa, vía joblib).
+
+Uso:
+    python model_export.py                      # activity_classifier.joblib -> activity_classifier.npz
+    python model_export.py --benchmark          # latencia en frío y por llamada vs sklearn
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODEL_IN = "activity_classifier.joblib"
+COMPILED_MODEL = "activity_classifier.npz"
+BENCH_CALLS = 2000
+BENCH_BATCH = 1024
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# === EXPORT ===
+def _split_pipeline(model):
+    """(escalador o None, estimador final) de un Pipeline o estimador suelto."""
+    steps = [step for _, step in getattr(model, "steps", [(None, model)])]
+    scaler = None
+    if len(steps) > 1 and hasattr(steps[0], "mean_") and hasattr(steps[0], "scale_"):
+        scaler, steps = steps[0], steps[1:]
+    if len(steps) != 1:
+        raise ValueError(f"Pipeline no soportado: {[type(s).__name__ for s in steps]}")
+    return scaler, steps[0]
+
+
+def _export_forest(est):
+    trees = [e.tree_ for e in getattr(est, "estimators_", [est])]
+    offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+    # Hojas: apuntan a sí mismas, así seguir recorriendo no las mueve
+    left = np.concatenate([np.where(t.children_left >= 0, t.children_left + o, np.arange(t.node_count) + o)
+                           for t, o in zip(trees, offsets)])
+    right = np.concatenate([np.where(t.children_right >= 0, t.children_right + o, np.arange(t.node_count) + o)
+                            for t, o in zip(trees, offsets)])
+    value = np.concatenate([t.value[:, 0, :] for t in trees])
+    value = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-12)
+    return {
+        "feature": np.concatenate([np.maximum(t.feature, 0) for t in trees]).astype(np.int32),
+        "threshold": np.concatenate([t.threshold for t in trees]).astype(np.float64),
+        "left": left.astype(np.int32),
+        "right": right.astype(np.int32),
+        "value": value.astype(np.float32),
+        "roots": offsets.astype(np.int32),
+        "max_depth": np.asarray(max(t.max_depth for t in trees)),
+    }
+
+
+def _export_boosted(est):
+    learner = json.loads(est.get_booster().save_raw("json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in ("multi:softprob", "multi:softmax", "binary:logistic"):
+        raise ValueError(f"Objetivo de XGBoost no soportado: {objective}")
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError(f"Booster de XGBoost no soportado: {learner['gradient_booster']['name']} (gbtree)")
+    model = learner["gradient_booster"]["model"]
+    trees = model["trees"]
+    if any(np.any(t["split_type"]) for t in trees):
+        raise ValueError("Splits categóricos de XGBoost no soportados")
+    n_outputs = max(int(learner["learner_model_param"]["num_class"]), 1)
+    # base_score es el margen inicial por clase; en binary:logistic viene como probabilidad
+    base = np.asarray(json.loads(learner["learner_model_param"]["base_score"]), dtype=np.float64).ravel()
+    if objective == "binary:logistic":
+        base = np.log(base / (1.0 - base))
+    base = np.broadcast_to(base, (n_outputs,))
+
+    sizes = [len(t["left_children"]) for t in trees]
+    offsets = np.cumsum([0] + sizes[:-1])
+    left, right, feature, threshold, leaf, default_left, depth = [], [], [], [], [], [], []
+    for t, o in zip(trees, offsets):
+        lc, rc = np.asarray(t["left_children"]), np.asarray(t["right_children"])
+        is_leaf = lc == -1
+        nodes = np.arange(len(lc))
+        left.append(np.where(is_leaf, nodes, lc) + o)
+        right.append(np.where(is_leaf, nodes, rc) + o)
+        feature.append(np.where(is_leaf, 0, t["split_indices"]))
+        cond = np.asarray(t["split_conditions"], dtype=np.float32)
+        threshold.append(cond)
+        # En las hojas split_conditions guarda el valor de la hoja
+        leaf.append(np.where(is_leaf, cond, 0.0))
+        default_left.append(np.asarray(t["default_left"], dtype=bool))
+        # XGBoost numera cada hijo después de su padre
+        d = np.zeros(len(lc), dtype=np.int64)
+        for i, parent in enumerate(t["parents"][1:], start=1):
+            d[i] = d[parent] + 1
+        depth.append(d.max())
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "leaf": np.concatenate(leaf).astype(np.float32),
+        "default_left": np.concatenate(default_left),
+        "roots": offsets.astype(np.int32),
+        # Árbol -> salida (clase) a la que suma, como matriz one-hot (n_árboles, n_salidas)
+        "tree_output": np.eye(n_outputs)[np.asarray(model["tree_info"], dtype=np.int64)],
+        "base_margin": base.astype(np.float64),
+        "max_depth": np.asarray(max(depth)),
+    }
+
+
+def _export_svm(est):
+    if est.kernel not in ("rbf", "linear"):
+        raise ValueError(f"Kernel de SVM no soportado: {est.kernel} (rbf o linear)")
+    # _dual_coef_/_intercept_ son los de libsvm (los públicos cambian de signo con 2 clases)
+    return {
+        "support_vectors": est.support_vectors_.astype(np.float64),
+        "dual_coef": np.asarray(est._dual_coef_, dtype=np.float64),
+        "intercept": np.asarray(est._intercept_, dtype=np.float64),
+        "n_support": est.n_support_.astype(np.int64),
+        "kernel": np.asarray(est.kernel),
+        "gamma": np.asarray(float(est._gamma)),
+    }
+
+
+def _export_linear(est):
+    return {
+        "coef": np.atleast_2d(est.coef_).astype(np.float64),
+        "intercept": np.atleast_1d(est.intercept_).astype(np.float64),
+    }
+
+
+def export_model(bundle, path=COMPILED_MODEL):
+    """Congela el bundle de train_classifier (dict o ruta .joblib) en `path` (.npz)."""
+    if isinstance(bundle, str):
+        import joblib
+        bundle = joblib.load(bundle)
+    scaler, est = _split_pipeline(bundle["model"])
+    if hasattr(est, "get_booster"):
+        kind, arrays = "boosted", _export_boosted(est)
+    elif hasattr(est, "tree_") or hasattr(est, "estimators_") and hasattr(est.estimators_[0], "tree_"):
+        kind, arrays = "forest", _export_forest(est)
+    elif hasattr(est, "support_vectors_"):
+        kind, arrays = "svm", _export_svm(est)
+    elif hasattr(est, "coef_"):
+        kind, arrays = "linear", _export_linear(est)
+    else:
+        raise ValueError(f"Modelo no soportado para exportar: {type(est).__name__}")
+    n_features = len(bundle["columns"])
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        kind=np.asarray(kind),
+        classes=np.asarray(bundle["classes"]),
+        # Clases que vio el estimador (códigos de train_classifier) -> posición en `classes`
+        class_index=np.asarray(est.classes_, dtype=np.int64),
+        columns=np.asarray(bundle["columns"]),
+        position_landmarks=np.asarray(bundle.get("position_landmarks", []), dtype=np.int64),
+        feature_names=np.asarray(bundle.get("feature_names", []), dtype=str),
+        scaler_mean=np.zeros(n_features) if scaler is None else scaler.mean_,
+        scaler_scale=np.ones(n_features) if scaler is None else scaler.scale_,
+        has_scaler=np.asarray(scaler is not None),
+        **arrays,
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+# === RUNTIME (solo NumPy) ===
+def _softmax(z):
+    """Softmax por fila; con una sola columna (margen binario) equivale a la sigmoide."""
+    if z.shape[1] == 1:
+        z = np.concatenate([np.zeros_like(z), z], axis=1)
+    z = np.exp(z - z.max(axis=1, keepdims=True))
+    return z / z.sum(axis=1, keepdims=True)
+
+
+class CompiledClassifier:
+    """Clasificador exportado: predict_proba / predict sobre vectores float32."""
+
+    def __init__(self, path=COMPILED_MODEL):
+        with np.load(path) as npz:
+            self.arrays = {k: npz[k] for k in npz.files}
+        a = self.arrays
+        self.kind = a["kind"].item()
+        self.classes = a["classes"]
+        self.columns = a["columns"].tolist()
+        self.position_landmarks = a["position_landmarks"]
+        self.feature_names = a["feature_names"].tolist()  # Grupos de features.py tras las posiciones
+        self.has_scaler = bool(a["has_scaler"])
+        self._scores = getattr(self, f"_scores_{self.kind}")
+
+    def _prepare(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        x = x[None] if x.ndim == 1 else x
+        if self.has_scaler:
+            # Mismo redondeo que StandardScaler sobre float32
+            x = (x - self.arrays["scaler_mean"]).astype(np.float32)
+            x = (x / self.arrays["scaler_scale"]).astype(np.float32)
+        return x
+
+    def _scores_forest(self, x):
+        a = self.arrays
+        feature, threshold, left, right = a["feature"], a["threshold"], a["left"], a["right"]
+        rows = np.arange(len(x))[:, None]
+        node = np.broadcast_to(a["roots"], (len(x), len(a["roots"])))
+        for _ in range(int(a["max_depth"])):
+            go_left = x[rows, feature[node]] <= threshold[node]
+            node = np.where(go_left, left[node], right[node])
+        return a["value"][node].mean(axis=1)
+
+    def _scores_boosted(self, x):
+        a = self.arrays
+        feature, threshold, left, right, default_left = (a["feature"], a["threshold"], a["left"], a["right"],
+                                                         a["default_left"])
+        rows = np.arange(len(x))[:, None]
+        node = np.broadcast_to(a["roots"], (len(x), len(a["roots"])))
+        for _ in range(int(a["max_depth"])):
+            v = x[rows, feature[node]]
+            go_left = np.where(np.isnan(v), default_left[node], v < threshold[node])
+            node = np.where(go_left, left[node], right[node])
+        z = a["leaf"][node].astype(np.float64) @ a["tree_output"] + a["base_margin"]
+        return _softmax(z)
+
+    def _scores_svm(self, x):
+        a = self.arrays
+        sv = a["support_vectors"]
+        x64 = x.astype(np.float64)
+        if a["kernel"].item() == "rbf":
+            d2 = (x64 ** 2).sum(axis=1)[:, None] + (sv ** 2).sum(axis=1)[None] - 2.0 * x64 @ sv.T
+            k = np.exp(-a["gamma"] * np.maximum(d2, 0.0))
+        else:
+            k = x64 @ sv.T
+        n_support, dual, intercept = a["n_support"], a["dual_coef"], a["intercept"]
+        bounds = np.concatenate([[0], np.cumsum(n_support)])
+        n_classes = len(n_support)
+        votes = np.zeros((len(x), n_classes))
+        p = 0
+        for i in range(n_classes):
+            si = slice(bounds[i], bounds[i + 1])
+            for j in range(i + 1, n_classes):
+                sj = slice(bounds[j], bounds[j + 1])
+                dec = k[:, si] @ dual[j - 1, si] + k[:, sj] @ dual[i, sj] + intercept[p]
+                votes[:, i] += dec > 0
+                votes[:, j] += dec <= 0
+                p += 1
+        return votes / max(n_classes * (n_classes - 1) // 2, 1)
+
+    def _scores_linear(self, x):
+        a = self.arrays
+        return _softmax(x.astype(np.float64) @ a["coef"].T + a["intercept"])
+
+    def predict_proba(self, x):
+        """Probabilidades (n, n_clases) en el orden de `classes`; x es (n_features,) o (n, n_features)."""
+        scores = self._scores(self._prepare(x))
+        proba = np.zeros((len(scores), len(self.classes)), dtype=np.float64)
+        proba[:, self.arrays["class_index"]] = scores
+        return proba
+
+    def predict(self, x):
+        """Nombres de clase (n,)."""
+        return self.classes[self.predict_proba(x).argmax(axis=1)]
+
+    def predict_label(self, x):
+        """Clase de un único vector (para LivePipeline.classifier)."""
+        return str(self.predict(x)[0])
+
+    def frame_vector(self, landmarks, feature_values):
+        """Vector de entrada de un frame: posiciones relativas a la cadera + features.
+
+        `landmarks` es (33, 4); `feature_values` sale de
+        StreamingFeatureExtractor(self.feature_names).update (mismo orden que
+        train_classifier.feature_columns).
+        """
+        lm = np.asarray(landmarks, dtype=np.float32)
+        hip = (lm[23, :2] + lm[24, :2]) / 2.0
+        torso = (np.hypot(*(lm[11, :2] - lm[23, :2])) + np.hypot(*(lm[12, :2] - lm[24, :2]))) / 2.0
+        pos = lm[self.position_landmarks, :3].copy()
+        if torso > 1e-6:
+            pos[:, :2] = (pos[:, :2] - hip) / torso
+            pos[:, 2] /= torso
+        else:
+            pos[:] = 0.0
+        return np.nan_to_num(np.concatenate([pos.ravel(), np.asarray(feature_values, dtype=np.float32)]),
+                             nan=0.0, posinf=0.0, neginf=0.0)
+
+    def dataset_matrix(self, rows):
+        """Matriz de entrada (n, n_features) de filas del dataset enriquecido (DataFrame).
+
+        Vectorizado; misma construcción que train_classifier._chunk_matrix
+        (usa las columnas hip_center_x, hip_center_y y torso_scale).
+        """
+        X = rows[self.columns].to_numpy(dtype=np.float32, copy=True)
+        n_pos = 3 * len(self.position_landmarks)
+        pos = X[:, :n_pos].reshape(len(X), -1, 3)
+        scale = rows["torso_scale"].to_numpy(dtype=np.float32)
+        scale = np.where(scale > 1e-6, scale, np.nan)[:, None]
+        pos[:, :, 0] = (pos[:, :, 0] - rows["hip_center_x"].to_numpy(dtype=np.float32)[:, None]) / scale
+        pos[:, :, 1] = (pos[:, :, 1] - rows["hip_center_y"].to_numpy(dtype=np.float32)[:, None]) / scale
+        pos[:, :, 2] = pos[:, :, 2] / scale
+        X[:, :n_pos] = pos.reshape(len(X), n_pos)
+        return np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def load_compiled(path=COMPILED_MODEL):
+    return CompiledClassifier(path)
+
+
+# === BENCHMARK ===
+_COLD_COMPILED = """
+import sys, time
+t0 = time.perf_counter()
+import numpy as np
+import model_export
+model = model_export.load_compiled(sys.argv[1])
+model.predict_proba(np.zeros(len(model.columns), dtype=np.float32))
+print(time.perf_counter() - t0, int("pandas" in sys.modules), int("sklearn" in sys.modules))
+"""
+
+_COLD_SKLEARN = """
+import sys, time
+t0 = time.perf_counter()
+import numpy as np
+import joblib
+bundle = joblib.load(sys.argv[1])
+bundle["model"].predict_proba(np.zeros((1, len(bundle["columns"])), dtype=np.float32))
+print(time.perf_counter() - t0, int("pandas" in sys.modules), int("sklearn" in sys.modules))
+"""
+
+
+def _cold_start(code, path, repeat):
+    """Segundos desde el import hasta la primera predicción, en un proceso nuevo (mediana)."""
+    times, flags = [], None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code, os.path.abspath(path)], cwd=SCRIPT_DIR,
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        flags = {"imports_pandas": bool(int(out[1])), "imports_sklearn": bool(int(out[2]))}
+    return {"cold_start_s": float(np.median(times)), **flags}
+
+
+def _per_call(fn, X, n_calls):
+    t0 = time.perf_counter()
+    for i in range(n_calls):
+        fn(X[i % len(X)])
+    return (time.perf_counter() - t0) / n_calls * 1000.0
+
+
+def benchmark_export(bundle_path=MODEL_IN, compiled_path=COMPILED_MODEL, X=None, n_calls=BENCH_CALLS,
+                     repeat=3):
+    """Compara el runtime exportado con sklearn: paridad, arranque en frío y latencia por llamada."""
+    import joblib
+    bundle = joblib.load(bundle_path)
+    model = bundle["model"]
+    compiled = load_compiled(compiled_path)
+    if X is None:
+        X = np.random.default_rng(0).normal(size=(BENCH_BATCH, len(compiled.columns))).astype(np.float32)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+
+    # sklearn predice códigos de train_classifier = posición en compiled.classes
+    ref_pred = model.predict(X)
+    proba = compiled.predict_proba(X)
+    max_diff = None
+    if compiled.kind != "svm":
+        ref = np.zeros_like(proba)
+        ref[:, model.classes_] = model.predict_proba(X)
+        max_diff = float(np.abs(proba - ref).max())
+    sk_call = model.predict if compiled.kind == "svm" else model.predict_proba
+    result = {
+        "kind": compiled.kind,
+        "rows": len(X),
+        "agreement": float((proba.argmax(axis=1) == ref_pred).mean()),
+        "max_abs_proba_diff": max_diff,
+        "sklearn": {
+            **_cold_start(_COLD_SKLEARN, bundle_path, repeat),
+            "per_call_ms": _per_call(lambda x: sk_call(x[None]), X, n_calls),
+        },
+        "compiled": {
+            **_cold_start(_COLD_COMPILED, compiled_path, repeat),
+            "per_call_ms": _per_call(compiled.predict_proba, X, n_calls),
+        },
+    }
+    for name, fn in (("sklearn", sk_call), ("compiled", compiled.predict_proba)):
+        t0 = time.perf_counter()
+        fn(X)
+        result[name]["batch_rows_per_s"] = len(X) / (time.perf_counter() - t0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta el clasificador a un runtime NumPy de baja latencia.")
+    parser.add_argument("--model", default=MODEL_IN, help="Bundle .joblib de train_classifier.py")
+    parser.add_argument("--out", default=COMPILED_MODEL)
+    parser.add_argument("--benchmark", action="store_true", help="Compara latencias contra sklearn")
+    parser.add_argument("--calls", type=int, default=BENCH_CALLS, help="Llamadas de un frame en el benchmark")
+    parser.add_argument("--features", default=None,
+                        help="Matriz .npy para el benchmark (por defecto la de train_classifier si existe)")
+    args = parser.parse_args()
+
+    print(f"📦 Exportando: {args.model} -> {args.out}")
+    export_model(args.model, args.out)
+    compiled = load_compiled(args.out)
+    print(f"   ✓ {compiled.kind}, {len(compiled.classes)} clases, {len(compiled.columns)} features, "
+          f"{os.path.getsize(args.out) / 2**20:.2f} MB")
+
+    if args.benchmark:
+        features_path = args.features or os.path.join("training_features", "features.npy")
+        X = None
+        if os.path.exists(features_path):
+            X = np.load(features_path, mmap_mode="r")[:BENCH_BATCH]
+        print(f"⏱️  Benchmark ({'features de ' + features_path if X is not None else 'features aleatorios'})")
+        result = benchmark_export(args.model, args.out, X, args.calls)
+        print(f"   Coincidencia de predicciones: {100 * result['agreement']:.2f}%")
+        if result["max_abs_proba_diff"] is not None:
+            print(f"   Máx. diferencia de probabilidades: {result['max_abs_proba_diff']:.2e}")
+        for name in ("sklearn", "compiled"):
+            r = result[name]
+            print(f"   {name:9s} arranque {1000 * r['cold_start_s']:7.1f} ms | por llamada {r['per_call_ms']:.3f} ms"
+                  f" | lote {r['batch_rows_per_s']:10.0f} filas/s | pandas={r['imports_pandas']} "
+                  f"sklearn={r['imports_sklearn']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Backends de estimación de pose intercambiables.
+
+Un backend es un callable imagen RGB -> landmarks (33, 4) float32 con
+[x, y, z, visibility], o None si no detecta a nadie. Lo usan la extracción
+(extract_mediapipe_data), la inferencia en vivo (live_inference) y los
+benchmarks:
+
+- MediaPipeBackend: MediaPipe Pose con model_complexity 0 (lite), 1 (full)
+  o 2 (heavy), para cambiar precisión por velocidad.
+- ReplayBackend: devuelve landmarks grabados (una entrada de la caché de
+  landmarks), opcionalmente al ritmo en que se grabaron. Permite probar el
+  resto del pipeline con poses reales sin costo de inferencia.
+- SyntheticBackend: landmarks de una caminata aleatoria elegidos según el
+  contenido de la imagen (mismo frame, mismos landmarks), con latencia
+  simulada opcional.
+- NullBackend: nunca detecta pose (mide el costo del pipeline sin Pose).
+
+settings() describe la configuración que afecta a los landmarks y forma
+parte de la clave de la caché de landmarks.
+"""
+
+import time
+import zlib
+
+import numpy as np
+
+import landmark_cache
+from streaming_features import synthetic_landmarks
+
+DEFAULT_BACKEND = {"name": "mediapipe", "model_complexity": 1}
+
+
+class PoseBackend:
+    """Interfaz común de los backends de pose."""
+
+    name = None
+
+    def __call__(self, image_rgb):
+        raise NotImplementedError
+
+    def settings(self):
+        """Configuración que afecta a los landmarks (entra en la clave de la caché)."""
+        return {"backend": self.name}
+
+    def warmup(self):
+        """Carga el modelo por adelantado (p. ej. al iniciar un worker)."""
+        return self
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(PoseBackend):
+    """MediaPipe Pose. El modelo se carga en la primera llamada (o con warmup())."""
+
+    name = "mediapipe"
+
+    def __init__(self, model_complexity=1, static_image_mode=False, min_detection_confidence=0.5):
+        import mediapipe as mp
+
+        self._mp = mp
+        self.version = getattr(mp, "__version__", None)
+        self.model_complexity = model_complexity
+        self.options = {"static_image_mode": static_image_mode,
+                        "min_detection_confidence": min_detection_confidence}
+        self.pose = None
+
+    def warmup(self):
+        if self.pose is None:
+            kwargs = dict(self.options)
+            if self.model_complexity != 1:
+                kwargs["model_complexity"] = self.model_complexity
+            self.pose = self._mp.solutions.pose.Pose(**kwargs)
+        return self
+
+    def __call__(self, image_rgb):
+        results = self.warmup().pose.process(image_rgb)
+        if not results.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility)
+                         for lm in results.pose_landmarks.landmark], dtype=np.float32)
+
+    def settings(self):
+        settings = {"backend": self.name, "version": self.version, **self.options}
+        # La complejidad por defecto no se agrega: las cachés previas siguen siendo válidas
+        if self.model_complexity != 1:
+            settings["model_complexity"] = self.model_complexity
+        return settings
+
+    def close(self):
+        if self.pose is not None:
+            self.pose.close()
+            self.pose = None
+
+
+class ReplayBackend(PoseBackend):
+    """Reproduce landmarks grabados, un resultado por llamada.
+
+    `raw` es un dict de landmarks crudos como el de extract_raw_landmarks (o
+    una entrada de la caché): la llamada k devuelve el resultado grabado del
+    k-ésimo frame donde se corrió Pose (None si no hubo detección). Con
+    realtime=True cada resultado se entrega no antes de su timestamp grabado
+    (timestamps_ms del frame; frame / fps en entradas sin marcas de tiempo)
+    contado desde la primera llamada. Con loop=True vuelve a empezar al
+    terminar, y cada vuelta se programa una duración de grabación después
+    de la anterior; si no, devuelve None.
+    """
+
+    name = "replay"
+
+    def __init__(self, raw, realtime=False, loop=False):
+        self.frames = np.asarray(raw.get("attempted", raw["frames"]))
+        self.fps = raw["fps"] or 30.0
+        self.realtime = realtime
+        self.loop = loop
+        lookup = dict(zip(np.asarray(raw["frames"]).tolist(), range(len(raw["frames"]))))
+        self.results = [raw["landmarks"][lookup[f]] if f in lookup else None for f in self.frames.tolist()]
+        self.times_s = self.frames / self.fps
+        ts = np.asarray(raw.get("timestamps_ms", ()), dtype=np.float64)
+        if len(self.frames) and len(ts) > self.frames.max() and np.isfinite(ts[self.frames]).all():
+            self.times_s = (ts[self.frames] - ts[0]) / 1000.0
+        # Duración de una vuelta: del primer resultado al último, más un frame
+        self.loop_s = (self.times_s[-1] - self.times_s[0] + 1.0 / self.fps) if len(self.frames) else 0.0
+        self.calls = 0
+        self._t0 = None
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Crea el backend desde un .npz de la caché de landmarks."""
+        return cls(landmark_cache.read_entry(path), **kwargs)
+
+    def __call__(self, image_rgb):
+        k = self.calls
+        self.calls += 1
+        laps = 0
+        if k >= len(self.results):
+            if not self.loop or not self.results:
+                return None
+            laps, k = divmod(k, len(self.results))
+        if self.realtime:
+            due = self.times_s[k] + laps * self.loop_s
+            if self._t0 is None:
+                self._t0 = time.perf_counter() - due
+            delay = self._t0 + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self.results[k]
+
+    def settings(self):
+        return {"backend": self.name, "n_results": len(self.results)}
+
+
+class SyntheticBackend(PoseBackend):
+    """Landmarks sintéticos (caminata aleatoria) con latencia simulada opcional.
+
+    El resultado depende solo de la imagen: un CRC32 de una submuestra de
+    píxeles elige la fila de la caminata. Así la salida es la misma en
+    cualquier proceso, orden de llamadas o patrón de frames saltados.
+    """
+
+    name = "synthetic"
+    SUBSAMPLE = 8  # Paso (en píxeles) de la submuestra que se hashea
+
+    def __init__(self, n_frames=1000, seed=0, latency_ms=0.0):
+        self.landmarks = synthetic_landmarks(n_frames, seed)
+        self.seed = seed
+        self.latency_ms = latency_ms
+
+    def __call__(self, image_rgb):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        pixels = np.ascontiguousarray(image_rgb[::self.SUBSAMPLE, ::self.SUBSAMPLE])
+        return self.landmarks[zlib.crc32(pixels) % len(self.landmarks)]
+
+    def settings(self):
+        return {"backend": self.name, "n_frames": len(self.landmarks), "seed": self.seed, "keyed_by": "image"}
+
+
+class NullBackend(PoseBackend):
+    """Nunca detecta pose."""
+
+    name = "null"
+
+    def __call__(self, image_rgb):
+        return None
+
+
+BACKENDS = {cls.name: cls for cls in (MediaPipeBackend, ReplayBackend, SyntheticBackend, NullBackend)}
+
+
+def create_backend(spec=None):
+    """Crea un backend a partir de un dict {"name": ..., **kwargs} (o lo devuelve si ya es uno)."""
+    if isinstance(spec, PoseBackend):
+        return spec
+    spec = dict(spec or DEFAULT_BACKEND)
+    name = spec.pop("name")
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de pose desconocido: {name} (opciones: {sorted(BACKENDS)})")
+    if name == "replay":
+        return ReplayBackend.from_file(spec.pop("path"), **spec)
+    return BACKENDS[name](**spec)
@@ -0,0 +1,173 @@
+"""
+Instrumentación del pipeline: tiempos por etapa y reporte JSON por ejecución.
+
+Cada script crea un RunProfiler y marca sus etapas, ya sea con un bloque
+
+    with profiler.stage("features", frames=len(df)):
+        ...
+
+o, en scripts lineales, con checkpoints secuenciales que cierran la etapa
+anterior y abren la siguiente:
+
+    profiler.checkpoint("load")
+    ...
+    profiler.checkpoint("plots")
+    ...
+    profiler.finish()
+
+Por etapa se mide tiempo de pared, tiempo de CPU, frames/s (si se informan
+frames) y contadores extra (p. ej. decode_s, infer_s). El reporte incluye el
+pico de memoria residente (RSS) y se guarda en run_reports/<script>_<fecha>.json.
+verify_pipeline.py muestra el último reporte y lo compara con el anterior.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # No existe en Windows
+except ImportError:
+    resource = None
+
+REPORTS_DIR = "run_reports"
+REGRESSION_RATIO = 1.25   # Una etapa es regresión si tarda 25% más...
+REGRESSION_MIN_S = 0.5    # ...y al menos 0.5 s más que en la ejecución anterior
+
+
+def _children_cpu_s():
+    """CPU de procesos hijos ya terminados (workers de un pool)."""
+    if resource is None:
+        return 0.0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso (y de sus hijos terminados), en MB."""
+    if resource is None:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except (ImportError, AttributeError):
+            return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return max(own, children) / 2**20
+
+
+class RunProfiler:
+    """Acumula tiempos por etapa de una ejecución y escribe el reporte JSON."""
+
+    def __init__(self, script, reports_dir=REPORTS_DIR):
+        self.script = script
+        self.reports_dir = reports_dir
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.counters = {}
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time() + _children_cpu_s()
+        self._current = None
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0, "frames": 0})
+
+    @contextmanager
+    def stage(self, name, frames=None):
+        """Mide el bloque como la etapa `name` (se acumula si se repite)."""
+        t0 = time.perf_counter()
+        cpu0 = time.process_time() + _children_cpu_s()
+        try:
+            yield
+        finally:
+            st = self._stage(name)
+            st["wall_s"] += time.perf_counter() - t0
+            st["cpu_s"] += time.process_time() + _children_cpu_s() - cpu0
+            st["calls"] += 1
+            if frames:
+                st["frames"] += int(frames)
+
+    def checkpoint(self, name, frames=None):
+        """Cierra la etapa abierta (si hay) y abre `name`."""
+        self._close_current()
+        ctx = self.stage(name, frames)
+        ctx.__enter__()
+        self._current = ctx
+
+    def _close_current(self):
+        if self._current is not None:
+            self._current.__exit__(None, None, None)
+            self._current = None
+
+    def add(self, stage, frames=None, **counters):
+        """Suma frames y contadores (p. ej. decode_s=...) a una etapa."""
+        st = self._stage(stage)
+        if frames:
+            st["frames"] += int(frames)
+        for key, value in counters.items():
+            st[key] = st.get(key, 0) + value
+
+    def count(self, **counters):
+        """Contadores globales de la ejecución (p. ej. videos=18)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self):
+        stages = {}
+        for name, st in self.stages.items():
+            st = dict(st)
+            st["fps"] = st["frames"] / st["wall_s"] if st["frames"] and st["wall_s"] > 0 else None
+            stages[name] = st
+        return {
+            "script": self.script,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_s": time.perf_counter() - self._t0,
+            "cpu_s": time.process_time() + _children_cpu_s() - self._cpu0,
+            "peak_rss_mb": peak_rss_mb(),
+            "counters": self.counters,
+            "stages": stages,
+        }
+
+    def finish(self, verbose=True):
+        """Cierra la etapa abierta, escribe el reporte y devuelve su ruta."""
+        self._close_current()
+        report = self.report()
+        os.makedirs(self.reports_dir, exist_ok=True)
+        path = os.path.join(
+            self.reports_dir, f"{self.script}_{self.started_at.strftime('%Y%m%d-%H%M%S-%f')}.json"
+        )
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        if verbose:
+            rss = f"{report['peak_rss_mb']:.0f} MB" if report["peak_rss_mb"] is not None else "n/d"
+            print(f"📈 Reporte de ejecución: {path} ({report['wall_s']:.1f} s, pico RSS {rss})")
+        return path
+
+
+def load_reports(script, reports_dir=REPORTS_DIR):
+    """Reportes de un script, del más antiguo al más reciente."""
+    if not os.path.isdir(reports_dir):
+        return []
+    names = sorted(f for f in os.listdir(reports_dir) if f.startswith(f"{script}_") and f.endswith(".json"))
+    reports = []
+    for name in names:
+        with open(os.path.join(reports_dir, name)) as f:
+            reports.append(json.load(f))
+    return reports
+
+
+def find_regressions(previous, current, ratio=REGRESSION_RATIO, min_s=REGRESSION_MIN_S):
+    """Etapas de `current` notablemente más lentas que en `previous`."""
+    regressions = []
+    for name, st in current["stages"].items():
+        prev = previous["stages"].get(name)
+        if prev is None:
+            continue
+        if st["wall_s"] > prev["wall_s"] * ratio and st["wall_s"] - prev["wall_s"] > min_s:
+            regressions.append(f"{name}: {prev['wall_s']:.2f} s -> {st['wall_s']:.2f} s")
+    return regressions
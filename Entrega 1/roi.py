@@ -0,0 +1,110 @@
+"""
+Preprocesamiento antes de Pose: recorte a la región de la persona (ROI) y
+reducción de resolución.
+
+El bounding box del esqueleto del frame anterior (el mismo bbox_xmin ...
+bbox_ymax que se guarda en el dataset) se amplía con un margen y se usa para
+recortar el frame siguiente. Opcionalmente la imagen se reduce para que su
+lado mayor no supere target_size. Pose corre sobre la imagen pequeña y los
+landmarks se vuelven a coordenadas normalizadas del frame completo.
+
+Si Pose no detecta a la persona en el recorte (se perdió el tracking), se hace
+de inmediato una pasada con el frame completo y se reinicia el ROI.
+"""
+
+import cv2
+import numpy as np
+
+ROI = {"enabled": False, "margin": 0.25, "min_size": 0.2, "target_size": None}
+
+
+class PosePreprocessor:
+    """Recorte por ROI + reducción de resolución, con mapeo inverso de landmarks."""
+
+    def __init__(self, roi=None):
+        roi = {**ROI, **(roi or {})}
+        self.enabled = bool(roi["enabled"])
+        self.margin = roi["margin"]
+        self.min_size = roi["min_size"]
+        self.target_size = roi["target_size"]
+        self.bbox = None  # (xmin, ymin, xmax, ymax) normalizado del frame anterior
+        self.full_passes = 0
+        self.roi_passes = 0
+
+    def _crop_box(self, width, height):
+        """Rectángulo de recorte en píxeles (x0, y0, x1, y1) a partir del bbox previo."""
+        if not self.enabled or self.bbox is None:
+            return 0, 0, width, height
+        xmin, ymin, xmax, ymax = self.bbox
+        w = max(xmax - xmin, self.min_size)
+        h = max(ymax - ymin, self.min_size)
+        cx, cy = (xmin + xmax) / 2.0, (ymin + ymax) / 2.0
+        half_w, half_h = w * (0.5 + self.margin), h * (0.5 + self.margin)
+        x0 = int(np.clip((cx - half_w) * width, 0, width - 1))
+        x1 = int(np.clip(np.ceil((cx + half_w) * width), x0 + 1, width))
+        y0 = int(np.clip((cy - half_h) * height, 0, height - 1))
+        y1 = int(np.clip(np.ceil((cy + half_h) * height), y0 + 1, height))
+        return x0, y0, x1, y1
+
+    def _resize(self, image):
+        if not self.target_size:
+            return image
+        h, w = image.shape[:2]
+        scale = self.target_size / max(h, w)
+        if scale >= 1.0:
+            return image
+        return cv2.resize(image, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+
+    def prepare(self, frame_rgb, full=False):
+        """Devuelve (imagen para Pose, transform) para el frame."""
+        height, width = frame_rgb.shape[:2]
+        x0, y0, x1, y1 = (0, 0, width, height) if full else self._crop_box(width, height)
+        image = frame_rgb if (x0, y0, x1, y1) == (0, 0, width, height) \
+            else np.ascontiguousarray(frame_rgb[y0:y1, x0:x1])
+        return self._resize(image), (x0, y0, x1 - x0, y1 - y0, width, height)
+
+    @staticmethod
+    def is_full(transform):
+        x0, y0, cw, ch, width, height = transform
+        return (x0, y0, cw, ch) == (0, 0, width, height)
+
+    @staticmethod
+    def to_full_frame(landmarks, transform):
+        """Lleva landmarks (33, 4) normalizados al recorte a coordenadas del frame completo.
+
+        La reducción de resolución no cambia las coordenadas normalizadas;
+        z se escala con el ancho, como x.
+        """
+        x0, y0, cw, ch, width, height = transform
+        out = landmarks.copy()
+        out[:, 0] = (landmarks[:, 0] * cw + x0) / width
+        out[:, 1] = (landmarks[:, 1] * ch + y0) / height
+        out[:, 2] = landmarks[:, 2] * cw / width
+        return out
+
+    def update(self, landmarks):
+        """Actualiza el ROI con los landmarks (frame completo) del frame actual; None lo reinicia."""
+        if landmarks is None:
+            self.bbox = None
+            return
+        xs = np.clip(landmarks[:, 0], 0.0, 1.0)
+        ys = np.clip(landmarks[:, 1], 0.0, 1.0)
+        self.bbox = (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+
+    def run(self, frame_rgb, pose_fn):
+        """Corre pose_fn (imagen -> landmarks (33, 4) o None) con ROI y fallback a frame completo."""
+        image, transform = self.prepare(frame_rgb)
+        landmarks = pose_fn(image)
+        if self.is_full(transform):
+            self.full_passes += 1
+        else:
+            self.roi_passes += 1
+            if landmarks is None:
+                # Tracking perdido: pasada completa sobre el frame
+                image, transform = self.prepare(frame_rgb, full=True)
+                landmarks = pose_fn(image)
+                self.full_passes += 1
+        if landmarks is not None and not self.is_full(transform):
+            landmarks = self.to_full_frame(landmarks, transform)
+        self.update(landmarks)
+        return landmarks
@@ -0,0 +1,265 @@
+"""
+Suavizado temporal de landmarks antes de calcular features.
+
+El jitter de MediaPipe entra directo a speed_* y a los ángulos. Este módulo
+ofrece tres filtros sobre las coordenadas x, y, z de los 33 landmarks:
+
+- "ema": media móvil exponencial.
+- "one_euro": filtro One-Euro (corte adaptativo: suaviza mucho en reposo y
+  poco cuando el punto se mueve rápido, para no agregar retraso).
+- "savgol": Savitzky-Golay (ajuste polinomial local por mínimos cuadrados).
+
+Todos tienen en cuenta la visibilidad: cada punto pesa w = clip(v, min_weight, 1).
+En EMA y One-Euro un punto poco visible mueve poco la estimación (el
+coeficiente se multiplica por w); en Savitzky-Golay el ajuste es ponderado
+por w.
+
+Cada filtro tiene dos formas:
+- En lote: smooth_landmarks sobre el array (frames, 33, 4) de uno o varios
+  videos (se reinicia en cada video). EMA se resuelve vectorizado con
+  productos acumulados (ver ema_video) y Savitzky-Golay con una ventana
+  centrada sobre todos los frames. One-Euro sigue siendo un loop por frame:
+  su coeficiente depende de la derivada ya filtrada del frame anterior (una
+  recurrencia no lineal), así que no tiene forma cerrada vectorizable.
+- Streaming: make_filter(settings).update(...) procesa un frame en tiempo
+  constante (para inferencia en vivo). One-Euro da exactamente lo mismo que
+  en lote y EMA lo mismo salvo redondeo (~1e-12); Savitzky-Golay en
+  streaming es causal (ajusta las últimas `window` muestras y evalúa en la
+  más reciente).
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SMOOTHING = {
+    "method": None,       # None, "ema", "one_euro" o "savgol"
+    "min_weight": 0.05,   # Peso mínimo de un punto no visible
+    "alpha": 0.5,         # ema
+    "min_cutoff": 1.0,    # one_euro (Hz)
+    "beta": 0.3,          # one_euro
+    "d_cutoff": 1.0,      # one_euro (Hz)
+    "window": 7,          # savgol (frames, impar)
+    "polyorder": 2,       # savgol
+}
+METHODS = ("ema", "one_euro", "savgol")
+SAVGOL_BLOCK = 4096  # Frames por bloque en el Savitzky-Golay en lote (acota la memoria)
+EMA_MIN_KEEP = 1e-12  # Cota inferior de (1 - a) en el EMA en lote (alpha·w = 1 no anula el producto)
+
+
+def visibility_weight(vis, min_weight=SMOOTHING["min_weight"]):
+    return np.clip(np.asarray(vis, dtype=np.float64), min_weight, 1.0)
+
+
+# === FILTROS STREAMING (un frame a la vez) ===
+class EMAFilter:
+    def __init__(self, alpha=SMOOTHING["alpha"], min_weight=SMOOTHING["min_weight"]):
+        self.alpha = alpha
+        self.min_weight = min_weight
+        self.reset()
+
+    def reset(self):
+        self.prev = None
+
+    def update(self, xyz, vis, dt=None):
+        """xyz (33, 3), vis (33,) -> xyz suavizado (33, 3) float64."""
+        xyz = np.asarray(xyz, dtype=np.float64)
+        if self.prev is None:
+            self.prev = xyz.copy()
+        else:
+            a = (self.alpha * visibility_weight(vis, self.min_weight))[:, None]
+            self.prev = self.prev + a * (xyz - self.prev)
+        return self.prev
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=SMOOTHING["min_cutoff"], beta=SMOOTHING["beta"],
+                 d_cutoff=SMOOTHING["d_cutoff"], min_weight=SMOOTHING["min_weight"]):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.min_weight = min_weight
+        self.reset()
+
+    def reset(self):
+        self.prev = None
+        self.dprev = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, xyz, vis, dt=1.0 / 30.0):
+        xyz = np.asarray(xyz, dtype=np.float64)
+        if self.prev is None:
+            self.prev = xyz.copy()
+            self.dprev = np.zeros_like(xyz)
+            return self.prev
+        dt = dt if dt and dt > 0 else 1.0 / 30.0
+        dx = (xyz - self.prev) / dt
+        self.dprev = self.dprev + self._alpha(self.d_cutoff, dt) * (dx - self.dprev)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dprev)
+        a = self._alpha(cutoff, dt) * visibility_weight(vis, self.min_weight)[:, None]
+        self.prev = self.prev + a * (xyz - self.prev)
+        return self.prev
+
+
+def _weighted_fit_at(values, weights, t, polyorder):
+    """Ajuste polinomial ponderado en cada ventana; devuelve el valor en t = 0.
+
+    values (..., k, 3), weights (..., k), t (k,) -> (..., 3).
+    """
+    powers = t[:, None] ** np.arange(2 * polyorder + 1)            # (k, 2p+1)
+    moments = weights @ powers                                      # (..., 2p+1)
+    idx = np.arange(polyorder + 1)
+    lhs = moments[..., idx[:, None] + idx[None, :]]                 # (..., p+1, p+1)
+    rhs = np.einsum("...k,kj,...kc->...jc", weights, powers[:, :polyorder + 1], values)
+    return np.linalg.solve(lhs, rhs)[..., 0, :]
+
+
+class SavGolFilter:
+    """Savitzky-Golay causal: ajusta las últimas `window` muestras y evalúa en la última."""
+
+    def __init__(self, window=SMOOTHING["window"], polyorder=SMOOTHING["polyorder"],
+                 min_weight=SMOOTHING["min_weight"]):
+        self.window = window
+        self.polyorder = polyorder
+        self.min_weight = min_weight
+        self.reset()
+
+    def reset(self):
+        self._values = np.zeros((self.window, 33, 3))
+        self._weights = np.zeros((self.window, 33))
+        self.count = 0
+
+    def update(self, xyz, vis, dt=None):
+        xyz = np.asarray(xyz, dtype=np.float64)
+        self._values = np.roll(self._values, -1, axis=0)
+        self._weights = np.roll(self._weights, -1, axis=0)
+        self._values[-1] = xyz
+        self._weights[-1] = visibility_weight(vis, self.min_weight)
+        self.count += 1
+        k = min(self.count, self.window)
+        if k <= self.polyorder:
+            return xyz
+        t = np.arange(-k + 1, 1, dtype=np.float64)
+        values = self._values[-k:].transpose(1, 0, 2)   # (33, k, 3)
+        weights = self._weights[-k:].T                  # (33, k)
+        return _weighted_fit_at(values, weights, t, self.polyorder)
+
+
+def make_filter(settings=None):
+    """Filtro streaming según settings["method"]; None si no hay suavizado."""
+    s = {**SMOOTHING, **(settings or {})}
+    if s["method"] is None:
+        return None
+    if s["method"] == "ema":
+        return EMAFilter(s["alpha"], s["min_weight"])
+    if s["method"] == "one_euro":
+        return OneEuroFilter(s["min_cutoff"], s["beta"], s["d_cutoff"], s["min_weight"])
+    if s["method"] == "savgol":
+        return SavGolFilter(s["window"], s["polyorder"], s["min_weight"])
+    raise ValueError(f"Método de suavizado desconocido: {s['method']} (opciones: {METHODS})")
+
+
+# === EN LOTE ===
+def ema_video(xyz, vis, alpha=SMOOTHING["alpha"], min_weight=SMOOTHING["min_weight"], prev=None):
+    """EMA ponderado de un video, vectorizado: xyz (n, 33, 3), vis (n, 33) -> (n, 33, 3) float64.
+
+    La recurrencia y_t = (1 - a_t) y_{t-1} + a_t x_t, con a_t = alpha·w_t,
+    se escribe como y_t = P_t (y_0 + Σ_k a_k x_k / P_k) con P_t = Π_k (1 - a_k)
+    y se evalúa con cumprod/cumsum por bloques, cortados para que 1/P no
+    desborde. `prev` es el estado de un EMAFilter que continúa (None = el
+    primer frame inicia el filtro).
+    """
+    xyz = np.asarray(xyz, dtype=np.float64)
+    n = len(xyz)
+    out = np.empty((n, 33, 3))
+    if not n:
+        return out
+    a = alpha * visibility_weight(vis, min_weight)
+    keep = np.maximum(1.0 - a, EMA_MIN_KEEP)[..., None]
+    ax = a[..., None] * xyz
+    if prev is None:
+        out[0] = xyz[0]
+        y, first = xyz[0], 1
+    else:
+        y, first = np.asarray(prev, dtype=np.float64), 0
+    # P de un bloque >= keep_min ** block >= 1e-200
+    log_keep = np.log10(keep.min())
+    block = max(int(200 / -log_keep), 1) if log_keep < 0 else n
+    for start in range(first, n, block):
+        stop = min(start + block, n)
+        P = np.cumprod(keep[start:stop], axis=0)
+        out[start:stop] = P * (y + np.cumsum(ax[start:stop] / P, axis=0))
+        y = out[stop - 1]
+    return out
+
+
+def savgol_video(xyz, vis, window=SMOOTHING["window"], polyorder=SMOOTHING["polyorder"],
+                 min_weight=SMOOTHING["min_weight"]):
+    """Savitzky-Golay centrado y ponderado de un video: xyz (n, 33, 3), vis (n, 33)."""
+    n = len(xyz)
+    if n <= polyorder:
+        return np.asarray(xyz, dtype=np.float64)
+    window = min(window, n if n % 2 else n - 1)
+    half = window // 2
+    # Bordes: se repite el primer/último frame
+    values = np.pad(np.asarray(xyz, dtype=np.float64), ((half, half), (0, 0), (0, 0)), mode="edge")
+    weights = np.pad(visibility_weight(vis, min_weight), ((half, half), (0, 0)), mode="edge")
+    t = np.arange(-half, half + 1, dtype=np.float64)
+    out = np.empty((n, 33, 3))
+    for start in range(0, n, SAVGOL_BLOCK):
+        stop = min(start + SAVGOL_BLOCK, n)
+        v = sliding_window_view(values[start:stop + 2 * half], window, axis=0)   # (b, 33, 3, k)
+        w = sliding_window_view(weights[start:stop + 2 * half], window, axis=0)  # (b, 33, k)
+        out[start:stop] = _weighted_fit_at(v.transpose(0, 1, 3, 2), w, t, polyorder)
+    return out
+
+
+def smooth_landmarks(lm, first, settings=None, dt=None, carry=None):
+    """Suaviza x, y, z de landmarks (N, 33, 4) de videos consecutivos.
+
+    `first` marca el primer frame de cada video (FeatureContext.first); el
+    filtro se reinicia en cada uno. `dt` son los segundos desde el frame
+    anterior (One-Euro). `carry` es un filtro streaming que continúa el primer
+    video (procesamiento por bloques); no aplica a Savitzky-Golay, que es
+    centrado. EMA y Savitzky-Golay son vectorizados por video; One-Euro
+    recorre los frames en un loop de Python (ver el encabezado del módulo).
+    Devuelve (landmarks suavizados float32, filtro del último video).
+    """
+    s = {**SMOOTHING, **(settings or {})}
+    out = np.array(lm, dtype=np.float32, copy=True)
+    if s["method"] is None or not len(lm):
+        return out, carry
+    n = len(lm)
+    dt = np.full(n, 1.0 / 30.0) if dt is None else np.asarray(dt, dtype=np.float64)
+    starts = np.flatnonzero(first)
+    if not len(starts) or starts[0] != 0:
+        starts = np.concatenate([[0], starts])
+    bounds = list(zip(starts, np.append(starts[1:], n)))
+
+    if s["method"] == "savgol":
+        if carry is not None:
+            raise ValueError("Savitzky-Golay es centrado: necesita videos completos, no bloques")
+        for a, b in bounds:
+            out[a:b, :, :3] = savgol_video(lm[a:b, :, :3], lm[a:b, :, 3], s["window"], s["polyorder"],
+                                           s["min_weight"])
+        return out, None
+
+    filt = None
+    for i, (a, b) in enumerate(bounds):
+        if i == 0 and carry is not None:
+            filt = carry
+        else:
+            filt = make_filter(s)
+        xyz, vis = lm[a:b, :, :3], lm[a:b, :, 3]
+        if s["method"] == "ema":
+            smoothed = ema_video(xyz, vis, filt.alpha, filt.min_weight, filt.prev)
+            out[a:b, :, :3] = smoothed
+            if b > a:
+                filt.prev = smoothed[-1].copy()
+            continue
+        for j in range(b - a):
+            out[a + j, :, :3] = filt.update(xyz[j], vis[j], dt[a + j])
+    return out, filt
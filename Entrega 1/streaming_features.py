@@ -0,0 +1,169 @@
+"""
+Cálculo incremental de features, un frame de landmarks a la vez.
+
+StreamingFeatureExtractor guarda solo el estado mínimo del frame anterior
+(posiciones, velocidades, ángulos, timestamp) y un buffer circular con las
+últimas aceleraciones para la ventana de suavidad, así que cada frame cuesta
+O(1) sin recalcular ventanas. El vector que emite es el mismo que produce
+features.compute_features en lote para ese frame; check_stream_batch_parity
+lo comprueba con landmarks sintéticos.
+
+Velocidad y aceleración de landmarks usan `fps` entre frames consecutivos,
+como en lote. Si el timestamp salta más de DROP_GAP períodos (el pipeline en
+vivo descartó frames atrasados), se escalan con el dt real, así no salen
+inflados por los frames que faltan.
+"""
+
+import numpy as np
+
+import features
+
+# Grupos que solo dependen del frame actual: se reutiliza la función en lote
+STATELESS_FEATURES = {"joint_angles", "trunk_tilt", "symmetry", "bbox", "spatial"}
+DROP_GAP = 1.5  # Salto de timestamp (en períodos de frame) que se trata como frames descartados
+
+
+class StreamingFeatureExtractor:
+    """Extractor de features frame a frame para un único stream (video o cámara)."""
+
+    def __init__(self, names=features.ENRICH_FEATURES, fps=30.0, smoothness_window=features.SMOOTHNESS_WINDOW):
+        unknown = [n for n in names if n not in STATELESS_FEATURES and not hasattr(self, f"_update_{n}")]
+        if unknown:
+            raise ValueError(f"Features sin versión incremental: {unknown}")
+        self.names = list(names)
+        self.columns = features.feature_columns(self.names)
+        self.fps = fps
+        self.window = smoothness_window
+        self._ctx1 = features.FeatureContext(np.zeros(1))
+        self.reset()
+
+    def reset(self):
+        """Olvida el estado (p. ej. al empezar un video nuevo)."""
+        self.position = 0
+        self._prev_lm = None
+        self._prev_ts = np.nan
+        self._prev_speed = np.zeros(len(features.SPEED_LANDMARKS))
+        self._prev_body_speed = 0.0
+        self._prev_angles = None
+        self._accels = np.zeros(self.window)  # Buffer circular de aceleraciones
+
+    def update(self, landmarks, timestamp_ms=None, fps=None):
+        """Procesa un frame (33, 4) y devuelve el vector de features (orden de `columns`)."""
+        lm = np.asarray(landmarks, dtype=np.float32)
+        fps = self.fps if fps is None else fps
+        ts = np.nan if timestamp_ms is None else float(timestamp_ms)
+        self._rate = self._frame_rate(ts, fps)
+        self._cur_speed = self._speed(lm, self._rate)
+        parts = []
+        for name in self.names:
+            if name in STATELESS_FEATURES:
+                parts.append(features.FEATURES[name][1](lm[None], self._ctx1)[0])
+            else:
+                parts.append(getattr(self, f"_update_{name}")(lm, ts, fps))
+        # acceleration necesita la velocidad previa aunque "speed" no esté en names
+        self._prev_speed = self._cur_speed
+        self._prev_lm = lm
+        self._prev_ts = ts
+        self.position += 1
+        return np.concatenate(parts)
+
+    def update_dict(self, landmarks, timestamp_ms=None, fps=None):
+        """Igual que update, pero devuelve un dict columna -> valor."""
+        return dict(zip(self.columns, self.update(landmarks, timestamp_ms, fps).tolist()))
+
+    # === Grupos con estado ===
+    def _frame_rate(self, ts, fps):
+        """fps nominal, o 1000 / dt real si desde el frame anterior se perdieron frames."""
+        gap_ms = ts - self._prev_ts
+        if fps > 0 and gap_ms > DROP_GAP * 1000.0 / fps:
+            return 1000.0 / gap_ms
+        return fps
+
+    def _speed(self, lm, fps):
+        if self._prev_lm is None:
+            return np.zeros(len(features.SPEED_LANDMARKS))
+        cur = lm[features.SPEED_LANDMARKS, :2].astype(np.float64)
+        prev = self._prev_lm[features.SPEED_LANDMARKS, :2].astype(np.float64)
+        return np.sqrt(((cur - prev) ** 2).sum(axis=1)) * fps
+
+    def _update_speed(self, lm, ts, fps):
+        return self._cur_speed
+
+    def _update_acceleration(self, lm, ts, fps):
+        if self.position < 2:
+            return np.zeros(len(features.SPEED_LANDMARKS))
+        return (self._cur_speed - self._prev_speed) * self._rate
+
+    def _update_body_motion(self, lm, ts, fps):
+        xy = lm[:, :2].astype(np.float64)
+        center = xy[[features.SHOULDER_L, features.SHOULDER_R, features.HIP_L, features.HIP_R]].mean(axis=0)
+        shoulder_vec = xy[features.SHOULDER_R] - xy[features.SHOULDER_L]
+        head_vec = xy[features.NOSE] - xy[[features.SHOULDER_L, features.SHOULDER_R]].mean(axis=0)
+        angles = np.array([np.arctan2(shoulder_vec[1], shoulder_vec[0]),
+                           np.arctan2(head_vec[1], head_vec[0])])
+
+        out = np.zeros(8)
+        if self.position == 0:
+            self._prev_body_speed = 0.0
+            accel = 0.0
+        else:
+            prev_xy = self._prev_lm[:, :2].astype(np.float64)
+            prev_center = prev_xy[[features.SHOULDER_L, features.SHOULDER_R,
+                                   features.HIP_L, features.HIP_R]].mean(axis=0)
+            dt = (ts - self._prev_ts) / 1000.0
+            step = center - prev_center
+            step_norm = np.sqrt((step ** 2).sum())
+            speed = step_norm / dt if dt > 0 else 0.0
+            direction = step / (step_norm + features.EPS) if dt > 0 else np.zeros(2)
+            dt_eps = np.nan_to_num(dt) + features.EPS
+            joints = np.sqrt(((xy[features.MOTION_JOINTS] - prev_xy[features.MOTION_JOINTS]) ** 2)
+                             .sum(axis=1)).mean() / dt_eps
+            accel = (speed - self._prev_body_speed) / dt_eps if self.position >= 2 else 0.0
+            out[:7] = [speed, direction[0], direction[1], joints,
+                       angles[0] - self._prev_angles[0], angles[1] - self._prev_angles[1], accel]
+            self._prev_body_speed = speed
+
+        self._accels[self.position % self.window] = accel
+        if self.position >= self.window:
+            out[7] = self._accels.var()
+        self._prev_angles = angles
+        return out
+
+
+def synthetic_landmarks(n_frames, seed=0):
+    """Caminata aleatoria suave de 33 landmarks, para pruebas sin videos."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.3, 0.7, size=(1, 33, 4))
+    steps = rng.normal(0.0, 0.004, size=(n_frames, 33, 4))
+    lm = base + np.cumsum(steps, axis=0)
+    lm[:, :, 3] = rng.uniform(0.0, 1.0, size=(n_frames, 33))
+    return lm.astype(np.float32)
+
+
+def check_stream_batch_parity(names=features.ENRICH_FEATURES + ["body_motion"],
+                              n_videos=3, n_frames=120, fps=30.0, seed=0):
+    """Compara streaming vs. lote sobre landmarks sintéticos; devuelve el máximo error absoluto.
+
+    Un NaN (o ±inf) en un lado y un valor distinto en el otro cuenta como
+    error infinito; el resto se compara donde ambos son finitos.
+    """
+    lm = np.concatenate([synthetic_landmarks(n_frames, seed + v) for v in range(n_videos)])
+    # Frames degenerados (todos los landmarks en un punto): ángulos NaN en ambos lados
+    lm[7::37] = lm[7::37, :1]
+    video_ids = np.repeat(np.arange(n_videos), n_frames)
+    timestamps = np.tile(np.arange(n_frames) * 1000.0 / fps, n_videos)
+    ctx = features.FeatureContext(video_ids, fps=np.full(len(lm), fps), timestamp_ms=timestamps)
+    batch = np.column_stack(list(features.compute_features(lm, ctx, names).values()))
+
+    extractor = StreamingFeatureExtractor(names, fps=fps)
+    stream = []
+    for i in range(len(lm)):
+        if ctx.first[i]:
+            extractor.reset()
+        stream.append(extractor.update(lm[i], timestamps[i]))
+    stream = np.asarray(stream)
+    for special in (np.isnan, np.isposinf, np.isneginf):
+        if not np.array_equal(special(batch), special(stream)):
+            return float("inf")
+    finite = np.isfinite(batch) & np.isfinite(stream)
+    return float(np.abs(batch[finite] - stream[finite]).max(initial=0.0))
@@ -0,0 +1,368 @@
+"""
+Entrenamiento de clasificadores de actividad (SVM, Random Forest y XGBoost).
+
+Usa el dataset enriquecido: posiciones (landmarks relativos al centro de la
+cadera y escalados por el torso), velocidades, aceleraciones, ángulos y
+simetría. Validación cruzada agrupada por video_id (GroupKFold: los frames de
+un video nunca quedan en train y test a la vez) con búsqueda de
+hiperparámetros en grilla.
+
+Para que la memoria no crezca con el corpus ni con los workers:
+- La matriz de features se construye una vez, un video a la vez, como un
+  .npy float32 (TRAIN_DIR/features.npy) y se abre con mmap_mode="r". Los
+  workers la mapean en su inicializador: no se copia ni se serializa a cada
+  tarea.
+- Las particiones de los folds se guardan como un fold por fila (int8) en
+  TRAIN_DIR/folds.npz.
+Ambos se reutilizan mientras el dataset (su huella) no cambie.
+
+Cada par (candidato, fold) es una tarea de un ProcessPoolExecutor. El mejor
+candidato (mayor F1 macro promedio) se reentrena con todos los datos y se
+guarda en MODEL_OUT junto con las clases y columnas.
+
+XGBoost es opcional: se usa solo si está instalado.
+
+Uso:
+    python train_classifier.py
+    python train_classifier.py --models rf svm --folds 5 --workers 4
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import GroupKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+import dataset_io
+import features
+import profiling
+from label_index import UNLABELED
+
+TRAIN_DIR = "training_features"
+MODEL_OUT = "activity_classifier.joblib"
+TRAIN = {
+    "folds": 5,
+    "seed": 42,
+    "max_train_rows": 50000,   # Submuestreo de filas de entrenamiento por fold (None = todas)
+    "drop_low_quality": True,
+}
+POSITION_LANDMARKS = list(range(33))
+FEATURE_NAMES = ["speed", "acceleration", "joint_angles", "trunk_tilt", "symmetry"]
+
+HAS_XGBOOST = find_spec("xgboost") is not None
+
+
+def _svm(**params):
+    return make_pipeline(StandardScaler(), SVC(kernel="rbf", **params))
+
+
+def _random_forest(**params):
+    return RandomForestClassifier(n_jobs=1, **params)
+
+
+def _xgboost(**params):
+    from xgboost import XGBClassifier
+    return XGBClassifier(n_jobs=1, tree_method="hist", **params)
+
+
+# nombre -> (constructor, grilla de hiperparámetros)
+MODELS = {
+    "svm": (_svm, {"C": [1.0, 10.0], "gamma": ["scale", 0.01]}),
+    "rf": (_random_forest, {"n_estimators": [200], "max_depth": [None, 20], "min_samples_leaf": [1, 5]}),
+}
+if HAS_XGBOOST:
+    MODELS["xgboost"] = (_xgboost, {"n_estimators": [300], "max_depth": [4, 8], "learning_rate": [0.1]})
+
+
+def feature_columns():
+    """Columnas de la matriz de entrenamiento (en orden)."""
+    positions = [f"{c}_{i}" for i in POSITION_LANDMARKS for c in "xyz"]
+    return positions + features.feature_columns(FEATURE_NAMES)
+
+
+def _chunk_matrix(chunk, columns):
+    """Features float32 de un bloque; posiciones relativas a la cadera y escala del torso."""
+    X = chunk[columns].to_numpy(dtype=np.float32, copy=True)
+    n_pos = 3 * len(POSITION_LANDMARKS)
+    pos = X[:, :n_pos].reshape(len(X), -1, 3)
+    scale = chunk["torso_scale"].to_numpy(dtype=np.float32)
+    scale = np.where(scale > features.EPS, scale, np.nan)[:, None]
+    pos[:, :, 0] = (pos[:, :, 0] - chunk["hip_center_x"].to_numpy(dtype=np.float32)[:, None]) / scale
+    pos[:, :, 1] = (pos[:, :, 1] - chunk["hip_center_y"].to_numpy(dtype=np.float32)[:, None]) / scale
+    pos[:, :, 2] = pos[:, :, 2] / scale
+    X[:, :n_pos] = pos.reshape(len(X), n_pos)
+    # Primeros frames (sin velocidad) y torsos degenerados: 0 en vez de NaN
+    return np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class TrainingData:
+    """Matriz de features mapeada en memoria + etiquetas y grupos (video_id) por fila."""
+
+    def __init__(self, store_dir=TRAIN_DIR):
+        self.store_dir = store_dir
+        self.X = np.load(os.path.join(store_dir, "features.npy"), mmap_mode="r")
+        with np.load(os.path.join(store_dir, "index.npz")) as index:
+            self.y = index["y"]
+            self.groups = index["groups"]
+            self.classes = index["classes"]
+            self.columns = index["columns"].tolist()
+            self.source = index["source"].item()
+            self.settings = index["settings"].item()
+
+    def __len__(self):
+        return len(self.y)
+
+
+def _keep_mask(df, drop_low_quality):
+    """Filas etiquetadas (y de calidad suficiente si drop_low_quality) de un bloque."""
+    keep = df["label"].astype(str).ne(UNLABELED)
+    if drop_low_quality:
+        keep &= ~df["low_quality"].fillna(False).astype(bool)
+    return keep.to_numpy()
+
+
+def build_training_data(dataset_path, store_dir=TRAIN_DIR, drop_low_quality=TRAIN["drop_low_quality"]):
+    """Escribe la matriz float32 de entrenamiento un video a la vez (sin cargar el dataset entero).
+
+    Filtro, etiquetas y grupos se calculan sobre cada bloque, así quedan
+    alineados con sus filas de X cualquiera sea el orden en que
+    iter_video_chunks entrega los videos.
+    """
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    columns = feature_columns()
+    keep_cols = ["video_id", "label"] + (["low_quality"] if drop_low_quality else [])
+    # Primera pasada, solo metadatos: filas a guardar y clases
+    meta = dataset_io.read_dataset(dataset_path, columns=keep_cols[1:])
+    keep = _keep_mask(meta, drop_low_quality)
+    classes = np.unique(meta["label"].to_numpy(dtype=str)[keep])
+    n_rows = int(keep.sum())
+    del meta, keep
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = os.path.join(store_dir, "features.tmp.npy")
+    X = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(n_rows, len(columns)))
+    read_cols = list(dict.fromkeys(columns + ["hip_center_x", "hip_center_y", "torso_scale"] + keep_cols))
+    y, groups = [], []
+    pos = 0
+    for chunk in dataset_io.iter_video_chunks(dataset_path, columns=read_cols):
+        chunk = chunk[_keep_mask(chunk, drop_low_quality)]
+        n = len(chunk)
+        if n:
+            X[pos:pos + n] = _chunk_matrix(chunk, columns)
+            y.append(np.searchsorted(classes, chunk["label"].to_numpy(dtype=str)))
+            groups.append(chunk["video_id"].to_numpy(dtype=str))
+            pos += n
+    X.flush()
+    del X
+    if pos != n_rows:
+        raise ValueError(f"El dataset cambió durante la lectura ({pos} filas en vez de {n_rows})")
+    os.replace(tmp_path, os.path.join(store_dir, "features.npy"))
+    np.savez(
+        os.path.join(store_dir, "index.npz"),
+        y=np.concatenate(y).astype(np.int64) if y else np.zeros(0, dtype=np.int64),
+        groups=np.concatenate(groups) if groups else np.zeros(0, dtype=str),
+        classes=classes,
+        columns=np.asarray(columns),
+        source=np.asarray(dataset_io.source_fingerprint(dataset_path)),
+        settings=np.asarray(f"drop_low_quality={drop_low_quality}"),
+    )
+    return TrainingData(store_dir)
+
+
+def open_training_data(dataset_path=dataset_io.ENRICHED_DATASET, store_dir=TRAIN_DIR,
+                       drop_low_quality=TRAIN["drop_low_quality"]):
+    """Abre la matriz guardada; la reconstruye si el dataset o las columnas cambiaron."""
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    try:
+        data = TrainingData(store_dir)
+        if (data.source == dataset_io.source_fingerprint(dataset_path)
+                and data.columns == feature_columns()
+                and data.settings == f"drop_low_quality={drop_low_quality}"):
+            return data
+    except (OSError, KeyError):
+        pass
+    return build_training_data(dataset_path, store_dir, drop_low_quality)
+
+
+def fold_assignments(data, n_folds=TRAIN["folds"]):
+    """Fold de test de cada fila (GroupKFold por video_id), guardado junto a la matriz."""
+    path = os.path.join(data.store_dir, "folds.npz")
+    n_folds = min(n_folds, len(np.unique(data.groups)))
+    try:
+        with np.load(path) as cached:
+            if cached["source"].item() == data.source and cached["n_folds"].item() == n_folds \
+                    and len(cached["fold"]) == len(data):
+                return cached["fold"]
+    except (OSError, KeyError):
+        pass
+    fold = np.empty(len(data), dtype=np.int8)
+    for k, (_, test) in enumerate(GroupKFold(n_splits=n_folds).split(np.empty(len(data)), data.y, data.groups)):
+        fold[test] = k
+    np.savez(path, fold=fold, n_folds=n_folds, source=np.asarray(data.source))
+    return fold
+
+
+def candidates(model_names):
+    """Todas las combinaciones (modelo, hiperparámetros) de las grillas."""
+    out = []
+    for name in model_names:
+        _, grid = MODELS[name]
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            out.append((name, dict(zip(keys, values))))
+    return out
+
+
+def make_model(name, params, seed=TRAIN["seed"]):
+    factory, _ = MODELS[name]
+    if name == "svm":
+        return factory(**params)
+    return factory(random_state=seed, **params)
+
+
+def _subsample(idx, y, max_rows, seed):
+    """Submuestreo estratificado de índices de entrenamiento (mantiene la proporción de clases)."""
+    if max_rows is None or len(idx) <= max_rows:
+        return idx
+    rng = np.random.default_rng(seed)
+    keep = rng.random(len(idx)) < max_rows / len(idx)
+    # Cada clase conserva al menos una fila
+    keep[np.unique(y[idx], return_index=True)[1]] = True
+    return idx[keep]
+
+
+# === WORKERS (la matriz se mapea una vez por proceso) ===
+_worker_data = None
+_worker_fold = None
+
+
+def _init_worker(store_dir, fold):
+    global _worker_data, _worker_fold
+    _worker_data = TrainingData(store_dir)
+    _worker_fold = fold
+
+
+def _fit_fold(name, params, k, max_train_rows, seed):
+    """Entrena un candidato en los folds != k y evalúa en el fold k."""
+    data, fold = _worker_data, _worker_fold
+    train = _subsample(np.flatnonzero(fold != k), data.y, max_train_rows, seed + k)
+    test = np.flatnonzero(fold == k)
+    t0 = time.perf_counter()
+    model = make_model(name, params, seed)
+    # Solo se copian a memoria las filas del fold (fancy indexing sobre el memmap)
+    model.fit(data.X[train], data.y[train])
+    fit_s = time.perf_counter() - t0
+    pred = model.predict(data.X[test])
+    return {
+        "model": name,
+        "params": params,
+        "fold": int(k),
+        "f1_macro": float(f1_score(data.y[test], pred, average="macro")),
+        "accuracy": float(accuracy_score(data.y[test], pred)),
+        "fit_s": fit_s,
+        "train_rows": int(len(train)),
+    }
+
+
+def cross_validate(data, fold, model_names, workers=1, max_train_rows=TRAIN["max_train_rows"],
+                   seed=TRAIN["seed"]):
+    """Evalúa todos los candidatos en todos los folds; devuelve un resultado por (candidato, fold)."""
+    tasks = [(name, params, k, max_train_rows, seed)
+             for name, params in candidates(model_names) for k in range(int(fold.max()) + 1)]
+    if workers <= 1:
+        _init_worker(data.store_dir, fold)
+        return [_fit_fold(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data.store_dir, fold)) as executor:
+        futures = [executor.submit(_fit_fold, *task) for task in tasks]
+        return [f.result() for f in futures]
+
+
+def summarize(results):
+    """Promedio por candidato, ordenado de mejor a peor F1 macro."""
+    grouped = {}
+    for r in results:
+        key = (r["model"], tuple(sorted(r["params"].items())))
+        grouped.setdefault(key, []).append(r)
+    summary = [{
+        "model": model,
+        "params": dict(params),
+        "f1_macro": float(np.mean([r["f1_macro"] for r in rs])),
+        "f1_std": float(np.std([r["f1_macro"] for r in rs])),
+        "accuracy": float(np.mean([r["accuracy"] for r in rs])),
+        "fit_s": float(np.mean([r["fit_s"] for r in rs])),
+    } for (model, params), rs in grouped.items()]
+    return sorted(summary, key=lambda s: -s["f1_macro"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena clasificadores con validación cruzada por video.")
+    parser.add_argument("--dataset", default=dataset_io.ENRICHED_DATASET)
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--folds", type=int, default=TRAIN["folds"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para evaluar (candidato, fold) en paralelo")
+    parser.add_argument("--max-train-rows", type=int, default=TRAIN["max_train_rows"],
+                        help="Filas de entrenamiento por fold (submuestreo estratificado)")
+    parser.add_argument("--keep-low-quality", action="store_true", help="No descarta frames de baja calidad")
+    parser.add_argument("--out", default=MODEL_OUT)
+    args = parser.parse_args()
+
+    profiler = profiling.RunProfiler("train_classifier")
+    if not HAS_XGBOOST:
+        print("ℹ️  xgboost no está instalado: se entrenan solo SVM y Random Forest")
+
+    print(f"📂 Matriz de features: {args.dataset} -> {TRAIN_DIR}/")
+    with profiler.stage("features"):
+        data = open_training_data(args.dataset, drop_low_quality=not args.keep_low_quality)
+        if not len(data):
+            print("❌ No hay frames etiquetados para entrenar (¿todos de baja calidad? probar --keep-low-quality)")
+            return
+        fold = fold_assignments(data, args.folds)
+    n_videos = len(np.unique(data.groups))
+    print(f"   ✓ {len(data)} frames x {len(data.columns)} features (float32), {n_videos} videos, "
+          f"{int(fold.max()) + 1} folds")
+    print(f"   Clases: {', '.join(data.classes)}")
+
+    n_tasks = len(candidates(args.models)) * (int(fold.max()) + 1)
+    print(f"🔁 Validación cruzada: {n_tasks} entrenamientos con {args.workers} workers")
+    with profiler.stage("cross_validation", frames=len(data) * len(candidates(args.models))):
+        results = cross_validate(data, fold, args.models, args.workers, args.max_train_rows)
+    summary = summarize(results)
+    for s in summary:
+        print(f"   {s['model']:8s} F1={s['f1_macro']:.3f}±{s['f1_std']:.3f} acc={s['accuracy']:.3f} "
+              f"fit={s['fit_s']:.2f}s {s['params']}")
+
+    best = summary[0]
+    print(f"🏆 Mejor: {best['model']} {best['params']} (F1 macro {best['f1_macro']:.3f})")
+    with profiler.stage("refit", frames=len(data)):
+        train = _subsample(np.arange(len(data)), data.y, args.max_train_rows, TRAIN["seed"])
+        model = make_model(best["model"], best["params"])
+        model.fit(data.X[train], data.y[train])
+    joblib.dump({
+        "model": model,
+        "model_name": best["model"],
+        "params": best["params"],
+        "classes": data.classes.tolist(),
+        "columns": data.columns,
+        "position_landmarks": POSITION_LANDMARKS,
+        "feature_names": FEATURE_NAMES,
+        "cv_summary": summary,
+    }, args.out)
+    print(f"💾 Modelo guardado en: {args.out}")
+    profiler.count(rows=len(data), candidates=len(summary))
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,48 @@
 """
 Script de verificación del pipeline
 Comprueba que todo está configurado correctamente antes de ejecutar
+
+Por defecto es una verificación rápida: de los datasets solo lee metadatos
+(filas y columnas del Parquet, o cabecera y conteo de líneas del CSV), las
+filas por video se comparan con el manifiesto que escribe
+extract_mediapipe_data.py, y las dependencias se buscan con find_spec sin
+importarlas. Con --deep además revisa el contenido sobre una muestra
+estratificada por video (tasa de NaN y rangos de landmarks), sin cargar el
+dataset completo.
+
+Uso:
+    python verify_pipeline.py
+    python verify_pipeline.py --deep --rows-per-video 500
 """
 
+import argparse
 import json
 import os
 import sys
+from importlib.util import find_spec
+
+import dataset_io
+import profiling
+
+RAW_DATASET = dataset_io.RAW_DATASET
+ENRICHED_DATASET = dataset_io.ENRICHED_DATASET
+DEEP = {
+    "rows_per_video": 200,
+    "max_videos": None,         # None = todos los videos
+    "max_nan_rate": 0.01,       # Landmarks
+    "max_out_of_range": 0.01,   # Fracción de x/y fuera de [-0.5, 1.5] o v fuera de [0, 1]
+    "xy_range": (-0.5, 1.5),
+}
+
+parser = argparse.ArgumentParser(description="Verifica la configuración y las salidas del pipeline.")
+parser.add_argument("--deep", action="store_true",
+                    help="Revisa el contenido (NaN, rangos) sobre una muestra estratificada por video")
+parser.add_argument("--rows-per-video", type=int, default=DEEP["rows_per_video"])
+parser.add_argument("--max-videos", type=int, default=DEEP["max_videos"])
+args = parser.parse_args()
 
 print("=" * 70)
-print("🔍 VERIFICACIÓN DEL PIPELINE")
+print("🔍 VERIFICACIÓN DEL PIPELINE" + (" (profunda)" if args.deep else ""))
 print("=" * 70)
 
 errors = []
@@ -42,7 +76,10 @@ print("\n2️⃣  Scripts requeridos...")
 scripts = [
     "extract_mediapipe_data.py",
     "enrich_dataset.py",
-    "eda_basic.py"
+    "eda_basic.py",
+    "dataset_io.py",
+    "profiling.py",
+    "pose_backends.py",
 ]
 
 for script in scripts:
@@ -51,17 +88,68 @@ for script in scripts:
     else:
         errors.append(f"❌ No encontrado: {script}")
 
-# 3. Verificar archivos de salida del paso 1
+def check_manifest(path, manifest):
+    """Compara las filas por video del dataset (metadatos) con el manifiesto de la extracción."""
+    counts = dataset_io.video_frame_counts(path)
+    expected = manifest["videos"]
+    missing = sorted(set(expected) - set(counts))
+    extra = sorted(set(counts) - set(expected))
+    mismatched = {k: (counts[k], expected[k]) for k in set(counts) & set(expected) if counts[k] != expected[k]}
+    if missing:
+        warnings.append(f"⚠️  {path}: videos del manifiesto ausentes: {missing}")
+    if extra:
+        warnings.append(f"⚠️  {path}: videos que no están en el manifiesto: {extra}")
+    for video_id, (got, want) in sorted(mismatched.items()):
+        warnings.append(f"⚠️  {path}: video {video_id} con {got} filas (manifiesto: {want})")
+    if not (missing or extra or mismatched):
+        print(f"   ✓ Filas por video = manifiesto ({len(expected)} videos)")
+
+
+def deep_check(path, columns):
+    """Tasa de NaN y rangos de landmarks sobre una muestra estratificada por video."""
+    lm_cols = [c for c in dataset_io.landmark_columns() if c in columns]
+    other = [c for c in columns if c not in lm_cols and c not in ("label", "frame_source")]
+    sample = dataset_io.sample_by_video(path, columns=lm_cols + other, rows_per_video=args.rows_per_video,
+                                        max_videos=args.max_videos)
+    n_videos = sample["video_id"].nunique() if "video_id" in sample else 0
+    print(f"   🔬 Muestra: {len(sample)} filas de {n_videos} videos")
+    if not len(sample):
+        return
+    nan_rate = sample.isna().mean()
+    lm_nan = float(nan_rate[lm_cols].max()) if lm_cols else 0.0
+    if lm_nan > DEEP["max_nan_rate"]:
+        warnings.append(f"⚠️  {path}: landmarks con {100*lm_nan:.1f}% de NaN en la muestra")
+    else:
+        print(f"   ✓ NaN en landmarks: {100*lm_nan:.2f}% (máx. por columna)")
+    all_nan = [c for c in other if nan_rate[c] == 1.0]
+    if all_nan:
+        warnings.append(f"⚠️  {path}: columnas sin ningún valor en la muestra: {all_nan}")
+    worst = nan_rate[other].sort_values(ascending=False).head(3)
+    worst = worst[worst > 0]
+    if len(worst):
+        print("   ⓘ Mayor tasa de NaN: " + ", ".join(f"{c} {100*r:.1f}%" for c, r in worst.items()))
+    lo, hi = DEEP["xy_range"]
+    xy = sample[[c for c in lm_cols if c[0] in "xy"]].to_numpy()
+    vis = sample[[c for c in lm_cols if c[0] == "v"]].to_numpy()
+    out_xy = float(((xy < lo) | (xy > hi)).mean()) if xy.size else 0.0
+    out_v = float(((vis < 0) | (vis > 1)).mean()) if vis.size else 0.0
+    if out_xy > DEEP["max_out_of_range"] or out_v > DEEP["max_out_of_range"]:
+        warnings.append(f"⚠️  {path}: landmarks fuera de rango (x/y {100*out_xy:.2f}%, visibility {100*out_v:.2f}%)")
+    else:
+        print(f"   ✓ Rangos de landmarks (x/y fuera de [{lo}, {hi}]: {100*out_xy:.2f}%, visibility: {100*out_v:.2f}%)")
+
+
+manifest = dataset_io.load_manifest(RAW_DATASET)
+
+# 3. Verificar archivos de salida del paso 1 (solo metadatos)
 print("\n3️⃣  Salida del paso 1 (extract_mediapipe_data.py)...")
 
-if os.path.exists("mediapipe_labels_dataset.csv"):
+raw_path = dataset_io.resolve_dataset_path(RAW_DATASET)
+if os.path.exists(raw_path):
     try:
-        import pandas as pd
-        df = pd.read_csv("mediapipe_labels_dataset.csv")
-        n_frames = len(df)
-        n_cols = len(df.columns)
-        print(f"   ✓ mediapipe_labels_dataset.csv ({n_frames} frames, {n_cols} columnas)")
-        
+        n_frames, columns = dataset_io.dataset_stats(raw_path)
+        print(f"   ✓ {raw_path} ({n_frames} frames, {len(columns)} columnas)")
+
         # Verificar columnas esperadas
         expected_cols = [
             "video_id", "frame_opencv", "frame_labelstudio",
@@ -71,51 +159,62 @@ if os.path.exists("mediapipe_labels_dataset.csv"):
             "bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax", "bbox_area", "bbox_aspect",
             "label"
         ]
-        
-        missing_cols = [c for c in expected_cols if c not in df.columns]
+
+        missing_cols = [c for c in expected_cols if c not in columns]
         if missing_cols:
             warnings.append(f"⚠️  Columnas faltantes: {missing_cols}")
-        
+
         # Verificar landmarks
-        landmark_cols = [c for c in df.columns if c.startswith("x_")]
+        landmark_cols = [c for c in columns if c.startswith("x_")]
         if len(landmark_cols) == 33:
             print(f"   ✓ Landmarks (33 puntos × 4 coords = {33*4} columnas)")
         else:
             warnings.append(f"⚠️  Landmarks incompletos: {len(landmark_cols)} puntos")
-            
+
+        if manifest is None:
+            print(f"   ⓘ Sin manifiesto ({dataset_io.manifest_path(RAW_DATASET)}); se escribe al extraer")
+        else:
+            check_manifest(raw_path, manifest)
+        if args.deep:
+            deep_check(raw_path, columns)
+
     except Exception as e:
-        errors.append(f"❌ Error al leer mediapipe_labels_dataset.csv: {e}")
+        errors.append(f"❌ Error al leer {raw_path}: {e}")
 else:
-    print("   ⓘ mediapipe_labels_dataset.csv no generado aún (ejecuta paso 1)")
+    print(f"   ⓘ {RAW_DATASET} no generado aún (ejecuta paso 1)")
 
-# 4. Verificar archivos de salida del paso 2
+# 4. Verificar archivos de salida del paso 2 (solo metadatos)
 print("\n4️⃣  Salida del paso 2 (enrich_dataset.py)...")
 
-if os.path.exists("mediapipe_labels_dataset_enriched.csv"):
+enriched_path = dataset_io.resolve_dataset_path(ENRICHED_DATASET)
+if os.path.exists(enriched_path):
     try:
-        import pandas as pd
-        df = pd.read_csv("mediapipe_labels_dataset_enriched.csv")
-        n_frames = len(df)
-        n_cols = len(df.columns)
-        print(f"   ✓ mediapipe_labels_dataset_enriched.csv ({n_frames} frames, {n_cols} columnas)")
-        
+        n_frames, columns = dataset_io.dataset_stats(enriched_path)
+        print(f"   ✓ {enriched_path} ({n_frames} frames, {len(columns)} columnas)")
+
         # Verificar features derivados
         derived_cols = [
             "speed_15", "speed_16", "speed_25", "speed_26", "speed_27", "speed_28",
             "knee_left_deg", "knee_right_deg", "elbow_left_deg", "elbow_right_deg",
             "segment_id", "low_quality"
         ]
-        
-        missing_derived = [c for c in derived_cols if c not in df.columns]
+
+        missing_derived = [c for c in derived_cols if c not in columns]
         if missing_derived:
             warnings.append(f"⚠️  Columnas derivadas faltantes: {missing_derived}")
         else:
             print(f"   ✓ Features derivados (velocidades, ángulos, segmentación)")
-            
+
+        # El enriquecimiento no agrega ni quita filas: mismas filas por video que la extracción
+        if manifest is not None:
+            check_manifest(enriched_path, manifest)
+        if args.deep:
+            deep_check(enriched_path, columns)
+
     except Exception as e:
-        errors.append(f"❌ Error al leer mediapipe_labels_dataset_enriched.csv: {e}")
+        errors.append(f"❌ Error al leer {enriched_path}: {e}")
 else:
-    print("   ⓘ mediapipe_labels_dataset_enriched.csv no generado aún (ejecuta paso 2)")
+    print(f"   ⓘ {ENRICHED_DATASET} no generado aún (ejecuta paso 2)")
 
 # 5. Verificar salida del paso 3 (gráficos)
 print("\n5️⃣  Salida del paso 3 (eda_basic.py)...")
@@ -143,21 +242,94 @@ required_packages = [
     ("cv2", "OpenCV"),
     ("mediapipe", "MediaPipe"),
     ("pandas", "Pandas"),
+    ("pyarrow", "PyArrow"),
     ("numpy", "NumPy"),
     ("matplotlib", "Matplotlib"),
     ("seaborn", "Seaborn"),
     ("tqdm", "tqdm"),
 ]
 
+# find_spec solo busca el paquete: no lo importa (mediapipe tarda segundos en cargar)
 all_packages_ok = True
 for module, name in required_packages:
-    try:
-        __import__(module)
+    if find_spec(module) is not None:
         print(f"   ✓ {name}")
-    except ImportError:
+    else:
         errors.append(f"❌ No instalado: {name} (pip install {module})")
         all_packages_ok = False
 
+
+def check_empty_video(video_id=None):
+    """Filas de un video sin detecciones (p. ej. backend null) vs. uno con una pose.
+
+    Devuelve la lista de problemas: el video vacío debe dar 0 filas con el
+    mismo esquema de columnas que uno con detecciones, con ambos mapeos de
+    frames (ratio y tabla por marcas de tiempo) y con o sin interpolación.
+    """
+    import numpy as np
+    import frame_alignment
+    from extract_mediapipe_data import build_video_rows
+
+    def raw(n):
+        return {"frames": np.arange(n, dtype=np.int32), "landmarks": np.zeros((n, 33, 4), dtype=np.float32),
+                "attempted": np.arange(10, dtype=np.int32), "timestamps_ms": np.arange(10) * 40.0,
+                "fps": 25.0, "width": 64, "height": 64, "total_frames": 10}
+
+    table = frame_alignment.FrameAlignment.from_timestamps(np.arange(10) * 40.0, 25.0, reported_frames=10)
+    issues = []
+    for name, alignment in (("ratio", None), ("timestamps", table)):
+        expected = list(build_video_rows(raw(1), video_id, verbose=False, alignment=alignment).columns)
+        for interpolate in (False, True):
+            try:
+                df = build_video_rows(raw(0), video_id, verbose=False, interpolate=interpolate, alignment=alignment)
+            except Exception as e:
+                issues.append(f"{name}: {type(e).__name__}: {e}")
+                continue
+            if len(df) or list(df.columns) != expected:
+                issues.append(f"{name}: {len(df)} filas / columnas distintas con un video sin detecciones")
+    return issues
+
+
+# 7. Paridad de features en lote vs. streaming
+print("\n7️⃣  Paridad de features lote/streaming y video vacío...")
+
+if all_packages_ok:
+    from streaming_features import check_stream_batch_parity
+    max_diff = check_stream_batch_parity()
+    if max_diff <= 1e-6:
+        print(f"   ✓ Streaming = lote (error máx. {max_diff:.2e})")
+    else:
+        errors.append(f"❌ Features streaming difieren del lote (error máx. {max_diff:.2e})")
+
+    empty_issues = check_empty_video()
+    if not empty_issues:
+        print("   ✓ Video sin detecciones: 0 filas con el esquema completo")
+    for issue in empty_issues:
+        errors.append(f"❌ Video sin detecciones: {issue}")
+else:
+    print("   ⓘ Omitido (faltan dependencias)")
+
+# 8. Último reporte de ejecución por script (profiling.py)
+print("\n8️⃣  Reportes de ejecución (run_reports/)...")
+
+any_report = False
+for script in ("extract_mediapipe_data", "enrich_dataset", "eda_basic"):
+    reports = profiling.load_reports(script)
+    if not reports:
+        continue
+    any_report = True
+    last = reports[-1]
+    rss = f"{last['peak_rss_mb']:.0f} MB" if last["peak_rss_mb"] is not None else "n/d"
+    print(f"   ✓ {script}: {last['started_at']} | {last['wall_s']:.1f} s | pico RSS {rss}")
+    for name, st in last["stages"].items():
+        fps = f" | {st['fps']:.0f} frames/s" if st["fps"] else ""
+        print(f"      {name:18s} {st['wall_s']:8.2f} s{fps}")
+    if len(reports) > 1:
+        for regression in profiling.find_regressions(reports[-2], last):
+            warnings.append(f"⚠️  {script} más lento que la ejecución anterior en {regression}")
+if not any_report:
+    print("   ⓘ Sin reportes aún (se generan al ejecutar los pasos 1-3)")
+
 # Resumen
 print("\n" + "=" * 70)
 print("📋 RESUMEN")
@@ -0,0 +1,221 @@
+"""
+Ventanas de longitud fija sobre las filas por frame, para entrenar clasificadores.
+
+En vez de cortar DataFrames por video_id / segment_id (una copia por
+ventana), se guarda solo un índice de ventanas: la fila inicial de cada
+ventana, su video y su etiqueta. Las ventanas se leen como vistas sobre el
+array por frame (landmarks, features, el tensor mapeado en memoria, ...)
+con sliding_window_view, sin copiar datos:
+
+    index = load_window_index()                      # o build_window_index(...)
+    windows = WindowedArray(features_matrix, index)  # (n_ventanas, length, n_features)
+    x = windows[i]                                   # vista, sin copia
+    batch = windows[[3, 10, 42]]                     # copia solo ese lote
+
+Reglas:
+- Una ventana nunca cruza dos videos (ni un salto de frames mayor a max_gap).
+- `hop` es el paso entre inicios de ventanas consecutivas de un video.
+- Etiqueta de la ventana: "majority" (la más frecuente; a igualdad, la de
+  menor código), "center" (frame central) o "last" (último frame).
+
+El índice se guarda en windows_index.npz con la huella del dataset y los
+parámetros, así las épocas de entrenamiento no reconstruyen las ventanas.
+
+Uso:
+    python windows.py --length 30 --hop 10 --policy majority
+"""
+
+import argparse
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import dataset_io
+
+WINDOW = {"length": 30, "hop": 10, "label_policy": "majority", "max_gap": None}
+LABEL_POLICIES = ("majority", "center", "last")
+WINDOWS_INDEX = "windows_index.npz"
+
+
+def window_starts(video_ids, length, hop, frames=None, max_gap=None):
+    """Filas iniciales de todas las ventanas que caben dentro de cada video."""
+    video_ids = np.asarray(video_ids)
+    n = len(video_ids)
+    cuts = np.flatnonzero(video_ids[1:] != video_ids[:-1]) + 1
+    bounds = np.concatenate([[0], cuts, [n]])
+    starts = [np.arange(a, b - length + 1, hop) for a, b in zip(bounds[:-1], bounds[1:]) if b - a >= length]
+    starts = np.concatenate(starts).astype(np.int64) if starts else np.zeros(0, dtype=np.int64)
+    if max_gap is not None and frames is not None and len(starts):
+        # Saltos grandes de frame (p. ej. tramos sin pose) dentro de la ventana
+        gaps = np.concatenate([[0], (np.diff(np.asarray(frames)) > max_gap).astype(np.int64)])
+        cum = np.cumsum(gaps)
+        starts = starts[cum[starts + length - 1] - cum[starts] == 0]
+    return starts
+
+
+def window_labels(codes, starts, length, policy="majority", n_classes=None):
+    """Etiqueta (código) de cada ventana según la política."""
+    codes = np.asarray(codes)
+    if policy == "center":
+        return codes[starts + length // 2]
+    if policy == "last":
+        return codes[starts + length - 1]
+    if policy != "majority":
+        raise ValueError(f"Política de etiqueta desconocida: {policy} (opciones: {LABEL_POLICIES})")
+    n_classes = int(codes.max()) + 1 if n_classes is None else n_classes
+    # Conteos por ventana con sumas acumuladas del one-hot: O(filas * clases)
+    onehot_cum = np.zeros((len(codes) + 1, n_classes), dtype=np.int32)
+    np.cumsum(np.eye(n_classes, dtype=np.int32)[codes], axis=0, out=onehot_cum[1:])
+    counts = onehot_cum[starts + length] - onehot_cum[starts]
+    return counts.argmax(axis=1)
+
+
+class WindowIndex:
+    """Índice de ventanas: fila inicial, video y etiqueta de cada ventana."""
+
+    def __init__(self, starts, video_ids, labels, classes, length, hop, policy, max_gap=None, source=""):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.video_ids = np.asarray(video_ids)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.classes = np.asarray(classes)
+        self.length = int(length)
+        self.hop = int(hop)
+        self.policy = policy
+        self.max_gap = max_gap
+        self.source = source
+
+    @classmethod
+    def build(cls, video_ids, labels, length=WINDOW["length"], hop=WINDOW["hop"],
+              policy=WINDOW["label_policy"], frames=None, max_gap=None, source=""):
+        """Construye el índice a partir de video_id y etiqueta por fila (agrupadas por video)."""
+        video_ids = np.asarray(video_ids)
+        classes, codes = np.unique(np.asarray(labels, dtype=object).astype(str), return_inverse=True)
+        starts = window_starts(video_ids, length, hop, frames, max_gap)
+        return cls(starts, video_ids[starts], window_labels(codes, starts, length, policy, len(classes)),
+                   classes, length, hop, policy, max_gap, source)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def settings(self):
+        return {"length": self.length, "hop": self.hop, "label_policy": self.policy, "max_gap": self.max_gap}
+
+    def label_names(self):
+        return self.classes[self.labels]
+
+    def save(self, path=WINDOWS_INDEX):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, starts=self.starts, video_ids=self.video_ids, labels=self.labels,
+                 classes=self.classes, length=self.length, hop=self.hop, policy=np.asarray(self.policy),
+                 max_gap=np.asarray(-1 if self.max_gap is None else self.max_gap),
+                 source=np.asarray(self.source))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=WINDOWS_INDEX):
+        with np.load(path) as npz:
+            max_gap = npz["max_gap"].item()
+            return cls(npz["starts"], npz["video_ids"], npz["labels"], npz["classes"], npz["length"].item(),
+                       npz["hop"].item(), npz["policy"].item(), None if max_gap < 0 else max_gap,
+                       npz["source"].item())
+
+
+class WindowedArray:
+    """Ventanas (n_ventanas, length, ...) de un array por fila, como vistas sin copia.
+
+    `array` tiene una fila por frame en el mismo orden que el dataset con el
+    que se construyó el índice (puede ser un memmap). Indexar con un entero
+    devuelve una vista, y un slice también cuando sus ventanas tienen filas
+    iniciales equiespaciadas (p. ej. dentro de un video, o entre videos si
+    caen justo a un hop); si no, o con una lista/array de posiciones, NumPy
+    copia solo ese lote.
+    """
+
+    def __init__(self, array, index):
+        self.index = index
+        # sliding_window_view deja la ventana como último eje; se mueve al eje 1
+        self._view = np.moveaxis(sliding_window_view(array, index.length, axis=0), -1, 1)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._windows(self.index.starts[i])
+        return self._view[self.index.starts[i]]
+
+    def _windows(self, starts):
+        """Ventanas que empiezan en `starts`: vista con paso fijo si son equiespaciadas, si no copia."""
+        if len(starts) < 2:
+            return self._view[starts[0]:starts[0] + 1] if len(starts) else self._view[:0]
+        step = starts[1] - starts[0]
+        if step > 0 and (np.diff(starts) == step).all():
+            return self._view[starts[0]:starts[-1] + 1:step]
+        return self._view[starts]
+
+    def video(self, video_id):
+        """Ventanas de un video como una sola vista (el hop es constante dentro del video)."""
+        return self._windows(self.index.starts[self.index.video_ids == video_id])
+
+    def iter_batches(self, batch_size, order=None):
+        """Lotes (ventanas, etiquetas); `order` permite barajar las ventanas por época."""
+        order = np.arange(len(self)) if order is None else np.asarray(order)
+        for a in range(0, len(order), batch_size):
+            idx = order[a:a + batch_size]
+            yield self._view[self.index.starts[idx]], self.index.labels[idx]
+
+
+def build_window_index(dataset_path=dataset_io.ENRICHED_DATASET, length=WINDOW["length"], hop=WINDOW["hop"],
+                       policy=WINDOW["label_policy"], max_gap=WINDOW["max_gap"], path=WINDOWS_INDEX):
+    """Construye y guarda el índice de ventanas del dataset (lee solo video_id, frame y label)."""
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    df = dataset_io.read_dataset(dataset_path, columns=["video_id", "frame_opencv", "label"])
+    vids = df["video_id"].to_numpy()
+    frames = df["frame_opencv"].to_numpy()
+    same_video = vids[1:] == vids[:-1]
+    if len(np.unique(vids)) != len(vids) - same_video.sum() or (np.diff(frames)[same_video] < 0).any():
+        raise ValueError(f"{dataset_path} debe estar agrupado por video y ordenado por frame")
+    index = WindowIndex.build(vids, df["label"].to_numpy(), length, hop, policy, frames, max_gap,
+                              dataset_io.source_fingerprint(dataset_path))
+    if path is not None:
+        index.save(path)
+    return index
+
+
+def load_window_index(dataset_path=dataset_io.ENRICHED_DATASET, path=WINDOWS_INDEX, **settings):
+    """Abre el índice guardado; lo reconstruye si el dataset o los parámetros cambiaron."""
+    settings = {**WINDOW, **settings}
+    dataset_path = dataset_io.resolve_dataset_path(dataset_path)
+    try:
+        index = WindowIndex.load(path)
+        if index.source == dataset_io.source_fingerprint(dataset_path) and index.settings() == settings:
+            return index
+    except (OSError, KeyError):
+        pass
+    return build_window_index(dataset_path, settings["length"], settings["hop"], settings["label_policy"],
+                              settings["max_gap"], path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el índice de ventanas para entrenamiento.")
+    parser.add_argument("--dataset", default=dataset_io.ENRICHED_DATASET)
+    parser.add_argument("--length", type=int, default=WINDOW["length"], help="Frames por ventana")
+    parser.add_argument("--hop", type=int, default=WINDOW["hop"], help="Paso entre ventanas")
+    parser.add_argument("--policy", choices=LABEL_POLICIES, default=WINDOW["label_policy"],
+                        help="Etiqueta de la ventana")
+    parser.add_argument("--max-gap", type=int, default=WINDOW["max_gap"],
+                        help="Descarta ventanas con saltos de frame mayores a este valor")
+    parser.add_argument("--out", default=WINDOWS_INDEX)
+    args = parser.parse_args()
+
+    index = build_window_index(args.dataset, args.length, args.hop, args.policy, args.max_gap, args.out)
+    print(f"✅ {len(index)} ventanas de {index.length} frames (hop {index.hop}, etiqueta '{index.policy}')")
+    names, counts = np.unique(index.label_names(), return_counts=True)
+    for name, count in zip(names, counts):
+        print(f"   {name:20s} {count:6d}")
+    print(f"💾 Índice guardado en: {args.out}")
+
+
+if __name__ == "__main__":
+    main()